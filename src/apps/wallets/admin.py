@@ -1,24 +1,86 @@
 from django.contrib import admin
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.html import format_html
 
 from .models import Operation, Wallet
+from .pagination import EstimatedCountPaginator
+
+
+class LatestOperationsFormSet(BaseInlineFormSet):
+    """Только последние операции кошелька, а не весь журнал."""
+
+    def get_queryset(self):
+        if not hasattr(self, "_latest"):
+            self._latest = super().get_queryset()[: OperationInline.max_shown]
+        return self._latest
 
 
 class OperationInline(admin.TabularInline):
+    """
+    Последние max_shown операций кошелька, только для чтения: операции
+    меняют баланс и создаются через API. Весь журнал открывается
+    ссылкой на список операций.
+    """
+
     model = Operation
-    extra = 1
-    fields = ("operation_type", "amount", "created_at")
-    readonly_fields = ("created_at",)
+    formset = LatestOperationsFormSet
+    max_shown = 20
+    fields = (
+        "id",
+        "operation_type",
+        "amount",
+        "balance_after",
+        "created_at",
+    )
+    readonly_fields = fields
+    can_delete = False
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).order_by("-created_at", "-id")
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Wallet)
 class WalletAdmin(admin.ModelAdmin):
-    list_display = ("id", "balance")
+    list_display = ("id", "balance", "bucket_count")
+    search_fields = ("=id",)
+    readonly_fields = ("operations",)
     inlines = [OperationInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @admin.display(description="Журнал")
+    def operations(self, wallet):
+        url = reverse("admin:wallets_operation_changelist")
+        return format_html(
+            '<a href="{}?wallet={}">Все операции</a>', url, wallet.pk
+        )
 
 
 @admin.register(Operation)
 class OperationAdmin(admin.ModelAdmin):
-    list_display = ("id", "wallet", "operation_type", "amount", "created_at")
-    list_filter = ("operation_type",)
-    readonly_fields = ("created_at",)
-    date_hierarchy = "created_at"
+    list_display = (
+        "id",
+        "wallet",
+        "operation_type",
+        "amount",
+        "balance_after",
+        "created_at",
+    )
+    list_select_related = ("wallet",)
+    # Фильтры без запросов за вариантами: по типу и по периоду
+    # created_at, который читается по индексу (created_at, id).
+    list_filter = ("operation_type", "created_at")
+    search_fields = ("=id", "=wallet__id")
+    raw_id_fields = ("wallet", "linked_operation")
+    readonly_fields = ("balance_after", "created_at")
+    ordering = ("-created_at", "-id")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
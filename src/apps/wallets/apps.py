@@ -8,5 +8,15 @@ class WalletsConfig(AppConfig):
     def ready(self):
         from decimal import ROUND_HALF_UP, getcontext
 
+        from django.db.backends.signals import connection_created
+        from prometheus_client import REGISTRY
+
+        from apps.wallets import group_commit
+        from apps.wallets.db_pool import DatabasePoolCollector
+        from apps.wallets.timing import instrument_connection
+
         getcontext().prec = 28
         getcontext().rounding = ROUND_HALF_UP
+        connection_created.connect(instrument_connection)
+        REGISTRY.register(DatabasePoolCollector())
+        group_commit.publish_settings()
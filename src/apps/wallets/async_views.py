@@ -0,0 +1,165 @@
+"""
+Асинхронные версии WalletView, OperationCreateView и ChangeFeedView
+для ASGI.
+
+Чтение баланса идёт через асинхронный ORM Django. Транзакции ORM
+пока синхронные, поэтому операции выполняются в пуле потоков: воркер
+не блокируется на время ожидания блокировки строки и может держать
+много запросов одновременно. Долгий опрос ленты изменений ждёт между
+чтениями в цикле событий и не держит ни поток, ни соединение с БД.
+"""
+
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+
+from . import outbox
+from .cache import balance_cache
+from .models import Wallet
+from .routers import ReplicaReadMixin, reads_primary
+from .serializers import (
+    ChangeFeedQuerySerializer,
+    WalletBalanceSerializer,
+    WalletQuerySerializer,
+)
+from .views import ChangeFeedView, OperationCreateView, WalletView
+
+
+async def run_in_db_thread(func, *args):
+    """
+    Выполнить синхронный код с БД в отдельном потоке.
+
+    Соединение потока закрывается по правилам CONN_MAX_AGE,
+    как в конце обычного запроса.
+    """
+
+    def run():
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+
+    return await sync_to_async(run, thread_sensitive=False)()
+
+
+def error_response(error: APIException) -> JsonResponse:
+    """Ответ с ошибкой в том же формате, что у представлений DRF."""
+    detail = error.detail
+    data = detail if isinstance(detail, (dict, list)) else {"detail": detail}
+    response = JsonResponse(data, status=error.status_code, safe=False)
+    if getattr(error, "wait", None):
+        response["Retry-After"] = str(error.wait)
+    return response
+
+
+def _load_wallet(wallet_id):
+    wallet = Wallet.objects.with_total_balance().filter(id=wallet_id).first()
+    if wallet is None:
+        raise NotFound()
+    return WalletBalanceSerializer(wallet).data
+
+
+class AsyncWalletView(ReplicaReadMixin, View):
+    """Получение информации о кошельке."""
+
+    async def get(self, request, wallet_id):
+        try:
+            params = WalletQuerySerializer(data=request.GET)
+            params.is_valid(raise_exception=True)
+            as_of = params.validated_data.get("as_of")
+            if as_of is not None:
+                data = await run_in_db_thread(
+                    WalletView.balance_as_of, wallet_id, as_of
+                )
+            elif (
+                settings.WALLETS_BALANCE_CACHE["ENABLED"]
+                and not reads_primary()
+            ):
+                data = await run_in_db_thread(
+                    balance_cache.get,
+                    wallet_id,
+                    lambda: _load_wallet(wallet_id),
+                )
+            else:
+                data = await self._aload_wallet(wallet_id)
+        except APIException as error:
+            return error_response(error)
+        return JsonResponse(data)
+
+    @staticmethod
+    async def _aload_wallet(wallet_id):
+        wallet = (
+            await Wallet.objects.with_total_balance()
+            .filter(id=wallet_id)
+            .afirst()
+        )
+        if wallet is None:
+            raise NotFound()
+        return WalletBalanceSerializer(wallet).data
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncOperationCreateView(View):
+    """Обработка пополнения или снятия средств с кошелька."""
+
+    async def post(self, request, wallet_id):
+        try:
+            data = await run_in_db_thread(
+                OperationCreateView.create_operation,
+                wallet_id,
+                self._parse_body(request),
+                request.headers.get(
+                    OperationCreateView.IDEMPOTENCY_KEY_HEADER
+                ),
+            )
+        except APIException as error:
+            return error_response(error)
+        return JsonResponse(data, status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def _parse_body(request):
+        """Разобрать тело парсерами DRF синхронного представления."""
+        return Request(
+            request,
+            parsers=[
+                parser() for parser in OperationCreateView.parser_classes
+            ],
+        ).data
+
+
+async def _wait_for_events(cursor, limit, timeout):
+    """Долгий опрос outbox: как outbox.wait_for, но без сна в потоке."""
+    deadline = time.monotonic() + timeout
+    while True:
+        events = await run_in_db_thread(outbox.fetch, cursor, limit)
+        if events or time.monotonic() >= deadline:
+            return events
+        await asyncio.sleep(settings.WALLETS_OUTBOX["POLL_INTERVAL_SECONDS"])
+
+
+class AsyncChangeFeedView(View):
+    """Лента изменений с долгим опросом."""
+
+    async def get(self, request):
+        try:
+            params = ChangeFeedQuerySerializer(data=request.GET)
+            params.is_valid(raise_exception=True)
+        except APIException as error:
+            return error_response(error)
+        cursor = params.validated_data["cursor"]
+        events = await _wait_for_events(
+            cursor,
+            params.validated_data["limit"],
+            params.validated_data["wait"],
+        )
+        return JsonResponse(ChangeFeedView.page(cursor, events))
@@ -0,0 +1,162 @@
+"""
+Баланс кошелька на момент времени.
+
+Каждая операция хранит balance_after — баланс кошелька сразу после
+неё, поэтому баланс на момент as_of — это balance_after последней
+операции не позже as_of: один запрос по индексу
+(wallet, -created_at, -id). balance_after пуст у операций корзин
+разделённых кошельков, у операций, добавленных импортом задним
+числом, и у операций до появления поля (их заполняет команда
+backfill_balance_after). Тогда баланс выводится из следующей
+операции или из текущего баланса и суммы более поздних операций.
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable
+from uuid import UUID
+
+from django.db import transaction
+from django.db.models import F, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from apps.wallets.ledger import AMOUNT_FIELD, SIGNED_AMOUNT, ZERO
+from apps.wallets.models import Operation, Wallet
+from apps.wallets.wallet_service import WalletService
+
+RESET_BATCH_SIZE = 500
+
+
+def balance_as_of(wallet_id: UUID, as_of: datetime) -> Decimal | None:
+    """Баланс кошелька на момент as_of; None, если кошелька нет."""
+    operations = Operation.objects.filter(wallet_id=wallet_id)
+    previous = list(
+        operations.filter(created_at__lte=as_of)
+        .order_by("-created_at", "-id")
+        .values_list("balance_after", flat=True)[:1]
+    )
+    if previous and previous[0] is not None:
+        return previous[0]
+
+    following = (
+        operations.filter(created_at__gt=as_of)
+        .order_by("created_at", "id")
+        .values("balance_after", "operation_type", "amount")
+        .first()
+    )
+    if following is not None and following["balance_after"] is not None:
+        return following["balance_after"] - WalletService.signed_amount(
+            following["operation_type"], following["amount"]
+        )
+
+    later = (
+        operations.filter(created_at__gt=as_of)
+        .values("wallet")
+        .annotate(total=Sum(SIGNED_AMOUNT))
+        .values("total")
+    )
+    return (
+        Wallet.objects.with_total_balance()
+        .filter(id=wallet_id)
+        .annotate(
+            balance_as_of=F("total_balance")
+            - Coalesce(Subquery(later), ZERO, output_field=AMOUNT_FIELD)
+        )
+        .values_list("balance_as_of", flat=True)
+        .first()
+    )
+
+
+def backfill_wallet(wallet_id: UUID, chunk_size: int = 1000) -> int | None:
+    """
+    Заполнить пустые balance_after операций кошелька.
+
+    Операции обходятся от новых к старым: баланс до операции — её
+    balance_after минус её сумма со знаком, а баланс после самой новой
+    операции — текущий баланс кошелька, который читается под
+    блокировкой строки. Каждая порция из chunk_size операций
+    записывается отдельной транзакцией, поэтому кошелёк блокируется
+    ненадолго. Разделённые кошельки пропускаются (None): их операции
+    записываются без balance_after. Возвращает число заполненных
+    операций.
+    """
+    if Wallet.objects.filter(id=wallet_id, bucket_count__gt=0).exists():
+        return None
+    operations = Operation.objects.filter(wallet_id=wallet_id).order_by(
+        "-created_at", "-id"
+    )
+    filled = 0
+    while True:
+        with transaction.atomic():
+            missing = operations.filter(balance_after__isnull=True).first()
+            if missing is None:
+                return filled
+            balance = _balance_after(wallet_id, missing)
+            if balance is None:
+                return filled
+            changed = []
+            for operation in operations.filter(
+                Q(created_at__lt=missing.created_at)
+                | Q(created_at=missing.created_at, id__lte=missing.id)
+            )[:chunk_size]:
+                if operation.balance_after is None:
+                    operation.balance_after = balance
+                    changed.append(operation)
+                balance = (
+                    operation.balance_after
+                    - WalletService.signed_amount(
+                        operation.operation_type, operation.amount
+                    )
+                )
+            Operation.objects.bulk_update(changed, ["balance_after"])
+            filled += len(changed)
+
+
+def reset_after(operations: Iterable[Operation]) -> None:
+    """
+    Очистить balance_after операций, после которых задним числом
+    добавлены операции: их баланс изменился. Заполнить их заново
+    можно командой backfill_balance_after.
+    """
+    earliest = {}
+    for operation in operations:
+        created_at = earliest.get(operation.wallet_id)
+        if created_at is None or operation.created_at < created_at:
+            earliest[operation.wallet_id] = operation.created_at
+    wallet_ids = sorted(earliest)
+    for start in range(0, len(wallet_ids), RESET_BATCH_SIZE):
+        condition = Q()
+        for wallet_id in wallet_ids[start : start + RESET_BATCH_SIZE]:
+            condition |= Q(
+                wallet_id=wallet_id, created_at__gte=earliest[wallet_id]
+            )
+        Operation.objects.filter(condition).update(balance_after=None)
+
+
+def _balance_after(wallet_id: UUID, operation: Operation) -> Decimal | None:
+    """Баланс после operation по следующей за ней операции."""
+    following = Operation.objects.filter(
+        Q(created_at__gt=operation.created_at)
+        | Q(created_at=operation.created_at, id__gt=operation.id),
+        wallet_id=wallet_id,
+    ).order_by("created_at", "id")
+    values = ("balance_after", "operation_type", "amount")
+    successor = following.values(*values).first()
+    if successor is None:
+        balance = (
+            Wallet.objects.select_for_update()
+            .with_total_balance()
+            .filter(id=wallet_id, bucket_count=0)
+            .values_list("total_balance", flat=True)
+            .first()
+        )
+        # Пока строка не была заблокирована, могла закоммититься
+        # новая операция.
+        successor = following.values(*values).first()
+        if successor is None:
+            return balance
+    if successor["balance_after"] is None:
+        return None
+    return successor["balance_after"] - WalletService.signed_amount(
+        successor["operation_type"], successor["amount"]
+    )
@@ -0,0 +1,162 @@
+"""
+Бюджет ожидания блокировок и дедлайн запроса.
+
+deadline_middleware задаёт запросу дедлайн REQUEST_DEADLINE_MS.
+Транзакции записи выполняются внутри lock_budget: на PostgreSQL
+каждый запрос транзакции ограничен statement_timeout по остатку
+дедлайна, а ожидание блокировки — lock_timeout соединения
+(LOCK_TIMEOUT_MS, задаётся при подключении) или остатком дедлайна,
+если он короче. Оба значения выставляются одним запросом, lock_timeout
+— только когда он отличается от значения соединения; вне запросов
+(без дедлайна) запрос не нужен. На SQLite то же делает busy_timeout
+соединения.
+Исчерпание бюджета превращается в WalletBusy (409 с Retry-After),
+а не держит воркер. Таймауты считаются в метрике
+wallets_lock_timeouts_total без метки кошелька, чтобы число серий
+не росло с числом кошельков; по кошелькам они учитываются
+в счётчиках конкуренции sharding.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from uuid import UUID
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.utils.decorators import sync_and_async_middleware
+
+from apps.wallets import metrics, sharding
+from apps.wallets.exceptions import WalletBusy
+
+# lock_not_available и query_canceled.
+TIMEOUT_SQLSTATES = {"55P03", "57014"}
+
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+def _config() -> dict:
+    return settings.WALLETS_LOCK_BUDGET
+
+
+def remaining() -> float | None:
+    """Секунды до дедлайна текущего запроса; None — дедлайна нет."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def is_timeout(error: OperationalError) -> bool:
+    """Ошибка вызвана таймаутом блокировки или запроса."""
+    if connection.vendor == "sqlite":
+        return "locked" in str(error)
+    return getattr(error.__cause__, "sqlstate", None) in TIMEOUT_SQLSTATES
+
+
+@contextmanager
+def lock_budget(*wallet_ids: UUID):
+    """
+    Ограничить ожидание блокировок в текущей транзакции.
+
+    Вызывается внутри transaction.atomic до первого изменения строк.
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        raise exhausted(*wallet_ids)
+    lock_ms = _config()["LOCK_TIMEOUT_MS"]
+    statement_ms = 0
+    if left is not None:
+        statement_ms = max(int(left * 1000), 1)
+        lock_ms = min(lock_ms, statement_ms) if lock_ms else statement_ms
+    previous_busy_ms = _set_timeouts(lock_ms, statement_ms)
+    try:
+        yield
+    except OperationalError as error:
+        if not is_timeout(error):
+            raise
+        raise exhausted(*wallet_ids) from error
+    finally:
+        if previous_busy_ms is not None:
+            _set_busy_timeout(previous_busy_ms)
+
+
+def exhausted(*wallet_ids: UUID) -> WalletBusy:
+    """Учесть исчерпанный бюджет кошельков и вернуть ошибку для ответа."""
+    _count(wallet_ids)
+    return WalletBusy(wait=_config()["RETRY_AFTER_SECONDS"])
+
+
+def _set_timeouts(lock_ms: int, statement_ms: int) -> int | None:
+    """Выставить таймауты; на SQLite вернуть прежний busy_timeout."""
+    if connection.vendor == "postgresql":
+        timeouts = {}
+        # lock_timeout соединения уже равен LOCK_TIMEOUT_MS.
+        if lock_ms != _config()["LOCK_TIMEOUT_MS"]:
+            timeouts["lock_timeout"] = lock_ms
+        if statement_ms:
+            timeouts["statement_timeout"] = statement_ms
+        if timeouts:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT "
+                    + ", ".join(["set_config(%s, %s, true)"] * len(timeouts)),
+                    [
+                        value
+                        for name, milliseconds in timeouts.items()
+                        for value in (name, f"{milliseconds}ms")
+                    ],
+                )
+        return None
+    if connection.vendor == "sqlite" and lock_ms:
+        # busy_timeout — свойство соединения, а не транзакции: его
+        # нужно вернуть и после ошибки в транзакции, поэтому прагмы
+        # выполняются в обход курсоров Django.
+        previous_ms = connection.connection.execute(
+            "PRAGMA busy_timeout"
+        ).fetchone()[0]
+        _set_busy_timeout(lock_ms)
+        return previous_ms
+    return None
+
+
+def _set_busy_timeout(milliseconds: int) -> None:
+    connection.connection.execute(f"PRAGMA busy_timeout = {int(milliseconds)}")
+
+
+def _count(wallet_ids) -> None:
+    seconds = _config()["LOCK_TIMEOUT_MS"] / 1000
+    metrics.LOCK_TIMEOUTS.inc()
+    for wallet_id in wallet_ids:
+        sharding.tracker.observe(wallet_id, seconds)
+
+
+def _start():
+    deadline_ms = _config()["REQUEST_DEADLINE_MS"]
+    return _deadline.set(
+        time.monotonic() + deadline_ms / 1000 if deadline_ms else None
+    )
+
+
+@sync_and_async_middleware
+def deadline_middleware(get_response):
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            token = _start()
+            try:
+                return await get_response(request)
+            finally:
+                _deadline.reset(token)
+
+    else:
+
+        def middleware(request):
+            token = _start()
+            try:
+                return get_response(request)
+            finally:
+                _deadline.reset(token)
+
+    return middleware
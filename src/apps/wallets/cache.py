@@ -0,0 +1,246 @@
+"""
+Кэш балансов кошельков для WalletView.
+
+Без WALLETS_BALANCE_CACHE["SHARED_CACHE"] кэш — LRU процесса с TTL;
+с ним — только общий кэш Django: LRU процесса не сбрасывался бы
+операциями других процессов. Записи сбрасываются после коммита каждой
+операции (transaction.on_commit), поэтому незакоммиченные балансы
+в кэш не попадают. Одновременные промахи по одному кошельку выполняют
+один запрос к БД, остальные запросы ждут его результат.
+
+Устаревший баланс всё же возможен, но не дольше TTL_SECONDS: запрос
+другого процесса, прочитавший баланс до коммита операции, может
+положить его в общий кэш уже после сброса записи. Сброс во время
+загрузки отслеживается только внутри процесса.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from apps.wallets import metrics
+
+
+def _config() -> dict:
+    return settings.WALLETS_BALANCE_CACHE
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Exception | None = None
+        self.invalidated = False
+
+
+class BalanceCache:
+    def __init__(self):
+        self._entries: OrderedDict[UUID, tuple[float, dict]] = OrderedDict()
+        self._in_flight: dict[UUID, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def get(self, wallet_id: UUID, loader: Callable[[], dict]) -> dict:
+        """Вернуть данные кошелька из кэша или загрузить через loader."""
+        if not _config()["ENABLED"]:
+            return loader()
+        with self._lock:
+            value = self._get_local(wallet_id)
+            if value is not None:
+                metrics.BALANCE_CACHE_REQUESTS.labels("hit").inc()
+                return value
+            flight = self._in_flight.get(wallet_id)
+            is_leader = flight is None
+            if is_leader:
+                flight = self._in_flight[wallet_id] = _Flight()
+
+        if not is_leader:
+            metrics.BALANCE_CACHE_REQUESTS.labels("coalesced").inc()
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            if flight.value is None:
+                # Ведущим был get_many, не нашедший кошелёк.
+                return loader()
+            return flight.value
+
+        try:
+            flight.value = self._load(wallet_id, loader, flight)
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[wallet_id]
+                if flight.error is None and not flight.invalidated:
+                    self._set_local(wallet_id, flight.value)
+            flight.done.set()
+        return flight.value
+
+    def get_many(
+        self,
+        wallet_ids: list[UUID],
+        loader: Callable[[list[UUID]], dict[UUID, dict]],
+    ) -> dict[UUID, dict]:
+        """
+        Вернуть данные нескольких кошельков.
+
+        Промахи загружаются одним вызовом loader(ids), возвращающим
+        данные найденных кошельков по id; ненайденных в ответе нет.
+        Кошельки, которые уже загружает другой запрос, загружаются
+        заново, но не кэшируются.
+        """
+        if not _config()["ENABLED"]:
+            return loader(wallet_ids)
+        found, flights = {}, {}
+        with self._lock:
+            for wallet_id in wallet_ids:
+                value = self._get_local(wallet_id)
+                if value is not None:
+                    found[wallet_id] = value
+                elif wallet_id not in self._in_flight:
+                    flight = self._in_flight[wallet_id] = _Flight()
+                    flights[wallet_id] = flight
+        metrics.BALANCE_CACHE_REQUESTS.labels("hit").inc(len(found))
+
+        try:
+            missing = [
+                wallet_id for wallet_id in wallet_ids if wallet_id not in found
+            ]
+            found.update(self._load_many(missing, loader, flights))
+        except Exception as error:
+            for flight in flights.values():
+                flight.error = error
+            raise
+        finally:
+            with self._lock:
+                for wallet_id, flight in flights.items():
+                    del self._in_flight[wallet_id]
+                    flight.value = found.get(wallet_id)
+                    if (
+                        flight.error is None
+                        and flight.value is not None
+                        and not flight.invalidated
+                    ):
+                        self._set_local(wallet_id, flight.value)
+            for flight in flights.values():
+                flight.done.set()
+        return found
+
+    def invalidate(self, wallet_id: UUID) -> None:
+        with self._lock:
+            self._entries.pop(wallet_id, None)
+            flight = self._in_flight.get(wallet_id)
+            if flight is not None:
+                flight.invalidated = True
+        shared = self._shared_cache()
+        if shared is not None:
+            shared.delete(self._shared_key(wallet_id))
+
+    def invalidate_on_commit(self, wallet_id: UUID) -> None:
+        """Сбросить запись кошелька после коммита текущей транзакции."""
+        if _config()["ENABLED"]:
+            transaction.on_commit(lambda: self.invalidate(wallet_id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _load(
+        self, wallet_id: UUID, loader: Callable[[], dict], flight: _Flight
+    ) -> dict:
+        shared = self._shared_cache()
+        key = self._shared_key(wallet_id)
+        if shared is not None:
+            value = shared.get(key)
+            if value is not None:
+                metrics.BALANCE_CACHE_REQUESTS.labels("hit").inc()
+                return value
+        metrics.BALANCE_CACHE_REQUESTS.labels("miss").inc()
+        value = dict(loader())
+        if shared is not None and not flight.invalidated:
+            shared.set(key, value, timeout=_config()["TTL_SECONDS"])
+        return value
+
+    def _load_many(
+        self,
+        wallet_ids: list[UUID],
+        loader: Callable[[list[UUID]], dict[UUID, dict]],
+        flights: dict[UUID, _Flight],
+    ) -> dict[UUID, dict]:
+        if not wallet_ids:
+            return {}
+        found = {}
+        shared = self._shared_cache()
+        if shared is not None:
+            cached = shared.get_many(
+                [self._shared_key(wallet_id) for wallet_id in wallet_ids]
+            )
+            for wallet_id in wallet_ids:
+                value = cached.get(self._shared_key(wallet_id))
+                if value is not None:
+                    found[wallet_id] = value
+            metrics.BALANCE_CACHE_REQUESTS.labels("hit").inc(len(found))
+        to_load = [
+            wallet_id for wallet_id in wallet_ids if wallet_id not in found
+        ]
+        metrics.BALANCE_CACHE_REQUESTS.labels("miss").inc(len(to_load))
+        loaded = {
+            wallet_id: dict(value)
+            for wallet_id, value in (
+                loader(to_load).items() if to_load else ()
+            )
+        }
+        if shared is not None and loaded:
+            shared.set_many(
+                {
+                    self._shared_key(wallet_id): value
+                    for wallet_id, value in loaded.items()
+                    if wallet_id in flights
+                    and not flights[wallet_id].invalidated
+                },
+                timeout=_config()["TTL_SECONDS"],
+            )
+        return found | loaded
+
+    def _get_local(self, wallet_id: UUID) -> dict | None:
+        if _config()["SHARED_CACHE"]:
+            return None
+        entry = self._entries.get(wallet_id)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[wallet_id]
+            return None
+        self._entries.move_to_end(wallet_id)
+        return value
+
+    def _set_local(self, wallet_id: UUID, value: dict) -> None:
+        config = _config()
+        if config["SHARED_CACHE"]:
+            return
+        self._entries[wallet_id] = (
+            time.monotonic() + config["TTL_SECONDS"],
+            value,
+        )
+        self._entries.move_to_end(wallet_id)
+        while len(self._entries) > config["MAX_ENTRIES"]:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _shared_cache():
+        alias = _config()["SHARED_CACHE"]
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def _shared_key(wallet_id: UUID) -> str:
+        return f"wallets:balance:{wallet_id}"
+
+
+balance_cache = BalanceCache()
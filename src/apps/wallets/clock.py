@@ -0,0 +1,25 @@
+"""
+Время операций.
+
+created_at операции назначается после блокировки кошелька, поэтому
+порядок операций по created_at совпадает с порядком изменения баланса.
+На PostgreSQL время на всех путях записи берётся из часов БД
+(clock_timestamp()), как и в едином запросе операции
+(APPLY_OPERATION_SQL): часы серверов приложения могут расходиться
+между собой и с часами БД. На остальных БД используются часы
+приложения.
+"""
+
+from datetime import datetime
+
+from django.db import connection
+from django.utils import timezone
+
+
+def now() -> datetime:
+    """Текущее время часов БД; вызывается после блокировки кошелька."""
+    if connection.vendor != "postgresql":
+        return timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT clock_timestamp()")
+        return cursor.fetchone()[0]
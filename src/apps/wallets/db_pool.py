@@ -0,0 +1,91 @@
+"""
+Метрики пула соединений psycopg 3.
+
+Пул создаёт Django, если в OPTIONS["pool"] базы PostgreSQL заданы
+параметры (DB_POOL_OPTIONS в настройках). Коллектор при каждом сборе
+метрик читает pool.get_stats(): занятые и свободные соединения,
+ожидающие запросы и накопленные счётчики выдач из пула.
+"""
+
+from django.db import connections
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+
+def database_pools() -> dict:
+    """Пулы соединений по алиасам баз, для которых они включены."""
+    pools = {}
+    for alias in connections:
+        wrapper = connections[alias]
+        if wrapper.vendor == "postgresql" and wrapper.settings_dict.get(
+            "OPTIONS", {}
+        ).get("pool"):
+            pools[alias] = wrapper.pool
+    return pools
+
+
+class DatabasePoolCollector(Collector):
+    def __init__(self, pools=database_pools):
+        self.pools = pools
+
+    def collect(self):
+        connections_family = GaugeMetricFamily(
+            "wallets_db_pool_connections",
+            "Соединения пула: in_use — выданы, idle — свободны.",
+            labels=["alias", "state"],
+        )
+        max_size = GaugeMetricFamily(
+            "wallets_db_pool_max_size",
+            "Максимальный размер пула.",
+            labels=["alias"],
+        )
+        waiting = GaugeMetricFamily(
+            "wallets_db_pool_waiting",
+            "Запросы, ждущие свободного соединения.",
+            labels=["alias"],
+        )
+        checkouts = CounterMetricFamily(
+            "wallets_db_pool_checkouts",
+            "Выдачи соединений из пула.",
+            labels=["alias"],
+        )
+        wait_seconds = CounterMetricFamily(
+            "wallets_db_pool_checkout_wait_seconds",
+            "Суммарное ожидание свободного соединения при выдаче.",
+            labels=["alias"],
+        )
+        timeouts = CounterMetricFamily(
+            "wallets_db_pool_checkout_timeouts",
+            "Выдачи, не дождавшиеся соединения за DB_POOL_TIMEOUT.",
+            labels=["alias"],
+        )
+        lost = CounterMetricFamily(
+            "wallets_db_pool_connections_lost",
+            "Соединения, не прошедшие проверку при выдаче.",
+            labels=["alias"],
+        )
+        for alias, pool in self.pools().items():
+            # Счётчики, которые ещё не увеличивались, в get_stats нет.
+            stats = pool.get_stats()
+            available = stats.get("pool_available", 0)
+            connections_family.add_metric(
+                [alias, "in_use"], stats.get("pool_size", 0) - available
+            )
+            connections_family.add_metric([alias, "idle"], available)
+            max_size.add_metric([alias], stats.get("pool_max", 0))
+            waiting.add_metric([alias], stats.get("requests_waiting", 0))
+            checkouts.add_metric([alias], stats.get("requests_num", 0))
+            wait_seconds.add_metric(
+                [alias], stats.get("requests_wait_ms", 0) / 1000
+            )
+            timeouts.add_metric([alias], stats.get("requests_errors", 0))
+            lost.add_metric([alias], stats.get("connections_lost", 0))
+        yield from (
+            connections_family,
+            max_size,
+            waiting,
+            checkouts,
+            wait_seconds,
+            timeouts,
+            lost,
+        )
@@ -0,0 +1,20 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class IdempotencyKeyMismatch(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "Idempotency-Key уже использован для другого запроса."
+    default_code = "idempotency_key_mismatch"
+
+
+class WalletBusy(APIException):
+    """Бюджет ожидания блокировки кошелька исчерпан."""
+
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Кошелёк занят другими операциями, повторите позже."
+    default_code = "wallet_busy"
+
+    def __init__(self, detail=None, code=None, wait: int | None = None):
+        super().__init__(detail, code)
+        self.wait = wait
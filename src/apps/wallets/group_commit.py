@@ -0,0 +1,177 @@
+"""
+Групповой коммит пополнений одного кошелька.
+
+Первый запрос на пополнение кошелька становится ведущим: он ждёт
+WINDOW_MS или пока не наберётся MAX_BATCH_SIZE пополнений, после чего
+одним UPDATE ... RETURNING меняет баланс и одним bulk_create сохраняет
+операции всех ожидавших запросов с балансом после каждой из них.
+Каждый запрос получает свою операцию. Остальные запросы ждут коммита
+не дольше остатка своего дедлайна (budgets): если ведущий до него
+не взял группу в работу, запрос выходит из неё и получает WalletBusy.
+Пополнения объединяются только внутри процесса, поэтому выигрыш есть
+при многопоточных воркерах (gunicorn --threads).
+"""
+
+import threading
+from decimal import Decimal
+from uuid import UUID
+
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework.exceptions import NotFound
+
+from apps.wallets import budgets, clock, metrics, outbox, sharding, timing
+from apps.wallets.cache import balance_cache
+from apps.wallets.models import Operation, OperationType, Wallet
+
+ADD_TO_BALANCE_SQL = """
+    UPDATE {wallet_table}
+    SET {balance} = {balance} + %s
+    WHERE {wallet_pk} = %s
+    RETURNING CASE WHEN {bucket_count} = 0 THEN {balance} END
+"""
+CENT = Decimal("0.01")
+
+
+class _Batch:
+    def __init__(self):
+        self.operations: list[Operation] = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.error: Exception | None = None
+
+
+class GroupCommitter:
+    def __init__(self):
+        self._pending: dict[UUID, _Batch] = {}
+        self._lock = threading.Lock()
+
+    def deposit(self, wallet_id: UUID, amount: Decimal) -> Operation:
+        """Пополнить кошелёк вместе с другими пополнениями из окна."""
+        config = settings.WALLETS_GROUP_COMMIT
+        operation = Operation(
+            wallet_id=wallet_id,
+            amount=amount,
+            operation_type=OperationType.DEPOSIT,
+        )
+        with self._lock:
+            batch = self._pending.get(wallet_id)
+            is_leader = batch is None
+            if is_leader:
+                batch = self._pending[wallet_id] = _Batch()
+            batch.operations.append(operation)
+            if len(batch.operations) >= config["MAX_BATCH_SIZE"]:
+                del self._pending[wallet_id]
+                batch.full.set()
+
+        if is_leader:
+            batch.full.wait(timeout=config["WINDOW_MS"] / 1000)
+            with self._lock:
+                if self._pending.get(wallet_id) is batch:
+                    del self._pending[wallet_id]
+            self._commit(wallet_id, batch)
+        else:
+            self._wait(wallet_id, batch, operation)
+        if batch.error is not None:
+            raise batch.error
+        return operation
+
+    def _wait(
+        self, wallet_id: UUID, batch: _Batch, operation: Operation
+    ) -> None:
+        """
+        Дождаться коммита группы в пределах дедлайна запроса. Группу,
+        которую ведущий уже коммитит, нужно дождаться: пополнение может
+        быть уже применено.
+        """
+        left = budgets.remaining()
+        if batch.done.wait(timeout=None if left is None else max(left, 0)):
+            return
+        with self._lock:
+            pending = self._pending.get(wallet_id) is batch
+            if pending:
+                batch.operations.remove(operation)
+        if pending:
+            raise budgets.exhausted(wallet_id)
+        batch.done.wait()
+
+    @staticmethod
+    def _commit(wallet_id: UUID, batch: _Batch) -> None:
+        metrics.GROUP_COMMIT_BATCH_SIZE.observe(len(batch.operations))
+        total = sum(operation.amount for operation in batch.operations)
+        try:
+            with transaction.atomic(), budgets.lock_budget(wallet_id):
+                bucket_count = sharding.registry.bucket_count(wallet_id)
+                if bucket_count:
+                    balance = None
+                    updated = sharding.deposit_to_bucket(
+                        wallet_id, bucket_count, total
+                    )
+                else:
+                    updated, balance = _add_to_balance(wallet_id, total)
+                if not updated:
+                    raise NotFound()
+                _stamp(batch.operations, balance)
+                Operation.objects.bulk_create(batch.operations)
+                outbox.record(batch.operations)
+                balance_cache.invalidate_on_commit(wallet_id)
+        except Exception as error:
+            batch.error = error
+        finally:
+            batch.done.set()
+
+
+def _add_to_balance(
+    wallet_id: UUID, amount: Decimal
+) -> tuple[bool, Decimal | None]:
+    """
+    Пополнить строку кошелька. Возвращает, нашлась ли строка, и новый
+    баланс; баланс None, если кошелёк уже разделён, а реестр процесса
+    этого ещё не знает.
+    """
+    quote = connection.ops.quote_name
+    meta = Wallet._meta
+    balance_field = meta.get_field("balance")
+    sql = ADD_TO_BALANCE_SQL.format(
+        wallet_table=quote(meta.db_table),
+        wallet_pk=quote(meta.pk.column),
+        balance=quote(balance_field.column),
+        bucket_count=quote(meta.get_field("bucket_count").column),
+    )
+    with connection.cursor() as cursor, timing.measure("lock_wait"):
+        cursor.execute(
+            sql, [amount, meta.pk.get_db_prep_value(wallet_id, connection)]
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return False, None
+    if row[0] is None:
+        return True, None
+    return True, balance_field.to_python(row[0]).quantize(CENT)
+
+
+def _stamp(operations: list[Operation], balance: Decimal | None) -> None:
+    """
+    Назначить операциям пачки created_at и balance_after после
+    изменения баланса: пополнения применяются в порядке пачки.
+    У операций корзин (balance is None) balance_after пуст.
+    """
+    if balance is not None:
+        balance -= sum(operation.amount for operation in operations)
+    # Одно время на пачку: порядок внутри неё задают возрастающие id.
+    created_at = clock.now()
+    for operation in operations:
+        operation.created_at = created_at
+        if balance is not None:
+            balance += operation.amount
+            operation.balance_after = balance
+
+
+def publish_settings() -> None:
+    """Выставить метрики настроек группового коммита при запуске."""
+    config = settings.WALLETS_GROUP_COMMIT
+    metrics.GROUP_COMMIT_WINDOW.set(config["WINDOW_MS"] / 1000)
+    metrics.GROUP_COMMIT_MAX_BATCH_SIZE.set(config["MAX_BATCH_SIZE"])
+
+
+committer = GroupCommitter()
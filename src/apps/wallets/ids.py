@@ -0,0 +1,45 @@
+"""
+Упорядоченные по времени UUID версии 7 (RFC 9562).
+
+Старшие 48 бит — время Unix в миллисекундах, поэтому новые ключи
+попадают в правую часть индекса первичного ключа, а не на случайную
+страницу, как uuid4. 12 бит rand_a — счётчик внутри миллисекунды
+(метод 1 раздела 6.2 RFC): ключи процесса строго возрастают, даже
+если часы отстали. Остальные 62 бита случайные. Это обычные UUID,
+поэтому они уживаются со старыми uuid4 и конвертером <uuid:...>.
+"""
+
+import os
+import threading
+import time
+from uuid import UUID
+
+_COUNTER_MAX = 0xFFF
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> UUID:
+    """Новый UUIDv7, строго больше предыдущего в этом процессе."""
+    global _last_ms, _counter
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            _counter = int.from_bytes(os.urandom(2)) & 0x7FF
+        elif _counter < _COUNTER_MAX:
+            _counter += 1
+        else:
+            # Счётчик исчерпан: занимаем следующую миллисекунду.
+            _last_ms += 1
+            _counter = 0
+        timestamp_ms, counter = _last_ms, _counter
+    random_bits = int.from_bytes(os.urandom(8)) & (2**62 - 1)
+    return UUID(
+        int=(timestamp_ms << 80)
+        | (0x7 << 76)
+        | (counter << 64)
+        | (0b10 << 62)
+        | random_bits
+    )
@@ -0,0 +1,241 @@
+"""
+Потоковый импорт операций из CSV или NDJSON.
+
+Формат строк совпадает с выгрузкой (exports.EXPORT_FIELDS), id
+и created_at необязательны. Строки читаются и проверяются порциями,
+каждая порция записывается одной транзакцией: недостающие кошельки,
+операции (COPY на PostgreSQL, bulk_create на остальных БД), изменение
+балансов одним UPDATE на группу кошельков и ImportCheckpoint с числом
+обработанных строк. Поэтому прерванный импорт продолжается с первой
+незаписанной строки, и ни одна порция не применяется дважды. Порция,
+после которой баланс какого-либо кошелька стал бы отрицательным,
+не записывается, и импорт останавливается на ней.
+"""
+
+import csv
+import json
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Callable, Iterable, Iterator, TextIO
+from uuid import UUID
+
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.wallets import balance_history, ledger, rollups
+from apps.wallets.cache import balance_cache
+from apps.wallets.exports import EXPORT_FIELDS
+from apps.wallets.ledger import CENT
+from apps.wallets.models import (
+    ImportCheckpoint,
+    Operation,
+    OperationType,
+    Wallet,
+)
+from apps.wallets.wallet_service import WalletService
+
+BALANCE_BATCH_SIZE = 500
+COPY_FIELDS = ("id", "amount", "operation_type", "wallet", "created_at")
+IMPORT_FIELDS = frozenset(EXPORT_FIELDS)
+MAX_AMOUNT = Decimal("1e13")
+OPERATION_TYPES = frozenset(OperationType.values)
+
+
+@dataclass
+class ImportReport:
+    """Итог импорта."""
+
+    skipped: int = 0
+    imported: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+
+class ImportAborted(Exception):
+    """Ошибок в строках больше допустимого; report — итог до остановки."""
+
+    def __init__(self, report: ImportReport):
+        super().__init__(f"Строк с ошибками: {len(report.errors)}")
+        self.report = report
+
+
+class NegativeBalance(ValueError):
+    """Порция оставила бы кошельки с отрицательным балансом."""
+
+    def __init__(self, wallet_ids: list[UUID]):
+        super().__init__(
+            "отрицательный баланс кошельков: "
+            + ", ".join(str(wallet_id) for wallet_id in wallet_ids)
+        )
+
+
+def _ndjson_lines(stream: TextIO) -> Iterator[str]:
+    return (line for line in stream if line.strip())
+
+
+# Чтение записей и их разбор разделены, чтобы ошибка в одной строке
+# NDJSON не прерывала чтение файла.
+ROW_READERS = {
+    "csv": (csv.DictReader, dict),
+    "ndjson": (_ndjson_lines, json.loads),
+}
+
+
+def parse_operation(row: dict) -> Operation:
+    """Проверить строку и построить операцию; ошибка — ValueError."""
+    unknown = row.keys() - IMPORT_FIELDS
+    if unknown:
+        fields = ", ".join(sorted(map(str, unknown)))
+        raise ValueError(f"неизвестные поля: {fields}")
+    operation_type = row.get("operation_type")
+    if operation_type not in OPERATION_TYPES:
+        raise ValueError(f"неизвестный тип операции: {operation_type}")
+    try:
+        amount = Decimal(row.get("amount") or "")
+    except InvalidOperation:
+        raise ValueError(f"некорректная сумма: {row.get('amount')}")
+    if (
+        not amount.is_finite()
+        or not CENT <= amount < MAX_AMOUNT
+        or amount != amount.quantize(CENT)
+    ):
+        raise ValueError(f"некорректная сумма: {amount}")
+    values = {
+        "wallet_id": UUID(row.get("wallet_id") or ""),
+        "amount": amount,
+        "operation_type": operation_type,
+    }
+    if row.get("id"):
+        values["id"] = UUID(row["id"])
+    if row.get("created_at"):
+        created_at = parse_datetime(row["created_at"])
+        if created_at is None:
+            raise ValueError(f"некорректная дата: {row['created_at']}")
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at)
+        values["created_at"] = created_at
+    return Operation(**values)
+
+
+def import_operations(
+    stream: TextIO,
+    import_format: str,
+    name: str,
+    chunk_size: int = 10000,
+    max_errors: int = 0,
+    on_progress: Callable[[ImportReport], None] | None = None,
+) -> ImportReport:
+    """
+    Импортировать операции из stream, продолжив с контрольной точки name.
+
+    Строки с ошибками пропускаются. Когда их становится больше
+    max_errors, вызывается ImportAborted: порция с последней ошибкой
+    не записывается, и следующий запуск начнёт с неё. Так же
+    останавливает импорт порция, после которой баланс кошелька стал бы
+    отрицательным; ошибка записывается на её последнюю строку.
+    """
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(name=name)
+    report = ImportReport(skipped=checkpoint.rows)
+    read, decode = ROW_READERS[import_format]
+    rows = enumerate(read(stream), start=1)
+    next(islice(rows, checkpoint.rows, checkpoint.rows), None)
+    while chunk := list(islice(rows, chunk_size)):
+        operations = []
+        for number, row in chunk:
+            try:
+                operations.append(parse_operation(decode(row)))
+            except (ValueError, TypeError, AttributeError) as error:
+                report.errors.append((number, str(error)))
+        if len(report.errors) > max_errors:
+            raise ImportAborted(report)
+        try:
+            write_chunk(name, chunk[-1][0], operations)
+        except NegativeBalance as error:
+            report.errors.append((chunk[-1][0], str(error)))
+            raise ImportAborted(report)
+        report.imported += len(operations)
+        if on_progress is not None:
+            on_progress(report)
+    return report
+
+
+def write_chunk(name: str, rows: int, operations: list[Operation]) -> None:
+    """
+    Записать порцию операций и сдвинуть контрольную точку на rows.
+    NegativeBalance откатывает порцию целиком.
+    """
+    with transaction.atomic():
+        ImportCheckpoint.objects.select_for_update().filter(name=name).update(
+            rows=rows
+        )
+        if not operations:
+            return
+        wallet_ids = {operation.wallet_id for operation in operations}
+        Wallet.objects.bulk_create(
+            [Wallet(id=wallet_id) for wallet_id in wallet_ids],
+            ignore_conflicts=True,
+        )
+        if connection.vendor == "postgresql":
+            _copy_operations(operations)
+        else:
+            Operation.objects.bulk_create(operations)
+        _apply_balances(operations)
+        # Сверка должна перечитать журнал кошельков целиком.
+        ledger.reset_checkpoints(wallet_ids)
+        rollups.include_backdated(operations)
+        balance_history.reset_after(operations)
+        for wallet_id in wallet_ids:
+            balance_cache.invalidate_on_commit(wallet_id)
+
+
+def _copy_operations(operations: Iterable[Operation]) -> None:
+    meta = Operation._meta
+    quote = connection.ops.quote_name
+    fields = [meta.get_field(name) for name in COPY_FIELDS]
+    columns = ", ".join(quote(field.column) for field in fields)
+    sql = f"COPY {quote(meta.db_table)} ({columns}) FROM STDIN"
+    with connection.cursor() as cursor:
+        with cursor.copy(sql) as copy:
+            for operation in operations:
+                copy.write_row(
+                    [getattr(operation, field.attname) for field in fields]
+                )
+
+
+def _apply_balances(operations: Iterable[Operation]) -> None:
+    deltas = {}
+    for operation in operations:
+        deltas[operation.wallet_id] = deltas.get(
+            operation.wallet_id, Decimal("0.00")
+        ) + WalletService.signed_amount(
+            operation.operation_type, operation.amount
+        )
+    wallet_ids = sorted(deltas)
+    for start in range(0, len(wallet_ids), BALANCE_BATCH_SIZE):
+        batch = wallet_ids[start : start + BALANCE_BATCH_SIZE]
+        Wallet.objects.filter(id__in=batch).update(
+            balance=F("balance")
+            + Case(
+                *[
+                    When(id=wallet_id, then=Value(deltas[wallet_id]))
+                    for wallet_id in batch
+                ],
+                output_field=DecimalField(max_digits=15, decimal_places=2),
+            )
+        )
+        # Уйти в минус могут только кошельки с отрицательным итогом.
+        negative = list(
+            Wallet.objects.with_total_balance()
+            .filter(
+                id__in=[
+                    wallet_id for wallet_id in batch if deltas[wallet_id] < 0
+                ],
+                total_balance__lt=0,
+            )
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        if negative:
+            raise NegativeBalance(negative)
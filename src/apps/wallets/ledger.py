@@ -0,0 +1,262 @@
+"""
+Сверка балансов кошельков с журналом операций.
+
+Баланс кошелька (вместе с корзинами) должен быть равен сумме
+пополнений минус сумма снятий. Чтобы не читать весь журнал при каждой
+сверке, для кошелька хранится LedgerCheckpoint: последняя учтённая
+операция и сумма журнала до неё включительно. Следующая сверка читает
+только операции новее контрольной точки.
+
+Операции архивированных секций (partitions) в журнале уже нет, их сумма
+хранится в LedgerCheckpoint.archived_balance и служит началом журнала.
+
+created_at операции назначается до коммита, поэтому операция может
+появиться в журнале позже более новых. Контрольная точка сдвигается
+только до операций старше settled_before.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from uuid import UUID
+
+import django
+from django.db import transaction
+from django.db.models import (
+    Case,
+    DecimalField,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+from apps.wallets import sharding
+from apps.wallets.cache import balance_cache
+from apps.wallets.models import (
+    LedgerCheckpoint,
+    Operation,
+    OperationType,
+    Wallet,
+)
+
+AMOUNT_FIELD = DecimalField(max_digits=15, decimal_places=2)
+ZERO = Value(Decimal("0.00"), output_field=AMOUNT_FIELD)
+SIGNED_AMOUNT = Case(
+    When(operation_type=OperationType.DEPOSIT, then=F("amount")),
+    When(
+        operation_type__in=[OperationType.WITHDRAW, OperationType.TRANSFER],
+        then=-F("amount"),
+    ),
+    default=ZERO,
+    output_field=AMOUNT_FIELD,
+)
+NO_CHECKPOINT = Value(datetime.min.replace(tzinfo=dt_timezone.utc))
+CHECKPOINT_BATCH_SIZE = 1000
+CENT = Decimal("0.01")
+
+
+@dataclass
+class Drift:
+    """Расхождение баланса кошелька с журналом."""
+
+    wallet_id: UUID
+    balance: Decimal
+    ledger: Decimal
+
+    @property
+    def difference(self) -> Decimal:
+        return self.balance - self.ledger
+
+
+@dataclass
+class RangeReport:
+    """Результат сверки диапазона кошельков."""
+
+    checked: int = 0
+    checkpoints: int = 0
+    drifts: list[Drift] = field(default_factory=list)
+
+
+def init_worker() -> None:
+    """Подготовить процесс пула: Django при запуске через spawn."""
+    django.setup()
+
+
+def wallet_ranges(count: int) -> list[tuple[UUID | None, UUID | None]]:
+    """
+    Разбить кошельки на count диапазонов id примерно равного размера.
+
+    Границы берутся из индекса первичного ключа, поэтому диапазоны
+    ровные при любом распределении id. Граница None означает, что
+    диапазон не ограничен с этой стороны.
+    """
+    wallet_ids = Wallet.objects.order_by("id").values_list("id", flat=True)
+    total = wallet_ids.count()
+    bounds = sorted(
+        {wallet_ids[total * index // count] for index in range(1, count)}
+        if total
+        else set()
+    )
+    edges = [None, *bounds, None]
+    return list(zip(edges, edges[1:]))
+
+
+def verify_range(
+    lower: UUID | None,
+    upper: UUID | None,
+    settled_before: datetime,
+    full: bool = False,
+) -> RangeReport:
+    """
+    Сверить кошельки с id в [lower, upper) и сдвинуть их контрольные точки.
+
+    Баланс и суммы журнала читаются одним запросом, поэтому видят
+    один снимок БД. При full контрольные точки не используются,
+    и журнал читается целиком.
+    """
+    wallets = Wallet.objects.with_total_balance().order_by("id")
+    if lower is not None:
+        wallets = wallets.filter(id__gte=lower)
+    if upper is not None:
+        wallets = wallets.filter(id__lt=upper)
+
+    operations = Operation.objects.filter(wallet=OuterRef("pk"))
+    if full:
+        checkpoint_balance = Coalesce(
+            F("ledger_checkpoint__archived_balance"),
+            ZERO,
+            output_field=AMOUNT_FIELD,
+        )
+    else:
+        checkpoint_created_at = Coalesce(
+            OuterRef("ledger_checkpoint__last_operation_created_at"),
+            NO_CHECKPOINT,
+        )
+        operations = operations.filter(
+            Q(created_at__gt=checkpoint_created_at)
+            | Q(
+                created_at=checkpoint_created_at,
+                id__gt=OuterRef("ledger_checkpoint__last_operation_id"),
+            )
+        )
+        checkpoint_balance = Coalesce(
+            F("ledger_checkpoint__balance"), ZERO, output_field=AMOUNT_FIELD
+        )
+    settled = operations.filter(created_at__lt=settled_before)
+    last_settled = settled.order_by("-created_at", "-id")
+
+    rows = wallets.annotate(
+        checkpoint_balance=checkpoint_balance,
+        new_delta=_signed_sum(operations),
+        settled_delta=_signed_sum(settled),
+        settled_created_at=Subquery(last_settled.values("created_at")[:1]),
+        settled_id=Subquery(last_settled.values("id")[:1]),
+    ).values_list(
+        "id",
+        "total_balance",
+        "checkpoint_balance",
+        "new_delta",
+        "settled_delta",
+        "settled_created_at",
+        "settled_id",
+    )
+
+    report = RangeReport()
+    checkpoints = []
+    for (
+        wallet_id,
+        balance,
+        base,
+        new_delta,
+        settled_delta,
+        settled_created_at,
+        settled_id,
+    ) in rows.iterator(chunk_size=CHECKPOINT_BATCH_SIZE):
+        report.checked += 1
+        balance = balance.quantize(CENT)
+        expected = (base + new_delta).quantize(CENT)
+        if balance != expected:
+            report.drifts.append(Drift(wallet_id, balance, expected))
+        if settled_id is not None:
+            checkpoints.append(
+                LedgerCheckpoint(
+                    wallet_id=wallet_id,
+                    balance=(base + settled_delta).quantize(CENT),
+                    last_operation_created_at=settled_created_at,
+                    last_operation_id=settled_id,
+                )
+            )
+    LedgerCheckpoint.objects.bulk_create(
+        checkpoints,
+        batch_size=CHECKPOINT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["wallet"],
+        update_fields=[
+            "balance",
+            "last_operation_created_at",
+            "last_operation_id",
+            "checked_at",
+        ],
+    )
+    report.checkpoints = len(checkpoints)
+    return report
+
+
+def repair_wallet(wallet_id: UUID) -> Decimal | None:
+    """
+    Привести баланс кошелька к сумме его журнала.
+
+    Кошелёк блокируется, корзины собираются в его строку, и журнал
+    пересчитывается целиком уже под блокировкой. Возвращает новый
+    баланс или None, если кошелька нет или журнал даёт отрицательный
+    баланс: такое расхождение нужно разбирать вручную.
+    """
+    with transaction.atomic():
+        wallet = (
+            Wallet.objects.select_for_update().filter(id=wallet_id).first()
+        )
+        if wallet is None:
+            return None
+        # Журнал читается после блокировки корзин, чтобы учесть
+        # пополнения корзин, закоммиченные до неё.
+        sharding.fold_buckets({wallet.id: wallet})
+        balance = Operation.objects.filter(wallet_id=wallet_id).aggregate(
+            total=Coalesce(Sum(SIGNED_AMOUNT), ZERO)
+        )["total"] + archived_balance(wallet_id)
+        if balance < 0:
+            transaction.set_rollback(True)
+            return None
+        wallet.balance = balance.quantize(CENT)
+        wallet.save(update_fields=["balance"])
+        balance_cache.invalidate_on_commit(wallet_id)
+    return wallet.balance
+
+
+def archived_balance(wallet_id: UUID) -> Decimal:
+    """Сумма операций кошелька, перенесённых в архив."""
+    checkpoint = LedgerCheckpoint.objects.filter(wallet_id=wallet_id).first()
+    return checkpoint.archived_balance if checkpoint else Decimal("0.00")
+
+
+def reset_checkpoints(wallet_ids) -> None:
+    """Заставить сверку перечитать живой журнал кошельков целиком."""
+    LedgerCheckpoint.objects.filter(wallet_id__in=wallet_ids).update(
+        balance=F("archived_balance"),
+        last_operation_created_at=NO_CHECKPOINT.value,
+        last_operation_id=UUID(int=0),
+    )
+
+
+def _signed_sum(operations) -> Coalesce:
+    total = (
+        operations.values("wallet")
+        .annotate(total=Sum(SIGNED_AMOUNT))
+        .values("total")
+    )
+    return Coalesce(Subquery(total), ZERO, output_field=AMOUNT_FIELD)
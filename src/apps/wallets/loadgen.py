@@ -0,0 +1,213 @@
+"""Простой генератор HTTP-нагрузки для бенчмарков сервиса."""
+
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import accumulate
+from pathlib import Path
+from typing import Callable, Iterator
+from urllib.parse import urlsplit
+
+# Фабрика запросов: (номер клиента) -> (метод, путь, тело или None).
+RequestFactory = Callable[[int], tuple[str, str, dict | None]]
+
+
+@dataclass
+class LoadResult:
+    elapsed: float = 0.0
+    errors: int = 0
+    rejected: int = 0
+    latencies: list[float] = field(default_factory=list)
+
+    def summary(self) -> dict:
+        requests = len(self.latencies) + self.errors
+        if len(self.latencies) < 2:
+            # quantiles требует хотя бы двух точек: одна задержка или
+            # её отсутствие (все запросы с ошибкой) — это все процентили.
+            quantiles = (self.latencies or [0.0]) * 99
+        else:
+            quantiles = statistics.quantiles(
+                self.latencies, n=100, method="inclusive"
+            )
+        return {
+            "requests": requests,
+            "throughput_rps": (
+                round(requests / self.elapsed, 1) if self.elapsed else 0
+            ),
+            "error_rate": round(self.errors / requests, 4) if requests else 0,
+            "rejected_rate": (
+                round(self.rejected / requests, 4) if requests else 0
+            ),
+            "latency_ms": {
+                "p50": round(quantiles[49] * 1000, 2),
+                "p95": round(quantiles[94] * 1000, 2),
+                "p99": round(quantiles[98] * 1000, 2),
+            },
+        }
+
+
+def run_load(
+    base_url: str,
+    make_request: RequestFactory,
+    clients: int,
+    duration: float,
+) -> LoadResult:
+    """
+    Нагрузить сервер clients параллельными клиентами на duration секунд.
+
+    Каждый клиент держит своё keep-alive соединение. Ошибкой считается
+    ответ 5xx или сбой соединения, отказом — ответ 4xx; задержки
+    учитываются для всех ответов, кроме ошибок.
+    """
+    url = urlsplit(base_url)
+    result = LoadResult()
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        connection = http.client.HTTPConnection(url.hostname, url.port)
+        latencies, errors, rejected = [], 0, 0
+        while time.monotonic() < deadline:
+            method, path, body = make_request(index)
+            started = time.perf_counter()
+            try:
+                connection.request(
+                    method,
+                    path,
+                    body=json.dumps(body) if body is not None else None,
+                    headers={"Content-Type": "application/json"},
+                )
+                response = connection.getresponse()
+                response.read()
+                failed = response.status >= 500
+                rejected += 400 <= response.status < 500
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(url.hostname, url.port)
+                failed = True
+            if failed:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            result.latencies.extend(latencies)
+            result.errors += errors
+            result.rejected += rejected
+
+    threads = [
+        threading.Thread(target=client, args=(index,))
+        for index in range(clients)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.elapsed = time.monotonic() - started
+    return result
+
+
+@contextmanager
+def serve(
+    directory: Path,
+    port: int,
+    workers: int,
+    profile: str = "wsgi",
+    env: dict[str, str] | None = None,
+) -> Iterator[subprocess.Popen]:
+    """
+    Запустить gunicorn сервиса на 127.0.0.1:port на время блока.
+
+    env дополняет окружение процесса сервера.
+    """
+    server = subprocess.Popen(
+        [
+            "gunicorn",
+            "--config",
+            "gunicorn.conf.py",
+            "--bind",
+            f"127.0.0.1:{port}",
+            "--workers",
+            str(workers),
+            "--access-logfile",
+            "/dev/null",
+        ],
+        cwd=directory,
+        env={**os.environ, "SERVER_PROFILE": profile, **(env or {})},
+    )
+    try:
+        wait_for_port(port)
+        yield server
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), 1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Сервер не запустился на порту {port}")
+
+
+def zipf_picker(items: list, exponent: float) -> Callable[[], object]:
+    """Выбор элемента с вероятностью, обратной рангу в степени exponent."""
+    cum_weights = list(
+        accumulate(1 / rank**exponent for rank in range(1, len(items) + 1))
+    )
+    return lambda: random.choices(items, cum_weights=cum_weights)[0]
+
+
+# Допустимое ухудшение метрики: (путь в сводке, больше — лучше).
+REGRESSION_METRICS = (
+    (("throughput_rps",), True),
+    (("latency_ms", "p95"), False),
+    (("latency_ms", "p99"), False),
+)
+ERROR_RATE_TOLERANCE = 0.01
+
+
+def find_regressions(
+    current: dict, baseline: dict, tolerance: float
+) -> list[str]:
+    """
+    Сравнить сценарии прогона с базовым прогоном.
+
+    Регрессия — пропускная способность ниже базовой или p95/p99
+    выше базовых больше чем на долю tolerance, либо доля ошибок выше
+    базовой больше чем на ERROR_RATE_TOLERANCE.
+    """
+    regressions = []
+    for name, summary in current["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        for path, higher_is_better in REGRESSION_METRICS:
+            value, expected = summary, base
+            for key in path:
+                value, expected = value[key], expected[key]
+            change = (value - expected) / expected if expected else 0
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(
+                    f"{name}: {'.'.join(path)} {expected} -> {value}"
+                    f" ({change:+.0%})"
+                )
+        if summary["error_rate"] - base["error_rate"] > ERROR_RATE_TOLERANCE:
+            regressions.append(
+                f"{name}: error_rate {base['error_rate']}"
+                f" -> {summary['error_rate']}"
+            )
+    return regressions
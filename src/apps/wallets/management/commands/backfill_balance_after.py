@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from apps.wallets.balance_history import backfill_wallet
+from apps.wallets.models import Operation, Wallet
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет balance_after операций, у которых он пуст: порциями,"
+        " от новых операций кошелька к старым. Разделённые кошельки"
+        " пропускаются. Прерванный запуск можно повторить."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--wallet",
+            action="append",
+            dest="wallets",
+            help="Только этот кошелёк; можно указать несколько раз.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        wallet_ids = options["wallets"] or (
+            Wallet.objects.filter(
+                id__in=Operation.objects.filter(
+                    balance_after__isnull=True
+                ).values("wallet_id")
+            )
+            .order_by("id")
+            .values_list("id", flat=True)
+            .iterator()
+        )
+        filled = wallets = skipped = 0
+        for wallet_id in wallet_ids:
+            count = backfill_wallet(wallet_id, options["chunk_size"])
+            if count is None:
+                skipped += 1
+                continue
+            filled += count
+            wallets += 1
+        self.stdout.write(
+            f"Заполнено операций: {filled}; кошельков: {wallets};"
+            f" пропущено разделённых кошельков: {skipped}"
+        )
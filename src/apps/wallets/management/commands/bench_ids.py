@@ -0,0 +1,85 @@
+import time
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.wallets.ids import uuid7
+
+GENERATORS = {"uuid4": uuid4, "uuid7": uuid7}
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает вставку в таблицу с первичным ключом uuid4 и uuid7:"
+        " скорость вставки (всего и на последних 10% строк) и размер"
+        " индекса первичного ключа."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000_000)
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        self.stdout.write(f"База: {connection.vendor}; строк: {rows}")
+        for name, generate in GENERATORS.items():
+            table = f"bench_ids_{name}"
+            self._execute(f"DROP TABLE IF EXISTS {table}")
+            self._execute(
+                f"CREATE TABLE {table}"
+                f" (id {self._uuid_type()} PRIMARY KEY, n integer NOT NULL)"
+            )
+            try:
+                elapsed, tail_elapsed = self._insert(
+                    table, generate, rows, options["batch_size"]
+                )
+                index_size = self._index_size(table)
+            finally:
+                self._execute(f"DROP TABLE {table}")
+            tail_rows = rows - rows * 9 // 10
+            self.stdout.write(
+                f"{name}: {rows / elapsed:10.0f} строк/с;"
+                f" последние 10%: {tail_rows / tail_elapsed:10.0f} строк/с;"
+                f" индекс: {index_size}"
+            )
+
+    def _insert(self, table, generate, rows, batch_size):
+        sql = f"INSERT INTO {table} (id, n) VALUES (%s, %s)"
+        native = connection.vendor == "postgresql"
+        tail_start = rows * 9 // 10
+        started = tail_started = time.perf_counter()
+        for start in range(0, rows, batch_size):
+            if start <= tail_start < start + batch_size:
+                tail_started = time.perf_counter()
+            batch = [
+                (value if native else value.hex, number)
+                for number, value in (
+                    (number, generate())
+                    for number in range(start, min(start + batch_size, rows))
+                )
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+        finished = time.perf_counter()
+        return finished - started, finished - tail_started
+
+    @staticmethod
+    def _uuid_type():
+        return "uuid" if connection.vendor == "postgresql" else "char(32)"
+
+    @staticmethod
+    def _index_size(table):
+        if connection.vendor != "postgresql":
+            return "н/д (только PostgreSQL)"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_size_pretty(pg_relation_size(%s::regclass))",
+                [f"{table}_pkey"],
+            )
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def _execute(sql):
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
@@ -0,0 +1,113 @@
+import json
+import random
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from uuid import uuid4
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from apps.wallets.models import ImportCheckpoint, OperationType, Wallet
+
+
+def generate(rows, wallets):
+    """Синтетические операции: пополнения и редкие снятия."""
+    wallet_ids = [str(uuid4()) for _ in range(wallets)]
+    started = timezone.now() - timedelta(days=365)
+    for index in range(rows):
+        yield {
+            "id": str(uuid4()),
+            "wallet_id": wallet_ids[index % wallets],
+            "operation_type": (
+                OperationType.WITHDRAW
+                if index >= wallets and random.random() < 0.1
+                else OperationType.DEPOSIT
+            ),
+            "amount": "1.00" if index >= wallets else "1000000.00",
+            "created_at": (started + timedelta(seconds=index)).isoformat(),
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает скорость импорта операций: loaddata против"
+        " import_operations на одних и тех же данных."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000)
+        parser.add_argument("--wallets", type=int, default=100)
+        parser.add_argument("--chunk-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        rows = list(generate(options["rows"], options["wallets"]))
+        wallet_ids = {row["wallet_id"] for row in rows}
+        self.stdout.write(
+            f"База: {connection.vendor}; операций: {len(rows)};"
+            f" кошельков: {len(wallet_ids)}"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            fixture = Path(directory) / "operations.json"
+            ndjson = Path(directory) / "operations.ndjson"
+            fixture.write_text(json.dumps(self._fixture(rows, wallet_ids)))
+            ndjson.write_text("".join(json.dumps(row) + "\n" for row in rows))
+            runs = {
+                "loaddata": lambda: call_command(
+                    "loaddata", str(fixture), verbosity=0
+                ),
+                "import": lambda: call_command(
+                    "import_operations",
+                    str(ndjson),
+                    chunk_size=options["chunk_size"],
+                    stdout=StringIO(),
+                ),
+            }
+            for name, run in runs.items():
+                started = time.perf_counter()
+                try:
+                    run()
+                    elapsed = time.perf_counter() - started
+                finally:
+                    Wallet.objects.filter(id__in=wallet_ids).delete()
+                    ImportCheckpoint.objects.filter(
+                        name=str(ndjson.resolve())
+                    ).delete()
+                self.stdout.write(
+                    f"{name:>8}: {len(rows) / elapsed:10.1f} строк/с;"
+                    f" {elapsed:.2f} с"
+                )
+
+    @staticmethod
+    def _fixture(rows, wallet_ids):
+        balances = dict.fromkeys(wallet_ids, Decimal("0.00"))
+        for row in rows:
+            sign = 1 if row["operation_type"] == OperationType.DEPOSIT else -1
+            balances[row["wallet_id"]] += sign * Decimal(row["amount"])
+        wallets = [
+            {
+                "model": "wallets.wallet",
+                "pk": wallet_id,
+                "fields": {"balance": str(balance)},
+            }
+            for wallet_id, balance in balances.items()
+        ]
+        operations = [
+            {
+                "model": "wallets.operation",
+                "pk": row["id"],
+                "fields": {
+                    "wallet": row["wallet_id"],
+                    "operation_type": row["operation_type"],
+                    "amount": row["amount"],
+                    "created_at": row["created_at"],
+                },
+            }
+            for row in rows
+        ]
+        return wallets + operations
@@ -0,0 +1,240 @@
+import json
+import random
+import threading
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.wallets.loadgen import find_regressions, run_load, serve, zipf_picker
+from apps.wallets.models import OperationType, Wallet
+
+SCENARIOS = ("hot", "uniform", "zipf", "mixed")
+BASELINE_DIR = settings.BASE_DIR / "benchmarks"
+INITIAL_BALANCE = Decimal("1000000000.00")
+
+
+class LockWaitSampler(threading.Thread):
+    """
+    Оценка времени ожидания блокировок на PostgreSQL.
+
+    Раз в interval секунд считает соединения базы, ждущие блокировку
+    (pg_stat_activity.wait_event_type = 'Lock'); сумма за прогон
+    умножается на interval. На других БД ничего не измеряет.
+    """
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.waiting_seconds = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self._stop_event.wait(self.interval):
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_stat_activity"
+                        " WHERE wait_event_type = 'Lock'"
+                        " AND datname = current_database()"
+                    )
+                    self.waiting_seconds += (
+                        cursor.fetchone()[0] * self.interval
+                    )
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест API кошельков на gunicorn: сценарии hot (один"
+        " кошелёк), uniform, zipf и mixed (чтение и запись). Печатает"
+        " JSON с пропускной способностью, задержками, ожиданием"
+        " блокировок и долей ошибок; сравнивает с базовым прогоном."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS
+        )
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--clients", type=int, default=32)
+        parser.add_argument("--duration", type=float, default=10)
+        parser.add_argument("--wallets", type=int, default=1000)
+        parser.add_argument("--zipf-exponent", type=float, default=1.1)
+        parser.add_argument(
+            "--write-ratio",
+            type=float,
+            default=0.2,
+            help="Доля записей в сценарии mixed.",
+        )
+        parser.add_argument(
+            "--withdraw-ratio",
+            type=float,
+            default=0.1,
+            help="Доля снятий среди записей.",
+        )
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--profile", choices=("wsgi", "asgi"))
+        parser.add_argument(
+            "--db-pool",
+            choices=("on", "off"),
+            help=(
+                "Включить или выключить пул соединений сервера"
+                " (DB_POOL_ENABLED); по умолчанию как в окружении."
+            ),
+        )
+        parser.add_argument("--output", help="Файл для JSON-отчёта.")
+        parser.add_argument(
+            "--save-baseline",
+            metavar="NAME",
+            help=f"Сохранить отчёт как {BASELINE_DIR}/NAME.json.",
+        )
+        parser.add_argument(
+            "--baseline",
+            metavar="NAME",
+            help="Сравнить с сохранённым базовым прогоном.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.1,
+            help="Допустимое ухудшение метрик относительно базового.",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            path = BASELINE_DIR / f"{options['baseline']}.json"
+            if not path.exists():
+                raise CommandError(f"Нет базового прогона {path}")
+            baseline = json.loads(path.read_text())
+
+        wallet_ids = [
+            wallet.id
+            for wallet in Wallet.objects.bulk_create(
+                Wallet(balance=INITIAL_BALANCE)
+                for _ in range(options["wallets"])
+            )
+        ]
+        profile = options["profile"] or "wsgi"
+        server_env = {}
+        if options["db_pool"]:
+            server_env["DB_POOL_ENABLED"] = str(options["db_pool"] == "on")
+        report = {
+            "config": {
+                "database": connection.vendor,
+                "profile": profile,
+                "db_pool": options["db_pool"],
+                **{
+                    name: options[name]
+                    for name in (
+                        "workers",
+                        "clients",
+                        "duration",
+                        "wallets",
+                        "zipf_exponent",
+                        "write_ratio",
+                        "withdraw_ratio",
+                    )
+                },
+            },
+            "scenarios": {},
+        }
+        try:
+            with serve(
+                settings.BASE_DIR,
+                options["port"],
+                options["workers"],
+                profile,
+                server_env,
+            ):
+                for name in options["scenarios"]:
+                    report["scenarios"][name] = self._run_scenario(
+                        name, wallet_ids, options
+                    )
+        except TimeoutError as error:
+            raise CommandError(str(error))
+        finally:
+            Wallet.objects.filter(id__in=wallet_ids).delete()
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            Path(options["output"]).write_text(output)
+        else:
+            self.stdout.write(output)
+        if options["save_baseline"]:
+            BASELINE_DIR.mkdir(exist_ok=True)
+            path = BASELINE_DIR / f"{options['save_baseline']}.json"
+            path.write_text(output + "\n")
+            self.stderr.write(f"Базовый прогон сохранён в {path}")
+        if baseline is not None:
+            self._compare(report, baseline, options["tolerance"])
+
+    def _run_scenario(self, name, wallet_ids, options):
+        pick = {
+            "hot": lambda: wallet_ids[0],
+            "uniform": lambda: random.choice(wallet_ids),
+        }.get(name) or zipf_picker(wallet_ids, options["zipf_exponent"])
+        write_ratio = options["write_ratio"] if name == "mixed" else 1
+        withdraw_ratio = options["withdraw_ratio"]
+
+        def make_request(_):
+            wallet_id = pick()
+            if random.random() >= write_ratio:
+                return "GET", f"/api/v1/wallets/{wallet_id}/", None
+            operation_type = (
+                OperationType.WITHDRAW
+                if random.random() < withdraw_ratio
+                else OperationType.DEPOSIT
+            )
+            return (
+                "POST",
+                f"/api/v1/wallets/{wallet_id}/operation/",
+                {"operation_type": operation_type, "amount": "1.00"},
+            )
+
+        sampler = LockWaitSampler()
+        if connection.vendor == "postgresql":
+            sampler.start()
+        load = run_load(
+            f"http://127.0.0.1:{options['port']}",
+            make_request,
+            options["clients"],
+            options["duration"],
+        )
+        summary = load.summary()
+        if sampler.is_alive():
+            sampler.stop()
+            summary["lock_wait"] = {
+                "seconds": round(sampler.waiting_seconds, 3),
+                "per_request_ms": round(
+                    sampler.waiting_seconds
+                    * 1000
+                    / max(summary["requests"], 1),
+                    3,
+                ),
+            }
+        else:
+            summary["lock_wait"] = None
+        return summary
+
+    def _compare(self, report, baseline, tolerance):
+        if report["config"] != baseline["config"]:
+            self.stderr.write(
+                "Параметры прогона отличаются от базового:"
+                f" {baseline['config']}"
+            )
+        regressions = find_regressions(report, baseline, tolerance)
+        if regressions:
+            raise CommandError(
+                "Регрессии относительно базового прогона:\n"
+                + "\n".join(regressions)
+            )
+        self.stderr.write("Регрессий относительно базового прогона нет.")
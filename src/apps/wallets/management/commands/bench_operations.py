@@ -0,0 +1,105 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from apps.wallets.exceptions import WalletBusy
+from apps.wallets.models import Operation, OperationType, Wallet
+from apps.wallets.wallet_service import WalletService
+
+AMOUNT = Decimal("1.00")
+
+
+def locking_operation(wallet_id, operation_type, amount):
+    """Прежний путь: SELECT ... FOR UPDATE, save() и create()."""
+    with transaction.atomic():
+        wallet = Wallet.objects.select_for_update().get(id=wallet_id)
+        if operation_type == OperationType.WITHDRAW:
+            WalletService.withdraw(wallet, amount)
+        else:
+            WalletService.deposit(wallet, amount)
+        wallet.save()
+        return Operation.objects.create(
+            wallet=wallet,
+            amount=amount,
+            operation_type=operation_type,
+        )
+
+
+STRATEGIES = {
+    "locking": locking_operation,
+    "atomic": WalletService.apply_operation,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает пропускную способность операций над одним кошельком:"
+        " с блокировкой строки (locking) и условным UPDATE (atomic)."
+        " Результаты имеют смысл только на PostgreSQL: SQLite не блокирует"
+        " строки и сериализует запись целиком, поэтому там допускается"
+        " только один поток."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--operations", type=int, default=1000)
+        parser.add_argument("--workers", type=int, default=1)
+
+    def handle(self, *args, **options):
+        operations = options["operations"]
+        workers = options["workers"]
+        if workers > 1 and connection.vendor != "postgresql":
+            raise CommandError(
+                "Несколько потоков поддерживаются только на PostgreSQL:"
+                f" {connection.vendor} блокирует базу целиком."
+            )
+        self.stdout.write(
+            f"База: {connection.vendor}; операций: {operations};"
+            f" потоков: {workers}"
+        )
+        for name, strategy in STRATEGIES.items():
+            wallet = Wallet.objects.create(balance=Decimal("0.00"))
+            try:
+                elapsed, outcomes = self._run(
+                    strategy, wallet.id, operations, workers
+                )
+            finally:
+                wallet.delete()
+            self.stdout.write(
+                f"{name:>8}: {outcomes['ok'] / elapsed:10.1f} оп/с;"
+                f" {elapsed * 1000 / operations:.3f} мс на операцию;"
+                f" занято: {outcomes['busy']}"
+            )
+
+    @staticmethod
+    def _run(strategy, wallet_id, operations, workers):
+        def worker(count):
+            outcomes = Counter()
+            for _ in range(count):
+                try:
+                    strategy(wallet_id, OperationType.DEPOSIT, AMOUNT)
+                    outcomes["ok"] += 1
+                except WalletBusy:
+                    outcomes["busy"] += 1
+            return outcomes
+
+        def threaded_worker(count):
+            try:
+                return worker(count)
+            finally:
+                connection.close()
+
+        chunks = [operations // workers] * workers
+        chunks[0] += operations % workers
+        started = time.perf_counter()
+        if workers == 1:
+            outcomes = worker(operations)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                outcomes = sum(
+                    executor.map(threaded_worker, chunks), Counter()
+                )
+        return time.perf_counter() - started, outcomes
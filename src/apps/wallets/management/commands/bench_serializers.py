@@ -0,0 +1,55 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from apps.wallets.models import Operation, OperationType
+from apps.wallets.serializers import (
+    FastOperationSerializer,
+    OperationSerializer,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Микробенчмарк проверки запроса и вывода ответа создания операции:"
+        " OperationSerializer против FastOperationSerializer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        payload = {"operation_type": OperationType.DEPOSIT, "amount": "125.50"}
+        operation = Operation(
+            id=uuid.uuid4(),
+            operation_type=OperationType.DEPOSIT,
+            amount=Decimal("125.50"),
+        )
+        results = {}
+        for serializer_class in (OperationSerializer, FastOperationSerializer):
+            # Прогрев: поля FastOperationSerializer строятся при первом вызове.
+            self._run(serializer_class, payload, operation, 100)
+            started = time.perf_counter()
+            self._run(serializer_class, payload, operation, iterations)
+            elapsed = time.perf_counter() - started
+            results[serializer_class.__name__] = elapsed
+            self.stdout.write(
+                f"{serializer_class.__name__:>23}:"
+                f" {iterations / elapsed:10.0f} запросов/с;"
+                f" {elapsed / iterations * 1e6:.1f} мкс на запрос"
+            )
+        speedup = (
+            results["OperationSerializer"] / results["FastOperationSerializer"]
+        )
+        self.stdout.write(f"Ускорение: {speedup:.1f}x")
+
+    @staticmethod
+    def _run(serializer_class, payload, operation, iterations):
+        for _ in range(iterations):
+            serializer = serializer_class(data=payload)
+            serializer.is_valid()
+            serializer.validated_data["amount"]
+            serializer_class(operation).data
@@ -0,0 +1,98 @@
+import json
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.wallets.loadgen import run_load, serve
+from apps.wallets.models import OperationType, Wallet
+
+PROFILES = ("wsgi", "asgi")
+
+
+def process_tree_rss_mb(pid: int) -> float:
+    """Суммарный RSS процесса и его потомков (Linux, /proc)."""
+    rss_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            status = Path(f"/proc/{current}/status").read_text()
+            children = Path(
+                f"/proc/{current}/task/{current}/children"
+            ).read_text()
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith("VmRSS:"):
+                rss_kb += int(line.split()[1])
+        pending.extend(int(child) for child in children.split())
+    return round(rss_kb / 1024, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает WSGI (синхронные воркеры) и ASGI (uvicorn) профили"
+        " gunicorn с одинаковым числом воркеров: пропускную способность,"
+        " задержки и потребление памяти."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--clients", type=int, default=64)
+        parser.add_argument("--duration", type=float, default=10)
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--profiles", nargs="+", choices=PROFILES, default=PROFILES
+        )
+        parser.add_argument(
+            "--write-ratio",
+            type=float,
+            default=0.5,
+            help="Доля запросов на пополнение среди всех запросов.",
+        )
+
+    def handle(self, *args, **options):
+        wallet = Wallet.objects.create(balance=Decimal("0.00"))
+        results = {}
+        try:
+            for profile in options["profiles"]:
+                results[profile] = self._bench_profile(
+                    profile, wallet.id, options
+                )
+        finally:
+            wallet.delete()
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def _bench_profile(self, profile, wallet_id, options):
+        port = options["port"]
+        write_every = max(1, round(1 / options["write_ratio"]))
+        counter = iter(range(10**12))
+
+        def make_request(_):
+            if next(counter) % write_every == 0:
+                return (
+                    "POST",
+                    f"/api/v1/wallets/{wallet_id}/operation/",
+                    {
+                        "operation_type": OperationType.DEPOSIT,
+                        "amount": "1.00",
+                    },
+                )
+            return "GET", f"/api/v1/wallets/{wallet_id}/", None
+
+        try:
+            with serve(
+                settings.BASE_DIR, port, options["workers"], profile
+            ) as server:
+                load = run_load(
+                    f"http://127.0.0.1:{port}",
+                    make_request,
+                    options["clients"],
+                    options["duration"],
+                )
+                rss_mb = process_tree_rss_mb(server.pid)
+        except TimeoutError as error:
+            raise CommandError(str(error))
+        return {**load.summary(), "rss_mb": rss_mb}
@@ -0,0 +1,88 @@
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from rest_framework.exceptions import ValidationError
+
+from apps.wallets.exceptions import WalletBusy
+from apps.wallets.models import Wallet
+from apps.wallets.wallet_service import WalletService
+
+AMOUNT = Decimal("1.00")
+INITIAL_BALANCE = Decimal("1000000.00")
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест переводов: потоки переводят средства между"
+        " небольшим числом кошельков во встречных направлениях."
+        " Показывает пропускную способность, число отказов по бюджету"
+        " ожидания блокировок (WalletBusy) и ошибок БД (включая взаимные"
+        " блокировки)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--transfers", type=int, default=2000)
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--wallets", type=int, default=2)
+
+    def handle(self, *args, **options):
+        if options["wallets"] < 2:
+            raise CommandError("Нужно хотя бы два кошелька.")
+        wallet_ids = [
+            wallet.id
+            for wallet in Wallet.objects.bulk_create(
+                Wallet(balance=INITIAL_BALANCE)
+                for _ in range(options["wallets"])
+            )
+        ]
+        workers = options["workers"]
+        chunks = [options["transfers"] // workers] * workers
+        chunks[0] += options["transfers"] % workers
+
+        def worker(count):
+            outcomes = Counter()
+            try:
+                for _ in range(count):
+                    source, target = random.sample(wallet_ids, 2)
+                    try:
+                        WalletService.transfer(source, target, AMOUNT)
+                        outcomes["ok"] += 1
+                    except WalletBusy:
+                        outcomes["busy"] += 1
+                    except ValidationError:
+                        outcomes["rejected"] += 1
+                    except DatabaseError:
+                        outcomes["db_errors"] += 1
+            finally:
+                connection.close()
+            return outcomes
+
+        self.stdout.write(
+            f"База: {connection.vendor}; переводов: {options['transfers']};"
+            f" потоков: {workers}; кошельков: {len(wallet_ids)}"
+        )
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                outcomes = sum(executor.map(worker, chunks), Counter())
+            elapsed = time.perf_counter() - started
+            total = sum(
+                Wallet.objects.filter(id__in=wallet_ids).values_list(
+                    "balance", flat=True
+                )
+            )
+        finally:
+            Wallet.objects.filter(id__in=wallet_ids).delete()
+
+        self.stdout.write(
+            f"{outcomes['ok'] / elapsed:.1f} переводов/с; успешно:"
+            f" {outcomes['ok']}; отклонено: {outcomes['rejected']};"
+            f" занято: {outcomes['busy']}; ошибок БД: {outcomes['db_errors']}"
+        )
+        if total != INITIAL_BALANCE * len(wallet_ids):
+            raise CommandError(f"Сумма балансов изменилась: {total}")
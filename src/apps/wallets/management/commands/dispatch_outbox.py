@@ -0,0 +1,92 @@
+import json
+import time
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.wallets import outbox
+from apps.wallets.serializers import OutboxEventSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Доставляет события outbox пачками: в stdout (JSON Lines) или"
+        " POST-запросом JSON-массива на --target. Курсор сохраняется"
+        " после успешной доставки пачки (at-least-once): после сбоя"
+        " пачка доставляется повторно, потребитель отбрасывает"
+        " повторы по sequence."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--consumer", required=True, help="Имя контрольной точки."
+        )
+        parser.add_argument("--target", help="URL получателя пачек.")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--timeout", type=float, default=10)
+        parser.add_argument(
+            "--follow",
+            action="store_true",
+            help="Не завершаться, а ждать новых событий.",
+        )
+        parser.add_argument(
+            "--wait",
+            type=float,
+            default=5,
+            help="Ожидание новых событий в режиме --follow, с.",
+        )
+        parser.add_argument(
+            "--retry-delay",
+            type=float,
+            default=5,
+            help="Пауза перед повтором неудачной доставки в --follow, с.",
+        )
+
+    def handle(self, *args, **options):
+        consumer = options["consumer"]
+        cursor = outbox.checkpoint(consumer)
+        delivered = 0
+        while True:
+            events = outbox.wait_for(
+                cursor,
+                options["batch_size"],
+                options["wait"] if options["follow"] else 0,
+            )
+            if not events:
+                if options["follow"]:
+                    continue
+                break
+            try:
+                self._deliver(events, options)
+            except OSError as error:
+                if not options["follow"]:
+                    raise CommandError(
+                        f"Доставка после события {cursor} не удалась:"
+                        f" {error}"
+                    )
+                self.stderr.write(f"Доставка не удалась, повтор: {error}")
+                time.sleep(options["retry_delay"])
+                continue
+            cursor = events[-1].id
+            outbox.save_checkpoint(consumer, cursor)
+            delivered += len(events)
+        self.stderr.write(
+            f"Доставлено событий: {delivered}; курсор {consumer}: {cursor}"
+        )
+
+    def _deliver(self, events, options):
+        data = OutboxEventSerializer(events, many=True).data
+        if not options["target"]:
+            for event in data:
+                self.stdout.write(json.dumps(event))
+            self.stdout.flush()
+            return
+        request = urllib.request.Request(
+            options["target"],
+            data=json.dumps(data).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        # Ответы не 2xx urllib превращает в HTTPError (подкласс OSError).
+        with urllib.request.urlopen(request, timeout=options["timeout"]):
+            pass
@@ -0,0 +1,63 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from apps.wallets.exports import LINE_WRITERS, stream_operations
+from apps.wallets.models import Operation
+
+
+def _datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоково выгружает операции одного или всех кошельков"
+        " в CSV или NDJSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--wallet", help="UUID кошелька; по умолчанию все."
+        )
+        parser.add_argument(
+            "--format", choices=tuple(LINE_WRITERS), default="csv"
+        )
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--created-after", type=_datetime)
+        parser.add_argument("--created-before", type=_datetime)
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument(
+            "--output", help="Файл для записи; по умолчанию stdout."
+        )
+
+    def handle(self, *args, **options):
+        queryset = Operation.objects.all()
+        if options["wallet"]:
+            queryset = queryset.filter(wallet_id=options["wallet"])
+        elif not (options["created_after"] and options["created_before"]):
+            raise CommandError(
+                "Для выгрузки всех кошельков нужны --created-after"
+                " и --created-before."
+            )
+        if options["created_after"]:
+            queryset = queryset.filter(
+                created_at__gte=options["created_after"]
+            )
+        if options["created_before"]:
+            queryset = queryset.filter(
+                created_at__lt=options["created_before"]
+            )
+
+        chunks = stream_operations(
+            queryset, options["format"], options["gzip"], options["chunk_size"]
+        )
+        if options["output"]:
+            with open(options["output"], "wb") as output:
+                output.writelines(chunks)
+        else:
+            sys.stdout.buffer.writelines(chunks)
@@ -0,0 +1,105 @@
+import gzip
+import sys
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.wallets.imports import (
+    ROW_READERS,
+    ImportAborted,
+    import_operations,
+)
+from apps.wallets.models import ImportCheckpoint
+
+FORMAT_SUFFIXES = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Импортирует операции из CSV или NDJSON порциями с контрольными"
+        " точками; балансы кошельков пересчитываются по импортированным"
+        " операциям."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", help="Файл (.csv, .ndjson, .jsonl, можно .gz) или -."
+        )
+        parser.add_argument("--format", choices=tuple(ROW_READERS))
+        parser.add_argument("--chunk-size", type=int, default=10000)
+        parser.add_argument("--max-errors", type=int, default=0)
+        parser.add_argument(
+            "--checkpoint",
+            help="Имя контрольной точки; по умолчанию абсолютный путь.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Начать импорт заново, сбросив контрольную точку.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        name = options["checkpoint"] or (
+            "-" if path == "-" else str(Path(path).resolve())
+        )
+        import_format = options["format"] or self._guess_format(path)
+        if options["restart"]:
+            ImportCheckpoint.objects.filter(name=name).delete()
+
+        started = time.perf_counter()
+
+        def on_progress(report):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"Импортировано: {report.imported};"
+                f" ошибок: {len(report.errors)};"
+                f" {report.imported / elapsed:.0f} строк/с"
+            )
+
+        with self._open(path) as stream:
+            try:
+                report = import_operations(
+                    stream,
+                    import_format,
+                    name,
+                    chunk_size=options["chunk_size"],
+                    max_errors=options["max_errors"],
+                    on_progress=on_progress,
+                )
+            except ImportAborted as error:
+                self._write_errors(error.report)
+                raise CommandError(
+                    f"{error}; импорт продолжится с последней"
+                    " незаписанной порции."
+                )
+        self._write_errors(report)
+        if report.skipped:
+            self.stdout.write(
+                f"Пропущено уже импортированных строк: {report.skipped}"
+            )
+        self.stdout.write(f"Готово, импортировано: {report.imported}")
+
+    def _write_errors(self, report):
+        for number, message in report.errors:
+            self.stderr.write(f"Строка {number}: {message}")
+
+    @staticmethod
+    def _guess_format(path):
+        suffixes = Path(path).suffixes
+        if suffixes and suffixes[-1] == ".gz":
+            suffixes = suffixes[:-1]
+        if not suffixes or suffixes[-1] not in FORMAT_SUFFIXES:
+            raise CommandError(
+                "Не удалось определить формат, укажите --format."
+            )
+        return FORMAT_SUFFIXES[suffixes[-1]]
+
+    @staticmethod
+    def _open(path):
+        if path == "-":
+            return sys.stdin
+        if path.endswith(".gz"):
+            return gzip.open(path, "rt", encoding="utf-8", newline="")
+        return open(path, encoding="utf-8", newline="")
@@ -0,0 +1,105 @@
+import csv
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from apps.wallets import partitions
+
+
+def _datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+def _month(value):
+    parsed = parse_date(f"{value}-01")
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Помесячные секции таблицы операций: maintain создаёт секции"
+        " будущих месяцев и архивирует старые, archive архивирует секцию"
+        " месяца, list показывает секции, query читает архивы."
+    )
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest="action", required=True)
+        maintain = subparsers.add_parser("maintain")
+        maintain.add_argument("--months-ahead", type=int)
+        maintain.add_argument("--retain-months", type=int)
+        archive = subparsers.add_parser("archive")
+        archive.add_argument("month", type=_month, help="Месяц, YYYY-MM.")
+        subparsers.add_parser("list")
+        query = subparsers.add_parser("query")
+        query.add_argument("--wallet")
+        query.add_argument("--created-after", type=_datetime)
+        query.add_argument("--created-before", type=_datetime)
+
+    def handle(self, *args, **options):
+        config = settings.WALLETS_PARTITIONS
+        action = options["action"]
+        if action == "query":
+            self._query(config["ARCHIVE_DIR"], options)
+            return
+        if not partitions.is_supported():
+            raise CommandError("Секции операций есть только на PostgreSQL.")
+        try:
+            if action == "maintain":
+                self._maintain(config, options)
+            elif action == "archive":
+                self._report(
+                    partitions.archive_partition(
+                        options["month"], config["ARCHIVE_DIR"]
+                    )
+                )
+            else:
+                for month in partitions.list_partitions():
+                    self.stdout.write(partitions.partition_name(month))
+        except partitions.PartitionError as error:
+            raise CommandError(str(error))
+
+    def _maintain(self, config, options):
+        months_ahead = options["months_ahead"]
+        retain_months = options["retain_months"]
+        created, archived = partitions.maintain(
+            timezone.now(),
+            config["MONTHS_AHEAD"] if months_ahead is None else months_ahead,
+            (
+                config["RETAIN_MONTHS"]
+                if retain_months is None
+                else retain_months
+            ),
+            config["ARCHIVE_DIR"],
+        )
+        for month in created:
+            self.stdout.write(
+                f"Создана секция {partitions.partition_name(month)}"
+            )
+        for report in archived:
+            self._report(report)
+
+    def _report(self, report):
+        self.stdout.write(
+            f"Секция за {report.month:%Y-%m} архивирована в {report.path}:"
+            f" операций {report.operations}, кошельков {report.wallets}"
+        )
+
+    def _query(self, archive_dir, options):
+        writer = csv.DictWriter(sys.stdout, partitions.ARCHIVE_FIELDS)
+        writer.writeheader()
+        writer.writerows(
+            partitions.read_archive(
+                archive_dir,
+                options["wallet"],
+                options["created_after"],
+                options["created_before"],
+            )
+        )
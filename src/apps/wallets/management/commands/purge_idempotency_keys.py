@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.wallets.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Удаляет просроченные ключи идемпотентности порциями."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        purged = 0
+        while True:
+            expired_ids = list(
+                IdempotencyKey.objects.filter(expires_at__lte=now).values_list(
+                    "id", flat=True
+                )[: options["chunk_size"]]
+            )
+            if not expired_ids:
+                break
+            IdempotencyKey.objects.filter(id__in=expired_ids).delete()
+            purged += len(expired_ids)
+        self.stdout.write(f"Удалено ключей идемпотентности: {purged}")
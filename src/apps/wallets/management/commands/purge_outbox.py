@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.wallets import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет события outbox старше WALLETS_OUTBOX_RETENTION_HOURS,"
+        " уже доставленные всем потребителям с контрольными точками."
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Удалено событий: {outbox.purge()}")
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.wallets.rollups import roll_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Сворачивает новые операции в дневные обороты кошельков"
+        " порциями после отметки до полного догоняния."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--settle-seconds",
+            type=int,
+            default=300,
+            help="Операции моложе не сворачиваются.",
+        )
+
+    def handle(self, *args, **options):
+        settled_before = timezone.now() - timedelta(
+            seconds=options["settle_seconds"]
+        )
+        total = 0
+        while rolled_up := roll_up(settled_before, options["batch_size"]):
+            total += rolled_up
+        self.stdout.write(f"Свёрнуто операций: {total}")
@@ -0,0 +1,88 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from apps.wallets import ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет балансы кошельков с журналом операций параллельно"
+        " по диапазонам id и при --repair исправляет расхождения."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument(
+            "--ranges",
+            type=int,
+            help="Число диапазонов id; по умолчанию workers * 4.",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Читать журнал целиком, не используя контрольные точки.",
+        )
+        parser.add_argument("--repair", action="store_true")
+        parser.add_argument(
+            "--settle-seconds",
+            type=int,
+            default=300,
+            help="Контрольная точка не сдвигается на операции моложе.",
+        )
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        settled_before = timezone.now() - timedelta(
+            seconds=options["settle_seconds"]
+        )
+        ranges = ledger.wallet_ranges(options["ranges"] or workers * 4)
+        tasks = [
+            (lower, upper, settled_before, options["full"])
+            for lower, upper in ranges
+        ]
+        if workers == 1:
+            reports = [ledger.verify_range(*task) for task in tasks]
+        else:
+            reports = self._run_in_pool(workers, tasks)
+
+        drifts = [drift for report in reports for drift in report.drifts]
+        unrepaired = 0
+        for drift in drifts:
+            self.stdout.write(
+                f"{drift.wallet_id}: баланс {drift.balance},"
+                f" по журналу {drift.ledger},"
+                f" расхождение {drift.difference}"
+            )
+            balance = None
+            if options["repair"]:
+                balance = ledger.repair_wallet(drift.wallet_id)
+                self.stdout.write(
+                    "  не исправлено"
+                    if balance is None
+                    else f"  исправлено, баланс {balance}"
+                )
+            unrepaired += balance is None
+        self.stdout.write(
+            f"Проверено кошельков: {sum(r.checked for r in reports)};"
+            f" контрольных точек: {sum(r.checkpoints for r in reports)};"
+            f" расхождений: {len(drifts)}"
+        )
+        if unrepaired:
+            raise CommandError(f"Не исправлено расхождений: {unrepaired}")
+
+    @staticmethod
+    def _run_in_pool(workers, tasks):
+        # Дочерние процессы не должны унаследовать открытые соединения.
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=ledger.init_worker
+        ) as pool:
+            futures = [
+                pool.submit(ledger.verify_range, *task) for task in tasks
+            ]
+            return [future.result() for future in as_completed(futures)]
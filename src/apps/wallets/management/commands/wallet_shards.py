@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.wallets.models import Wallet
+from apps.wallets.sharding import demote_wallet, promote_wallet, tracker
+
+
+class Command(BaseCommand):
+    help = (
+        "Управление разделением баланса кошельков на корзины:"
+        " promote/demote отдельного кошелька или rebalance —"
+        " сбор корзин кошельков, на которых больше нет конкуренции."
+        " rebalance запускается по расписанию и требует общего для"
+        " процессов кэша счётчиков (WALLETS_SHARDING_CACHE)."
+    )
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest="action", required=True)
+        promote = subparsers.add_parser("promote")
+        promote.add_argument("wallet_id")
+        promote.add_argument("--buckets", type=int)
+        demote = subparsers.add_parser("demote")
+        demote.add_argument("wallet_id")
+        subparsers.add_parser("rebalance")
+
+    def handle(self, *args, **options):
+        action = options["action"]
+        if action == "promote":
+            promoted = promote_wallet(options["wallet_id"], options["buckets"])
+            self.stdout.write(
+                "Кошелёк разделён." if promoted else "Кошелёк уже разделён."
+            )
+        elif action == "demote":
+            demoted = demote_wallet(options["wallet_id"])
+            self.stdout.write(
+                "Корзины кошелька собраны."
+                if demoted
+                else "Кошелёк не разделён."
+            )
+        else:
+            self._rebalance()
+
+    def _rebalance(self):
+        config = settings.WALLETS_SHARDING
+        if not tracker.is_shared():
+            # Счётчики процесса команды пусты: собраны были бы и
+            # «горячие» кошельки.
+            raise CommandError(
+                f"Кэш счётчиков конкуренции {config['CACHE']!r} не общий"
+                " для процессов: укажите в WALLETS_SHARDING_CACHE алиас"
+                " общего кэша из CACHES (Redis, Memcached)."
+            )
+        sharded_before = timezone.now() - timedelta(
+            seconds=config["WINDOW_SECONDS"]
+        )
+        demoted = 0
+        wallet_ids = Wallet.objects.filter(
+            bucket_count__gt=0, sharded_at__lte=sharded_before
+        ).values_list("id", flat=True)
+        for wallet_id in wallet_ids:
+            lock_waits = tracker.lock_waits(wallet_id) + tracker.lock_waits(
+                wallet_id, windows_ago=1
+            )
+            if lock_waits < config["DEMOTE_BELOW"] and demote_wallet(
+                wallet_id
+            ):
+                demoted += 1
+        self.stdout.write(f"Собрано кошельков: {demoted}")
@@ -0,0 +1,72 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+GROUP_COMMIT_WINDOW = Gauge(
+    "wallets_group_commit_window_seconds",
+    "Окно накопления пополнений одного кошелька перед общим коммитом.",
+)
+GROUP_COMMIT_MAX_BATCH_SIZE = Gauge(
+    "wallets_group_commit_max_batch_size",
+    "Максимальное число пополнений в одном общем коммите.",
+)
+GROUP_COMMIT_BATCH_SIZE = Histogram(
+    "wallets_group_commit_batch_size",
+    "Число пополнений, объединённых в один коммит.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+BALANCE_CACHE_REQUESTS = Counter(
+    "wallets_balance_cache_requests_total",
+    "Запросы баланса к кэшу по результату: hit, miss, coalesced.",
+    ["result"],
+)
+
+REQUEST_SECONDS_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+)
+REQUEST_SQL_SECONDS = Histogram(
+    "wallets_request_sql_seconds",
+    "Суммарное время SQL-запросов за HTTP-запрос.",
+    ["endpoint"],
+    buckets=REQUEST_SECONDS_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "wallets_request_queries",
+    "Число SQL-запросов за HTTP-запрос.",
+    ["endpoint"],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+REQUEST_LOCK_WAIT_SECONDS = Histogram(
+    "wallets_request_lock_wait_seconds",
+    "Время запросов SELECT ... FOR UPDATE (захват блокировок строк).",
+    ["endpoint"],
+    buckets=REQUEST_SECONDS_BUCKETS,
+)
+REQUEST_SERIALIZER_SECONDS = Histogram(
+    "wallets_request_serializer_seconds",
+    "Время проверки запроса и вывода ответа сериализаторами.",
+    ["endpoint"],
+    buckets=REQUEST_SECONDS_BUCKETS,
+)
+REQUEST_COMMIT_SECONDS = Histogram(
+    "wallets_request_commit_seconds",
+    "Время COMMIT транзакций за HTTP-запрос.",
+    ["endpoint"],
+    buckets=REQUEST_SECONDS_BUCKETS,
+)
+
+LOCK_TIMEOUTS = Counter(
+    "wallets_lock_timeouts_total",
+    "Запросы, не дождавшиеся блокировки кошелька за бюджет.",
+)
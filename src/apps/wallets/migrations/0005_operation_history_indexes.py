@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0004_wallet_buckets"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="operation",
+            index=models.Index(
+                fields=["wallet", "-created_at", "-id"],
+                name="operation_wallet_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="operation",
+            index=models.Index(
+                fields=["wallet", "operation_type", "-created_at", "-id"],
+                name="operation_wallet_type_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0005_operation_history_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="operation",
+            index=models.Index(
+                fields=["created_at", "id"], name="operation_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0006_operation_created_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LedgerCheckpoint",
+            fields=[
+                (
+                    "wallet",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="ledger_checkpoint",
+                        serialize=False,
+                        to="wallets.wallet",
+                    ),
+                ),
+                (
+                    "balance",
+                    models.DecimalField(decimal_places=2, max_digits=15),
+                ),
+                ("last_operation_created_at", models.DateTimeField()),
+                ("last_operation_id", models.UUIDField()),
+                ("checked_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
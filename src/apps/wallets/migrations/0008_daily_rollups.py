@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:56
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0007_ledger_checkpoint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupHighWaterMark",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=32, primary_key=True, serialize=False
+                    ),
+                ),
+                (
+                    "last_operation_created_at",
+                    models.DateTimeField(blank=True, null=True),
+                ),
+                ("last_operation_id", models.UUIDField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                (
+                    "operation_type",
+                    models.CharField(
+                        choices=[
+                            ("DEPOSIT", "Пополнение"),
+                            ("WITHDRAW", "Снятие"),
+                        ],
+                        max_length=8,
+                    ),
+                ),
+                (
+                    "total",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=Decimal("0.00"),
+                        max_digits=20,
+                    ),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "wallet",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_rollups",
+                        to="wallets.wallet",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("wallet", "day", "operation_type"),
+                        name="unique_wallet_day_operation_type",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0009_import_checkpoint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="operation",
+            name="linked_operation",
+            field=models.OneToOneField(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="wallets.operation",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="dailyrollup",
+            name="operation_type",
+            field=models.CharField(
+                choices=[
+                    ("DEPOSIT", "Пополнение"),
+                    ("WITHDRAW", "Снятие"),
+                    ("TRANSFER", "Перевод"),
+                ],
+                max_length=8,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="operation",
+            name="operation_type",
+            field=models.CharField(
+                choices=[
+                    ("DEPOSIT", "Пополнение"),
+                    ("WITHDRAW", "Снятие"),
+                    ("TRANSFER", "Перевод"),
+                ],
+                default="DEPOSIT",
+                max_length=8,
+            ),
+        ),
+    ]
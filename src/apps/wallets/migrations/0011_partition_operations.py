@@ -0,0 +1,162 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:06
+
+import re
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+TABLE = "wallets_operation"
+OLD_TABLE = f"{TABLE}_old"
+MONTHS_AHEAD = 3
+
+
+def _month_start(moment):
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(month):
+    return month.replace(
+        year=month.year + month.month // 12, month=month.month % 12 + 1
+    )
+
+
+def _definitions(cursor, table):
+    """Индексы (кроме первичного ключа) и ограничения таблицы."""
+    cursor.execute(
+        """
+        SELECT pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        WHERE i.indrelid = %s::regclass AND NOT EXISTS (
+            SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid
+                AND c.conrelid = i.indrelid
+        )
+        """,
+        [table],
+    )
+    indexes = [definition for (definition,) in cursor.fetchall()]
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype <> 'p'
+        """,
+        [table],
+    )
+    return indexes, cursor.fetchall()
+
+
+def _rebuild(schema_editor, partitioned):
+    """
+    Пересоздать таблицу операций с переносом строк, индексов и ограничений.
+
+    Старая таблица переименовывается, новая создаётся по её образцу,
+    после удаления старой индексы и ограничения создаются заново
+    с прежними именами.
+    """
+    quote = schema_editor.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        indexes, constraints = _definitions(cursor, TABLE)
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} RENAME TO {OLD_TABLE}")
+        if partitioned:
+            cursor.execute(
+                f"CREATE TABLE {quote(TABLE)}"
+                f" (LIKE {OLD_TABLE} INCLUDING DEFAULTS)"
+                " PARTITION BY RANGE (created_at)"
+            )
+            cursor.execute(
+                f"CREATE TABLE {quote(TABLE + '_default')}"
+                f" PARTITION OF {quote(TABLE)} DEFAULT"
+            )
+            cursor.execute(f"SELECT min(created_at) FROM {OLD_TABLE}")
+            (oldest,) = cursor.fetchone()
+            now = datetime.now(timezone.utc)
+            month = _month_start(min(oldest or now, now))
+            last = _month_start(now)
+            for _ in range(MONTHS_AHEAD):
+                last = _next_month(last)
+            while month <= last:
+                upper = _next_month(month)
+                cursor.execute(
+                    f"CREATE TABLE {quote(f'{TABLE}_p{month:%Y_%m}')}"
+                    f" PARTITION OF {quote(TABLE)}"
+                    " FOR VALUES FROM (%s) TO (%s)",
+                    [month, upper],
+                )
+                month = upper
+            primary_key = "(id, created_at)"
+        else:
+            cursor.execute(
+                f"CREATE TABLE {quote(TABLE)}"
+                f" (LIKE {OLD_TABLE} INCLUDING DEFAULTS)"
+            )
+            primary_key = "(id)"
+        cursor.execute(f"INSERT INTO {quote(TABLE)} SELECT * FROM {OLD_TABLE}")
+        cursor.execute(f"DROP TABLE {OLD_TABLE}")
+        cursor.execute(
+            f"ALTER TABLE {quote(TABLE)} ADD CONSTRAINT"
+            f" {quote(TABLE + '_pkey')} PRIMARY KEY {primary_key}"
+        )
+        for definition in indexes:
+            cursor.execute(
+                re.sub(
+                    r" ON (ONLY )?\S+ USING ",
+                    f" ON {quote(TABLE)} USING ",
+                    definition,
+                )
+            )
+        for name, definition in constraints:
+            cursor.execute(
+                f"ALTER TABLE {quote(TABLE)}"
+                f" ADD CONSTRAINT {quote(name)} {definition}"
+            )
+
+
+def partition_operations(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        _rebuild(schema_editor, partitioned=True)
+
+
+def unpartition_operations(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        _rebuild(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0010_operation_transfer"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ledgercheckpoint",
+            name="archived_balance",
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal("0.00"), max_digits=15
+            ),
+        ),
+        migrations.AlterField(
+            model_name="idempotencykey",
+            name="operation",
+            field=models.OneToOneField(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="idempotency_key",
+                to="wallets.operation",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="operation",
+            name="linked_operation",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="wallets.operation",
+            ),
+        ),
+        migrations.RunPython(partition_operations, unpartition_operations),
+    ]
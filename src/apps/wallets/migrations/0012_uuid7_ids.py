@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+import apps.wallets.ids
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0011_partition_operations"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="operation",
+            name="id",
+            field=models.UUIDField(
+                default=apps.wallets.ids.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="wallet",
+            name="id",
+            field=models.UUIDField(
+                default=apps.wallets.ids.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
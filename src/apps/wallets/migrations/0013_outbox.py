@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0012_uuid7_ids"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboxCheckpoint",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=255, primary_key=True, serialize=False
+                    ),
+                ),
+                ("last_event_id", models.PositiveBigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="OutboxEvent",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("operation_id", models.UUIDField()),
+                ("wallet_id", models.UUIDField()),
+                (
+                    "operation_type",
+                    models.CharField(
+                        choices=[
+                            ("DEPOSIT", "Пополнение"),
+                            ("WITHDRAW", "Снятие"),
+                            ("TRANSFER", "Перевод"),
+                        ],
+                        max_length=8,
+                    ),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(decimal_places=2, max_digits=15),
+                ),
+                ("occurred_at", models.DateTimeField()),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+        ),
+    ]
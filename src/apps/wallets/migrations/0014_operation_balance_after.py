@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wallets", "0013_outbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="operation",
+            name="balance_after",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=2,
+                editable=False,
+                max_digits=15,
+                null=True,
+            ),
+        ),
+    ]
@@ -1,15 +1,39 @@
 from decimal import Decimal
-from uuid import uuid4
 
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.db.models import UUIDField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .ids import uuid7
+
+
+class WalletQuerySet(models.QuerySet):
+    def with_total_balance(self):
+        """Добавить total_balance: баланс кошелька с учётом корзин."""
+        buckets_balance = (
+            WalletBucket.objects.filter(wallet=models.OuterRef("pk"))
+            .values("wallet")
+            .annotate(total=models.Sum("balance"))
+            .values("total")
+        )
+        return self.annotate(
+            total_balance=models.F("balance")
+            + Coalesce(
+                models.Subquery(buckets_balance),
+                Decimal("0.00"),
+                output_field=models.DecimalField(
+                    max_digits=15, decimal_places=2
+                ),
+            )
+        )
 
 
 class Wallet(models.Model):
     id = UUIDField(
         primary_key=True,
-        default=uuid4,
+        default=uuid7,
         editable=False,
     )
     balance = models.DecimalField(
@@ -18,20 +42,56 @@ class Wallet(models.Model):
         default=Decimal("0.00"),
         validators=[MinValueValidator(0)],
     )
+    bucket_count = models.PositiveSmallIntegerField(
+        default=0,
+    )
+    sharded_at = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+
+    objects = WalletQuerySet.as_manager()
 
     def __str__(self):
         return f"Кошелек {self.id}; Баланс: {self.balance}"
 
 
+class WalletBucket(models.Model):
+    wallet = models.ForeignKey(
+        Wallet,
+        on_delete=models.CASCADE,
+        related_name="buckets",
+    )
+    index = models.PositiveSmallIntegerField()
+    balance = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        validators=[MinValueValidator(0)],
+    )
+
+    def __str__(self):
+        return f"Корзина {self.index} кошелька {self.wallet_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["wallet", "index"],
+                name="unique_wallet_bucket_index",
+            ),
+        ]
+
+
 class OperationType(models.TextChoices):
     DEPOSIT = "DEPOSIT", "Пополнение"
     WITHDRAW = "WITHDRAW", "Снятие"
+    TRANSFER = "TRANSFER", "Перевод"
 
 
 class Operation(models.Model):
     id = UUIDField(
         primary_key=True,
-        default=uuid4,
+        default=uuid7,
         editable=False,
     )
     amount = models.DecimalField(
@@ -50,7 +110,28 @@ class Operation(models.Model):
         related_name="operations",
     )
     created_at = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
+    )
+    # Баланс кошелька сразу после операции. Пуст у операций корзин
+    # разделённого кошелька и у старых операций до backfill_balance_after.
+    balance_after = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    # На PostgreSQL таблица секционирована по created_at, а внешний
+    # ключ на секционированную таблицу должен включать ключ секции,
+    # поэтому ссылки на операции не проверяются БД.
+    linked_operation = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        db_constraint=False,
     )
 
     def __str__(self):
@@ -58,3 +139,181 @@ class Operation(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["wallet", "-created_at", "-id"],
+                name="operation_wallet_created_idx",
+            ),
+            models.Index(
+                fields=["wallet", "operation_type", "-created_at", "-id"],
+                name="operation_wallet_type_idx",
+            ),
+            models.Index(
+                fields=["created_at", "id"],
+                name="operation_created_idx",
+            ),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField(
+        max_length=255,
+        unique=True,
+    )
+    operation = models.OneToOneField(
+        Operation,
+        on_delete=models.CASCADE,
+        related_name="idempotency_key",
+        db_constraint=False,
+    )
+    expires_at = models.DateTimeField(
+        db_index=True,
+    )
+
+    def __str__(self):
+        return f"Ключ идемпотентности {self.key}; до {self.expires_at}"
+
+
+class LedgerCheckpoint(models.Model):
+    wallet = models.OneToOneField(
+        Wallet,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="ledger_checkpoint",
+    )
+    balance = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+    )
+    last_operation_created_at = models.DateTimeField()
+    last_operation_id = models.UUIDField()
+    archived_balance = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        default=Decimal("0.00"),
+    )
+    checked_at = models.DateTimeField(
+        auto_now=True,
+    )
+
+    def __str__(self):
+        return (
+            f"Сверка кошелька {self.wallet_id}; Баланс: {self.balance}"
+            f" на {self.last_operation_created_at}"
+        )
+
+
+class DailyRollup(models.Model):
+    wallet = models.ForeignKey(
+        Wallet,
+        on_delete=models.CASCADE,
+        related_name="daily_rollups",
+    )
+    day = models.DateField()
+    operation_type = models.CharField(
+        max_length=8,
+        choices=OperationType.choices,
+    )
+    total = models.DecimalField(
+        max_digits=20,
+        decimal_places=2,
+        default=Decimal("0.00"),
+    )
+    count = models.PositiveIntegerField(
+        default=0,
+    )
+
+    def __str__(self):
+        return (
+            f"Обороты кошелька {self.wallet_id} за {self.day};"
+            f" {self.operation_type}; {self.total}"
+        )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["wallet", "day", "operation_type"],
+                name="unique_wallet_day_operation_type",
+            ),
+        ]
+
+
+class RollupHighWaterMark(models.Model):
+    name = models.CharField(
+        max_length=32,
+        primary_key=True,
+    )
+    last_operation_created_at = models.DateTimeField(
+        null=True,
+        blank=True,
+    )
+    last_operation_id = models.UUIDField(
+        null=True,
+        blank=True,
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+    )
+
+    def __str__(self):
+        return f"Свёртка {self.name} до {self.last_operation_created_at}"
+
+
+class ImportCheckpoint(models.Model):
+    name = models.CharField(
+        max_length=255,
+        primary_key=True,
+    )
+    rows = models.PositiveBigIntegerField(
+        default=0,
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+    )
+
+    def __str__(self):
+        return f"Импорт {self.name}; строк: {self.rows}"
+
+
+class OutboxEvent(models.Model):
+    """
+    Событие ленты изменений: снимок операции, записанный в той же
+    транзакции, что и сама операция. id — возрастающий номер события.
+    """
+
+    id = models.BigAutoField(
+        primary_key=True,
+    )
+    operation_id = models.UUIDField()
+    wallet_id = models.UUIDField()
+    operation_type = models.CharField(
+        max_length=8,
+        choices=OperationType.choices,
+    )
+    amount = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+    )
+    occurred_at = models.DateTimeField()
+    created_at = models.DateTimeField(
+        default=timezone.now,
+    )
+
+    def __str__(self):
+        return f"Событие {self.id}; операция {self.operation_id}"
+
+
+class OutboxCheckpoint(models.Model):
+    name = models.CharField(
+        max_length=255,
+        primary_key=True,
+    )
+    last_event_id = models.PositiveBigIntegerField(
+        default=0,
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+    )
+
+    def __str__(self):
+        return f"Доставка {self.name} до события {self.last_event_id}"
@@ -0,0 +1,106 @@
+"""
+Транзакционный outbox операций и лента изменений.
+
+Каждая операция, записанная через WalletService, в той же транзакции
+получает OutboxEvent с возрастающим номером id. Потребители читают
+события после своего курсора по первичному ключу — это O(новых
+событий) без сканирования таблицы операций.
+
+Номера выдаются при вставке, а видны после коммита, поэтому событие
+с меньшим номером может появиться позже большего. Чтобы курсор не
+перепрыгнул такое событие, чтение останавливается на первом пропуске
+номера, пока пропуск моложе GAP_GRACE_SECONDS; более старый пропуск
+считается откатившейся транзакцией.
+"""
+
+import time
+from datetime import timedelta
+from typing import Iterable
+
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+
+from apps.wallets.models import Operation, OutboxCheckpoint, OutboxEvent
+
+
+def _config() -> dict:
+    return settings.WALLETS_OUTBOX
+
+
+def record(operations: Iterable[Operation]) -> None:
+    """Записать события операций; вызывается в транзакции операций."""
+    OutboxEvent.objects.bulk_create(
+        [
+            OutboxEvent(
+                operation_id=operation.id,
+                wallet_id=operation.wallet_id,
+                operation_type=operation.operation_type,
+                amount=operation.amount,
+                occurred_at=operation.created_at,
+            )
+            for operation in operations
+        ]
+    )
+
+
+def fetch(cursor: int, limit: int) -> list[OutboxEvent]:
+    """События после cursor по порядку, без перескока через пропуски."""
+    events = list(
+        OutboxEvent.objects.filter(id__gt=cursor).order_by("id")[:limit]
+    )
+    settled_before = timezone.now() - timedelta(
+        seconds=_config()["GAP_GRACE_SECONDS"]
+    )
+    expected = cursor + 1
+    for position, event in enumerate(events):
+        if event.id != expected and event.created_at > settled_before:
+            return events[:position]
+        expected = event.id + 1
+    return events
+
+
+def wait_for(cursor: int, limit: int, timeout: float) -> list[OutboxEvent]:
+    """
+    Долгий опрос: ждать событий после cursor не дольше timeout секунд.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        events = fetch(cursor, limit)
+        if events or time.monotonic() >= deadline:
+            return events
+        time.sleep(_config()["POLL_INTERVAL_SECONDS"])
+
+
+def checkpoint(name: str) -> int:
+    """Курсор потребителя name; 0 — событий ещё не получал."""
+    return (
+        OutboxCheckpoint.objects.filter(name=name)
+        .values_list("last_event_id", flat=True)
+        .first()
+        or 0
+    )
+
+
+def save_checkpoint(name: str, last_event_id: int) -> None:
+    OutboxCheckpoint.objects.update_or_create(
+        name=name, defaults={"last_event_id": last_event_id}
+    )
+
+
+def purge(now=None) -> int:
+    """
+    Удалить события старше RETENTION_HOURS, уже доставленные всем
+    потребителям с контрольными точками.
+    """
+    now = now or timezone.now()
+    lookups = {
+        "created_at__lt": now - timedelta(hours=_config()["RETENTION_HOURS"])
+    }
+    delivered = OutboxCheckpoint.objects.aggregate(
+        last_event_id=Min("last_event_id")
+    )["last_event_id"]
+    if delivered is not None:
+        lookups["id__lte"] = delivered
+    deleted, _ = OutboxEvent.objects.filter(**lookups).delete()
+    return deleted
@@ -0,0 +1,173 @@
+import base64
+import binascii
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from django.core.paginator import Paginator
+from django.db import connection, connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+ESTIMATED_ROWS_SQL = """
+    SELECT coalesce(sum(greatest(reltuples, 0)), 0)::bigint
+    FROM pg_class
+    WHERE oid = %s::regclass
+        OR oid IN (
+            SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass
+        )
+"""
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator для админки без COUNT(*) по всей таблице.
+
+    Число строк таблицы без фильтров на PostgreSQL берётся из статистики
+    планировщика (pg_class.reltuples, у секционированной таблицы —
+    сумма по секциям). Остальные запросы считаются не дальше
+    max_count строк, поэтому счётчик большой выборки приблизительный.
+    """
+
+    max_count = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self._estimated_rows(queryset)
+            if estimate is not None and estimate > self.max_count:
+                return estimate
+        return queryset.order_by()[: self.max_count].count()
+
+    @staticmethod
+    def _estimated_rows(queryset):
+        db = connections[queryset.db]
+        if db.vendor != "postgresql":
+            return None
+        table = db.ops.quote_name(queryset.model._meta.db_table)
+        with db.cursor() as cursor:
+            cursor.execute(ESTIMATED_ROWS_SQL, [table, table])
+            return cursor.fetchone()[0]
+
+
+class OperationKeysetPagination(BasePagination):
+    """
+    Keyset-пагинация операций по (created_at, id) в обратном порядке.
+
+    Курсор хранит ключ последней записи страницы, и следующая страница
+    читается по индексу (wallet_id, created_at, id) с этого места,
+    поэтому время ответа не зависит от глубины страницы.
+
+    На PostgreSQL таблица операций секционирована по месяцам, и страница
+    сначала ищется в окнах search_windows от курсора: запрос с границами
+    created_at читает только секции окна, а не по строке индекса
+    из каждой секции. Окно расширяется, только если страница
+    не набралась.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 50
+    max_page_size = 500
+    invalid_cursor_message = "Неверный курсор."
+    search_windows = (timedelta(days=31), timedelta(days=365))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self._get_page_size(request)
+        cursor = self._decode_cursor(request)
+        anchor = timezone.now()
+        if cursor is not None:
+            created_at, operation_id = cursor
+            anchor = created_at
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at)
+                | Q(created_at=created_at, id__lt=operation_id),
+                created_at__lte=created_at,
+            )
+        queryset = queryset.order_by("-created_at", "-id")
+        windows = (
+            self.search_windows if connection.vendor == "postgresql" else ()
+        )
+        for window in windows:
+            page = list(
+                queryset.filter(created_at__gte=anchor - window)[
+                    : page_size + 1
+                ]
+            )
+            if len(page) > page_size:
+                break
+        else:
+            page = list(queryset[: page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self._encode_cursor(last)
+        )
+
+    def _get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def _encode_cursor(self, operation):
+        raw = f"{operation.created_at.isoformat()}|{operation.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def _decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode()).decode()
+            created_at, operation_id = raw.split("|")
+            return datetime.fromisoformat(created_at), UUID(operation_id)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Курсор следующей страницы.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": (
+                    f"Размер страницы, не больше {self.max_page_size}."
+                ),
+                "schema": {"type": "integer"},
+            },
+        ]
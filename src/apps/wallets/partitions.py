@@ -0,0 +1,354 @@
+"""
+Помесячные секции таблицы операций и их архив.
+
+На PostgreSQL wallets_operation секционирована по created_at
+(миграция 0011): секция wallets_operation_pYYYY_MM на каждый месяц
+по UTC и секция по умолчанию для строк вне созданных месяцев. Запись
+операций и чтение недавней истории затрагивают только текущие секции.
+
+Команда operation_partitions заранее создаёт секции будущих месяцев
+и архивирует старые: секция выгружается в operations-YYYY-MM.csv.gz
+в формате выгрузки (exports) с полями balance_after и
+linked_operation_id (ARCHIVE_FIELDS), суммы её операций переносятся
+в LedgerCheckpoint.archived_balance, после чего секция отсоединяется
+и удаляется. Архивы читает read_archive.
+"""
+
+import csv
+import gzip
+import os
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+from pathlib import Path
+from typing import Iterator
+from uuid import UUID
+
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils.dateparse import parse_datetime
+
+from apps.wallets import rollups
+from apps.wallets.exports import EXPORT_FIELDS, stream_operations
+from apps.wallets.ledger import CENT, SIGNED_AMOUNT, ZERO
+from apps.wallets.models import (
+    IdempotencyKey,
+    LedgerCheckpoint,
+    Operation,
+    RollupHighWaterMark,
+)
+
+TABLE = Operation._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_NAME = re.compile(rf"^{TABLE}_p(\d{{4}})_(\d{{2}})$")
+ARCHIVE_NAME = re.compile(r"^operations-(\d{4})-(\d{2})\.csv\.gz$")
+ARCHIVE_FIELDS = (*EXPORT_FIELDS, "balance_after", "linked_operation_id")
+
+
+class PartitionError(Exception):
+    """Секцию нельзя создать или архивировать."""
+
+
+@dataclass
+class ArchiveReport:
+    """Итог архивации секции."""
+
+    month: date
+    path: Path
+    operations: int
+    wallets: int
+
+
+def is_supported() -> bool:
+    return connection.vendor == "postgresql"
+
+
+def month_of(moment: datetime) -> date:
+    """Первое число месяца moment по UTC."""
+    return moment.astimezone(dt_timezone.utc).date().replace(day=1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month: date) -> tuple[datetime, datetime]:
+    """Границы секции месяца: [начало месяца, начало следующего) по UTC."""
+    return tuple(
+        datetime(bound.year, bound.month, 1, tzinfo=dt_timezone.utc)
+        for bound in (month, add_months(month, 1))
+    )
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_p{month:%Y_%m}"
+
+
+def archive_name(month: date) -> str:
+    return f"operations-{month:%Y-%m}.csv.gz"
+
+
+def list_partitions() -> list[date]:
+    """Месяцы, для которых есть секции, по возрастанию."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT inhrelid::regclass::text FROM pg_inherits"
+            " WHERE inhparent = %s::regclass",
+            [TABLE],
+        )
+        names = [name.strip('"') for (name,) in cursor.fetchall()]
+    return sorted(
+        date(int(match[1]), int(match[2]), 1)
+        for match in map(PARTITION_NAME.match, names)
+        if match
+    )
+
+
+def create_partition(month: date) -> None:
+    """
+    Создать секцию месяца.
+
+    Строки месяца, уже попавшие в секцию по умолчанию, переносятся
+    в новую таблицу до её присоединения. Секция по умолчанию
+    блокируется на время переноса, поэтому вставки в неё ждут.
+    """
+    quote = connection.ops.quote_name
+    name = quote(partition_name(month))
+    lower, upper = month_bounds(month)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE {name} (LIKE {quote(TABLE)} INCLUDING DEFAULTS)"
+        )
+        cursor.execute(
+            f"LOCK TABLE {quote(DEFAULT_PARTITION)} IN ACCESS EXCLUSIVE MODE"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)}"
+            " WHERE created_at >= %s AND created_at < %s RETURNING *)"
+            f" INSERT INTO {name} SELECT * FROM moved",
+            [lower, upper],
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {name}"
+            " FOR VALUES FROM (%s) TO (%s)",
+            [lower, upper],
+        )
+
+
+def archive_partition(month: date, archive_dir: str | Path) -> ArchiveReport:
+    """
+    Выгрузить секцию месяца в архив и удалить её.
+
+    Секция блокируется от записи, поэтому архив, суммы в контрольных
+    точках сверки и удаление видят одни и те же строки. Операции
+    секции должны быть уже свёрнуты rollup_operations, иначе они
+    пропадут из статистики.
+    """
+    if month not in list_partitions():
+        raise PartitionError(f"Нет секции за {month:%Y-%m}.")
+    quote = connection.ops.quote_name
+    name = quote(partition_name(month))
+    lower, upper = month_bounds(month)
+    operations = Operation.objects.filter(
+        created_at__gte=lower, created_at__lt=upper
+    )
+    path = Path(archive_dir) / archive_name(month)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {name} IN EXCLUSIVE MODE")
+        last = (
+            operations.order_by("-created_at", "-id")
+            .values_list("created_at", "id")
+            .first()
+        )
+        mark = RollupHighWaterMark.objects.filter(
+            name=rollups.HIGH_WATER_MARK, last_operation_id__isnull=False
+        ).first()
+        if last is not None and (
+            mark is None
+            or last > (mark.last_operation_created_at, mark.last_operation_id)
+        ):
+            raise PartitionError(
+                f"Операции за {month:%Y-%m} ещё не свёрнуты"
+                " rollup_operations."
+            )
+
+        write_archive(operations, path)
+
+        wallets = fold_into_checkpoints(operations, upper)
+        count = operations.count()
+        IdempotencyKey.objects.filter(
+            operation__created_at__gte=lower, operation__created_at__lt=upper
+        ).delete()
+        Operation.objects.filter(
+            linked_operation__created_at__gte=lower,
+            linked_operation__created_at__lt=upper,
+        ).exclude(created_at__gte=lower, created_at__lt=upper).update(
+            linked_operation=None
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"ALTER TABLE {quote(TABLE)} DETACH PARTITION {name}"
+            )
+            cursor.execute(f"DROP TABLE {name}")
+    return ArchiveReport(month, path, count, wallets)
+
+
+def write_archive(operations, path: Path) -> None:
+    """
+    Записать operations в архив path атомарно: через временный файл,
+    который заменяет path только после записи на диск.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".partial")
+    with open(partial, "wb") as archive:
+        archive.writelines(
+            stream_operations(operations, "csv", True, fields=ARCHIVE_FIELDS)
+        )
+        archive.flush()
+        os.fsync(archive.fileno())
+    os.replace(partial, path)
+
+
+def fold_into_checkpoints(operations, upper: datetime) -> int:
+    """
+    Перенести суммы operations в archived_balance контрольных точек.
+
+    operations — все операции одной секции, upper — её верхняя
+    граница. Контрольная точка, не дошедшая до последней операции
+    кошелька в секции, сдвигается на неё: после удаления секции
+    сверка уже не сможет прочитать эти операции. Возвращает число
+    кошельков.
+    """
+    last = operations.filter(wallet=OuterRef("wallet")).order_by(
+        "-created_at", "-id"
+    )
+    rows = (
+        operations.values("wallet")
+        .annotate(
+            total=Sum(SIGNED_AMOUNT),
+            last_created_at=Subquery(last.values("created_at")[:1]),
+            last_id=Subquery(last.values("id")[:1]),
+        )
+        .values_list("wallet", "total", "last_created_at", "last_id")
+        .order_by()
+    )
+    totals = {wallet_id: rest for wallet_id, *rest in rows}
+    existing = LedgerCheckpoint.objects.select_for_update().in_bulk(
+        list(totals)
+    )
+    lagging = [
+        wallet_id
+        for wallet_id, (_, *last_operation) in totals.items()
+        if wallet_id not in existing
+        or (
+            existing[wallet_id].last_operation_created_at,
+            existing[wallet_id].last_operation_id,
+        )
+        < tuple(last_operation)
+    ]
+    # Для отстающих кошельков баланс считается по всем операциям
+    # до верхней границы секции: более ранние секции уже в archived_balance.
+    live = dict(
+        Operation.objects.filter(wallet__in=lagging, created_at__lt=upper)
+        .values("wallet")
+        .annotate(total=Sum(SIGNED_AMOUNT, default=ZERO))
+        .values_list("wallet", "total")
+        .order_by()
+    )
+
+    checkpoints = []
+    for wallet_id, (total, last_created_at, last_id) in totals.items():
+        checkpoint = existing.get(wallet_id) or LedgerCheckpoint(
+            wallet_id=wallet_id
+        )
+        if wallet_id in live:
+            checkpoint.balance = (
+                checkpoint.archived_balance + live[wallet_id]
+            ).quantize(CENT)
+            checkpoint.last_operation_created_at = last_created_at
+            checkpoint.last_operation_id = last_id
+        checkpoint.archived_balance = (
+            checkpoint.archived_balance + total
+        ).quantize(CENT)
+        checkpoints.append(checkpoint)
+    LedgerCheckpoint.objects.bulk_create(
+        checkpoints,
+        update_conflicts=True,
+        unique_fields=["wallet"],
+        update_fields=[
+            "balance",
+            "archived_balance",
+            "last_operation_created_at",
+            "last_operation_id",
+        ],
+    )
+    return len(checkpoints)
+
+
+def maintain(
+    now: datetime,
+    months_ahead: int,
+    retain_months: int,
+    archive_dir: str | Path,
+) -> tuple[list[date], list[ArchiveReport]]:
+    """
+    Создать секции на months_ahead месяцев вперёд и архивировать
+    секции старше retain_months месяцев, начиная с самой старой.
+    """
+    current = month_of(now)
+    existing = list_partitions()
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            create_partition(month)
+            created.append(month)
+    oldest_kept = add_months(current, -retain_months)
+    archived = [
+        archive_partition(month, archive_dir)
+        for month in existing
+        if month < oldest_kept
+    ]
+    return created, archived
+
+
+def read_archive(
+    archive_dir: str | Path,
+    wallet_id: UUID | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+) -> Iterator[dict]:
+    """
+    Прочитать операции из архивов в порядке (created_at, id).
+
+    Файлы вне [created_after, created_before) не открываются;
+    строки возвращаются словарями с полями ARCHIVE_FIELDS. Пустые
+    balance_after и linked_operation_id, а также их отсутствие
+    в архивах, записанных без этих полей, дают None.
+    """
+    files = {}
+    for path in Path(archive_dir).glob("operations-*.csv.gz"):
+        match = ARCHIVE_NAME.match(path.name)
+        if match:
+            files[date(int(match[1]), int(match[2]), 1)] = path
+    for month, path in sorted(files.items()):
+        lower, upper = month_bounds(month)
+        if (created_after and upper <= created_after) or (
+            created_before and lower >= created_before
+        ):
+            continue
+        with gzip.open(path, "rt", newline="") as archive:
+            for row in csv.DictReader(archive):
+                if wallet_id and row["wallet_id"] != str(wallet_id):
+                    continue
+                created_at = parse_datetime(row["created_at"])
+                if (created_after and created_at < created_after) or (
+                    created_before and created_at >= created_before
+                ):
+                    continue
+                yield {
+                    field: row.get(field) or None for field in ARCHIVE_FIELDS
+                }
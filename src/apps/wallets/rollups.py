@@ -0,0 +1,239 @@
+"""
+Дневные обороты кошельков.
+
+DailyRollup хранит сумму и число операций кошелька за день по типу
+операции. Свёртки заполняет команда rollup_operations порциями
+операций новее RollupHighWaterMark, поэтому запись операции не трогает
+общих строк. Статистика за период складывается из свёрток и операций
+новее отметки, которые ещё не свёрнуты (обычно это текущий день).
+
+created_at операции назначается до коммита, поэтому отметка сдвигается
+только до операций старше settled_before.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from uuid import UUID
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.wallets.models import (
+    DailyRollup,
+    Operation,
+    OperationType,
+    RollupHighWaterMark,
+)
+
+HIGH_WATER_MARK = "daily"
+
+
+@dataclass
+class Turnover:
+    """Обороты кошелька за период."""
+
+    deposit_total: Decimal = Decimal("0.00")
+    deposit_count: int = 0
+    withdraw_total: Decimal = Decimal("0.00")
+    withdraw_count: int = 0
+    transfer_total: Decimal = Decimal("0.00")
+    transfer_count: int = 0
+
+    def add(self, operation_type: str, total: Decimal, count: int) -> None:
+        if operation_type == OperationType.DEPOSIT:
+            self.deposit_total += total
+            self.deposit_count += count
+        elif operation_type == OperationType.WITHDRAW:
+            self.withdraw_total += total
+            self.withdraw_count += count
+        elif operation_type == OperationType.TRANSFER:
+            self.transfer_total += total
+            self.transfer_count += count
+
+    def merge(self, other: "Turnover") -> None:
+        self.add(
+            OperationType.DEPOSIT, other.deposit_total, other.deposit_count
+        )
+        self.add(
+            OperationType.WITHDRAW, other.withdraw_total, other.withdraw_count
+        )
+        self.add(
+            OperationType.TRANSFER, other.transfer_total, other.transfer_count
+        )
+
+
+def roll_up(settled_before: datetime, batch_size: int = 10000) -> int:
+    """
+    Свернуть следующую порцию операций после отметки.
+
+    Порция агрегируется в БД по (кошелёк, день, тип), свёртки
+    и отметка обновляются в одной транзакции. Отметка блокируется,
+    поэтому параллельные запуски выполняются по очереди. Возвращает
+    число свёрнутых операций.
+    """
+    RollupHighWaterMark.objects.get_or_create(name=HIGH_WATER_MARK)
+    with transaction.atomic():
+        mark = RollupHighWaterMark.objects.select_for_update().get(
+            name=HIGH_WATER_MARK
+        )
+        pending = _after(
+            Operation.objects.filter(created_at__lt=settled_before), mark
+        ).order_by("created_at", "id")
+        cursors = pending.values_list("created_at", "id")
+        last = next(iter(cursors[batch_size - 1 : batch_size]), None)
+        last = last or cursors.reverse().first()
+        if last is None:
+            return 0
+        last_created_at, last_id = last
+        batch = pending.filter(
+            Q(created_at__lt=last_created_at)
+            | Q(created_at=last_created_at, id__lte=last_id)
+        )
+
+        totals = (
+            batch.annotate(day=TruncDate("created_at"))
+            .values_list("wallet_id", "day", "operation_type")
+            .annotate(total=Sum("amount"), count=Count("id"))
+            .order_by()
+        )
+        rolled_up = _merge(totals)
+
+        mark.last_operation_created_at = last_created_at
+        mark.last_operation_id = last_id
+        mark.save()
+    return rolled_up
+
+
+def wallet_turnover(
+    wallet_id: UUID, date_from: date, date_to: date
+) -> dict[date, Turnover]:
+    """
+    Обороты кошелька по дням за [date_from, date_to].
+
+    Свёртки читаются между двумя чтениями отметки: если между ними
+    прошла свёртка, чтение повторяется, иначе её порция была бы
+    учтена дважды.
+    """
+    days = defaultdict(Turnover)
+    while True:
+        mark = RollupHighWaterMark.objects.filter(name=HIGH_WATER_MARK).first()
+        rollups = list(
+            DailyRollup.objects.filter(
+                wallet_id=wallet_id, day__range=(date_from, date_to)
+            ).values_list("day", "operation_type", "total", "count")
+        )
+        if _cursor(mark) == _cursor(
+            RollupHighWaterMark.objects.filter(name=HIGH_WATER_MARK).first()
+        ):
+            break
+
+    recent = _after(
+        Operation.objects.filter(
+            wallet_id=wallet_id,
+            created_at__gte=_day_start(date_from),
+            created_at__lt=_day_start(date_to + timedelta(days=1)),
+        ),
+        mark,
+    )
+    recent_totals = (
+        recent.annotate(day=TruncDate("created_at"))
+        .values_list("day", "operation_type")
+        .annotate(total=Sum("amount"), count=Count("id"))
+        .order_by()
+    )
+    for day, operation_type, total, count in [*rollups, *recent_totals]:
+        days[day].add(operation_type, total, count)
+    return dict(sorted(days.items()))
+
+
+def include_backdated(operations: list[Operation]) -> None:
+    """
+    Добавить в свёртки операции, записанные задним числом.
+
+    Операции до отметки rollup_operations уже не прочитает, поэтому
+    они сразу складываются в DailyRollup. Вызывается в транзакции
+    записи операций; отметка блокируется на время транзакции.
+    """
+    mark = (
+        RollupHighWaterMark.objects.select_for_update()
+        .filter(name=HIGH_WATER_MARK, last_operation_id__isnull=False)
+        .first()
+    )
+    if mark is None:
+        return
+    totals = defaultdict(lambda: [Decimal("0.00"), 0])
+    for operation in operations:
+        if (operation.created_at, operation.id) <= _cursor(mark):
+            key = (
+                operation.wallet_id,
+                timezone.localdate(operation.created_at),
+                operation.operation_type,
+            )
+            totals[key][0] += operation.amount
+            totals[key][1] += 1
+    if totals:
+        _merge((*key, total, count) for key, (total, count) in totals.items())
+
+
+def by_month(days: dict[date, Turnover]) -> dict[date, Turnover]:
+    """Сложить дневные обороты по месяцам (ключ — первое число)."""
+    months = defaultdict(Turnover)
+    for day, turnover in days.items():
+        months[day.replace(day=1)].merge(turnover)
+    return dict(months)
+
+
+def _merge(totals) -> int:
+    totals = {
+        (wallet_id, day, operation_type): (total, count)
+        for wallet_id, day, operation_type, total, count in totals
+    }
+    existing = {
+        (rollup.wallet_id, rollup.day, rollup.operation_type): rollup
+        for rollup in DailyRollup.objects.filter(
+            wallet_id__in={key[0] for key in totals},
+            day__in={key[1] for key in totals},
+        )
+    }
+    created, updated = [], []
+    for key, (total, count) in totals.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            wallet_id, day, operation_type = key
+            rollup = DailyRollup(
+                wallet_id=wallet_id, day=day, operation_type=operation_type
+            )
+            created.append(rollup)
+        else:
+            updated.append(rollup)
+        rollup.total += total
+        rollup.count += count
+    DailyRollup.objects.bulk_create(created)
+    DailyRollup.objects.bulk_update(updated, ["total", "count"])
+    return sum(count for _, count in totals.values())
+
+
+def _after(operations, mark: RollupHighWaterMark | None):
+    if mark is None or mark.last_operation_id is None:
+        return operations
+    return operations.filter(
+        Q(created_at__gt=mark.last_operation_created_at)
+        | Q(
+            created_at=mark.last_operation_created_at,
+            id__gt=mark.last_operation_id,
+        )
+    )
+
+
+def _cursor(mark: RollupHighWaterMark | None) -> tuple | None:
+    if mark is None:
+        return None
+    return mark.last_operation_created_at, mark.last_operation_id
+
+
+def _day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
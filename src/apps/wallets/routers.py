@@ -0,0 +1,148 @@
+"""
+Чтение с реплик с привязкой клиента к основной БД после записи.
+
+Представления с ReplicaReadMixin читают с реплики из
+WALLETS_REPLICAS["ALIASES"] (одной на запрос); остальные чтения и все
+записи идут в default. После успешного изменяющего запроса
+replica_middleware выставляет клиенту cookie и заголовок с моментом,
+до которого его чтения идут в основную БД (STICKY_SECONDS). Клиент,
+вернувший cookie или заголовок, видит свои записи, даже если реплика
+отстаёт. Представления с read_only = True принимают POST только ради
+тела запроса и клиента не привязывают.
+"""
+
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.decorators import sync_and_async_middleware
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+@dataclass
+class ReadState:
+    sticky: bool = False
+    replica: str | None = None
+
+
+_state: ContextVar[ReadState | None] = ContextVar("read_state", default=None)
+
+
+def _config() -> dict:
+    return settings.WALLETS_REPLICAS
+
+
+def use_replica() -> None:
+    """Направить чтения текущего запроса на реплику, если можно."""
+    state = _state.get()
+    aliases = _config()["ALIASES"]
+    if state is not None and not state.sticky and aliases:
+        state.replica = random.choice(aliases)
+
+
+def reads_primary() -> bool:
+    """Чтения текущего запроса обязаны идти в основную БД."""
+    state = _state.get()
+    return state is not None and state.sticky
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None:
+            return None
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему реплик переносит репликация.
+        return db not in _config()["ALIASES"]
+
+
+class ReplicaReadMixin:
+    """
+    Чтения представления идут на реплику. read_only = True — все методы
+    представления только читают, и клиент не привязывается к основной
+    БД.
+    """
+
+    read_only = False
+
+    def dispatch(self, request, *args, **kwargs):
+        use_replica()
+        return super().dispatch(request, *args, **kwargs)
+
+
+def _is_sticky(request) -> bool:
+    config = _config()
+    value = request.COOKIES.get(
+        config["STICKY_COOKIE"]
+    ) or request.headers.get(config["STICKY_HEADER"])
+    try:
+        return float(value) > time.time()
+    except (TypeError, ValueError):
+        return False
+
+
+def _start(request):
+    return _state.set(ReadState(sticky=_is_sticky(request)))
+
+
+def _is_read_only(request) -> bool:
+    match = getattr(request, "resolver_match", None)
+    view_class = getattr(getattr(match, "func", None), "view_class", None)
+    return getattr(view_class, "read_only", False)
+
+
+def _finish(request, response) -> None:
+    config = _config()
+    if (
+        not config["ALIASES"]
+        or request.method in SAFE_METHODS
+        or response.status_code >= 400
+        or _is_read_only(request)
+    ):
+        return
+    window = config["STICKY_SECONDS"]
+    until = f"{time.time() + window:.3f}"
+    response.set_cookie(
+        config["STICKY_COOKIE"], until, max_age=window, httponly=True
+    )
+    response[config["STICKY_HEADER"]] = until
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response):
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            token = _start(request)
+            try:
+                response = await get_response(request)
+            finally:
+                _state.reset(token)
+            _finish(request, response)
+            return response
+
+    else:
+
+        def middleware(request):
+            token = _start(request)
+            try:
+                response = get_response(request)
+            finally:
+                _state.reset(token)
+            _finish(request, response)
+            return response
+
+    return middleware
@@ -1,16 +1,388 @@
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.fields import SkipField, empty, get_error_detail
+
+from .exports import LINE_WRITERS
+from .models import Operation, OperationType, OutboxEvent, Wallet
 
-from .models import Operation, Wallet
+# Переводы выполняются отдельным эндпоинтом.
+BALANCE_OPERATION_TYPES = [
+    (choice.value, choice.label)
+    for choice in (OperationType.DEPOSIT, OperationType.WITHDRAW)
+]
 
 
 class OperationSerializer(serializers.ModelSerializer):
+    operation_type = serializers.ChoiceField(
+        choices=BALANCE_OPERATION_TYPES,
+    )
+
+    class Meta:
+        model = Operation
+        fields = ("id", "operation_type", "amount", "balance_after")
+        read_only_fields = ("id", "balance_after")
+
+
+class FastOperationSerializer:
+    """
+    Замена OperationSerializer для создания операции без ModelSerializer.
+
+    ModelSerializer строит поля при каждом создании. Здесь поля
+    OperationSerializer строятся один раз на процесс, а обычный запрос —
+    словарь с допустимым типом и суммой вида «123.45» — проверяется
+    без них. Остальные данные проходят через те же поля DRF, поэтому
+    ошибки и округление сумм совпадают с OperationSerializer.
+    """
+
+    AMOUNT_PATTERN = re.compile(r"\d{1,13}(?:\.\d{1,2})?")
+    CENT = Decimal("0.01")
+    OPERATION_TYPES = frozenset(value for value, _ in BALANCE_OPERATION_TYPES)
+    _fields = None
+
+    def __init__(self, instance=None, data=empty):
+        self.instance = instance
+        if data is not empty:
+            self.initial_data = data
+
+    @classmethod
+    def compiled_fields(cls):
+        if cls._fields is None:
+            cls._fields = OperationSerializer().fields
+        return cls._fields
+
+    def is_valid(self, *, raise_exception=False):
+        if not hasattr(self, "_validated_data"):
+            try:
+                self._validated_data = self._fast_path(
+                    self.initial_data
+                ) or self._run_validation(self.initial_data)
+            except serializers.ValidationError as exc:
+                self._validated_data = {}
+                self._errors = exc.detail
+            else:
+                self._errors = {}
+        if self._errors and raise_exception:
+            raise serializers.ValidationError(self._errors)
+        return not self._errors
+
+    @property
+    def errors(self):
+        return self._errors
+
+    @property
+    def validated_data(self):
+        return self._validated_data
+
+    @property
+    def data(self):
+        operation = self.instance
+        return {
+            "id": str(operation.id),
+            "operation_type": operation.operation_type,
+            "amount": self._decimal("amount", operation.amount),
+            "balance_after": self._decimal(
+                "balance_after", operation.balance_after
+            ),
+        }
+
+    @classmethod
+    def _decimal(cls, name, value):
+        if value is None:
+            return None
+        if value.as_tuple().exponent != -2:
+            return cls.compiled_fields()[name].to_representation(value)
+        return f"{value:f}"
+
+    @classmethod
+    def _fast_path(cls, data):
+        if type(data) is not dict:
+            return None
+        operation_type = data.get("operation_type")
+        amount = data.get("amount")
+        if (
+            type(operation_type) is not str
+            or operation_type not in cls.OPERATION_TYPES
+            or type(amount) is not str
+            or not cls.AMOUNT_PATTERN.fullmatch(amount)
+        ):
+            return None
+        amount = Decimal(amount).quantize(cls.CENT)
+        if amount < cls.CENT:
+            return None
+        return {"operation_type": operation_type, "amount": amount}
+
+    @classmethod
+    def _run_validation(cls, data):
+        if type(data) is not dict:
+            serializer = OperationSerializer(data=data)
+            serializer.is_valid(raise_exception=True)
+            return serializer.validated_data
+        validated, errors = {}, {}
+        for name, field in cls.compiled_fields().items():
+            if field.read_only:
+                continue
+            try:
+                validated[name] = field.run_validation(field.get_value(data))
+            except serializers.ValidationError as exc:
+                errors[name] = exc.detail
+            except DjangoValidationError as exc:
+                errors[name] = get_error_detail(exc)
+            except SkipField:
+                pass
+        if errors:
+            raise serializers.ValidationError(errors)
+        return validated
+
+
+class OperationHistorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Operation
-        fields = ("id", "operation_type", "amount")
-        read_only_fields = ("id",)
+        fields = (
+            "id",
+            "operation_type",
+            "amount",
+            "balance_after",
+            "created_at",
+            "linked_operation",
+        )
+
+
+class ChangeFeedQuerySerializer(serializers.Serializer):
+    cursor = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, default=100)
+    wait = serializers.FloatField(
+        min_value=0,
+        default=0,
+        help_text=(
+            "Сколько секунд ждать новых событий, если их нет."
+            " Только в профиле ASGI."
+        ),
+    )
+
+    def validate_limit(self, value):
+        return min(value, settings.WALLETS_OUTBOX["FEED_MAX_LIMIT"])
+
+    def validate_wait(self, value):
+        return min(value, settings.WALLETS_OUTBOX["MAX_WAIT_SECONDS"])
+
+
+class OutboxEventSerializer(serializers.ModelSerializer):
+    sequence = serializers.IntegerField(source="id", read_only=True)
+
+    class Meta:
+        model = OutboxEvent
+        fields = (
+            "sequence",
+            "operation_id",
+            "wallet_id",
+            "operation_type",
+            "amount",
+            "occurred_at",
+        )
+
+
+class ChangeFeedSerializer(serializers.Serializer):
+    events = OutboxEventSerializer(many=True)
+    next_cursor = serializers.IntegerField()
+
+
+class OperationHistoryFilterSerializer(serializers.Serializer):
+    operation_type = serializers.ChoiceField(
+        choices=OperationType.choices,
+        required=False,
+    )
+    amount_min = serializers.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        required=False,
+    )
+    amount_max = serializers.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        required=False,
+    )
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+
+    LOOKUPS = {
+        "operation_type": "operation_type",
+        "amount_min": "amount__gte",
+        "amount_max": "amount__lte",
+        "created_after": "created_at__gte",
+        "created_before": "created_at__lt",
+    }
+
+    def get_lookups(self) -> dict:
+        """Условия filter() для проверенных параметров."""
+        return {
+            self.LOOKUPS[name]: value
+            for name, value in self.validated_data.items()
+        }
+
+
+class OperationExportSerializer(OperationHistoryFilterSerializer):
+    export_format = serializers.ChoiceField(
+        choices=tuple(LINE_WRITERS),
+        default="csv",
+    )
+    gzip = serializers.BooleanField(default=False)
+
+    def get_lookups(self) -> dict:
+        return {
+            self.LOOKUPS[name]: value
+            for name, value in self.validated_data.items()
+            if name in self.LOOKUPS
+        }
+
+
+class AllOperationsExportSerializer(OperationExportSerializer):
+    created_after = serializers.DateTimeField()
+    created_before = serializers.DateTimeField()
 
 
 class WalletSerializer(serializers.ModelSerializer):
     class Meta:
         model = Wallet
         fields = ("id", "balance")
+
+
+class WalletBalanceSerializer(WalletSerializer):
+    """Кошелёк с балансом, включающим корзины разделённого кошелька."""
+
+    balance = serializers.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        source="total_balance",
+        read_only=True,
+    )
+
+
+class WalletQuerySerializer(serializers.Serializer):
+    as_of = serializers.DateTimeField(
+        required=False,
+        help_text="Вернуть баланс на этот момент времени.",
+    )
+
+
+class WalletBalancesQuerySerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False,
+        max_length=settings.WALLETS_BALANCES_MAX_IDS,
+    )
+
+    def validate_ids(self, value):
+        # Повторы убираются, порядок запроса сохраняется.
+        return list(dict.fromkeys(value))
+
+
+class WalletBalancesSerializer(serializers.Serializer):
+    wallets = WalletBalanceSerializer(many=True)
+    missing = serializers.ListField(child=serializers.UUIDField())
+
+
+class WalletStatsQuerySerializer(serializers.Serializer):
+    DAY = "day"
+    MONTH = "month"
+    DEFAULT_DAYS = 30
+
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    group_by = serializers.ChoiceField(
+        choices=(DAY, MONTH),
+        default=DAY,
+    )
+
+    def validate(self, attrs):
+        attrs.setdefault("date_to", timezone.localdate())
+        attrs.setdefault(
+            "date_from",
+            attrs["date_to"] - timedelta(days=self.DEFAULT_DAYS - 1),
+        )
+        if attrs["date_from"] > attrs["date_to"]:
+            raise serializers.ValidationError(
+                {"date_from": "Начало периода позже его конца."}
+            )
+        return attrs
+
+
+class TurnoverSerializer(serializers.Serializer):
+    deposit_total = serializers.DecimalField(max_digits=20, decimal_places=2)
+    deposit_count = serializers.IntegerField()
+    withdraw_total = serializers.DecimalField(max_digits=20, decimal_places=2)
+    withdraw_count = serializers.IntegerField()
+    transfer_total = serializers.DecimalField(max_digits=20, decimal_places=2)
+    transfer_count = serializers.IntegerField()
+
+
+class PeriodTurnoverSerializer(TurnoverSerializer):
+    period = serializers.DateField()
+
+
+class WalletStatsSerializer(serializers.Serializer):
+    wallet_id = serializers.UUIDField()
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    group_by = serializers.CharField()
+    total = TurnoverSerializer()
+    periods = PeriodTurnoverSerializer(many=True)
+
+
+class TransferSerializer(serializers.Serializer):
+    to_wallet_id = serializers.UUIDField()
+    amount = serializers.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        min_value=Decimal("0.01"),
+    )
+
+
+class TransferResultSerializer(serializers.ModelSerializer):
+    """Операция списания перевода и связанная с ней операция зачисления."""
+
+    to_wallet_id = serializers.UUIDField(source="linked_operation.wallet_id")
+
+    class Meta:
+        model = Operation
+        fields = (
+            "id",
+            "operation_type",
+            "amount",
+            "balance_after",
+            "to_wallet_id",
+            "linked_operation",
+        )
+
+
+class BatchOperationItemSerializer(OperationSerializer):
+    wallet_id = serializers.UUIDField()
+
+    class Meta(OperationSerializer.Meta):
+        fields = ("wallet_id", "operation_type", "amount")
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    ATOMIC = "atomic"
+    PARTIAL = "partial"
+
+    mode = serializers.ChoiceField(
+        choices=(ATOMIC, PARTIAL),
+        default=ATOMIC,
+    )
+    operations = BatchOperationItemSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=settings.WALLETS_BATCH_MAX_SIZE,
+    )
+
+
+class BatchOperationResultSerializer(serializers.Serializer):
+    status = serializers.IntegerField()
+    operation = OperationSerializer(required=False)
+    errors = serializers.DictField(required=False)
@@ -0,0 +1,264 @@
+"""
+Разделение баланса «горячих» кошельков на корзины.
+
+Баланс разделённого кошелька — это сумма Wallet.balance и балансов
+всех его WalletBucket. Пополнение попадает в случайную корзину, поэтому
+параллельные запросы не ждут друг друга на одной строке. Так как
+пополнение верно в любую часть баланса, а снятие никогда не уводит
+часть в минус, устаревшее представление процесса о разделённых
+кошельках влияет только на скорость, но не на корректность.
+"""
+
+import random
+import threading
+import time
+from decimal import Decimal
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.wallets.models import Wallet, WalletBucket
+
+
+def _config() -> dict:
+    return settings.WALLETS_SHARDING
+
+
+class ShardRegistry:
+    """Кэш процесса: какие кошельки разделены и на сколько корзин."""
+
+    def __init__(self):
+        self._bucket_counts: dict[UUID, int] = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def bucket_count(self, wallet_id: UUID) -> int:
+        self._refresh_if_stale()
+        return self._bucket_counts.get(wallet_id, 0)
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def _refresh_if_stale(self) -> None:
+        refresh_seconds = _config()["REGISTRY_REFRESH_SECONDS"]
+        loaded_at = self._loaded_at
+        if loaded_at is not None and (
+            time.monotonic() - loaded_at < refresh_seconds
+        ):
+            return
+        with self._lock:
+            if self._loaded_at is not loaded_at:
+                return
+            self._bucket_counts = dict(
+                Wallet.objects.filter(bucket_count__gt=0).values_list(
+                    "id", "bucket_count"
+                )
+            )
+            self._loaded_at = time.monotonic()
+
+
+class ContentionTracker:
+    """
+    Счётчик ожиданий блокировки строки кошелька.
+
+    Ожиданием считается UPDATE баланса, выполнявшийся дольше
+    LOCK_WAIT_THRESHOLD_MS. Счётчики хранятся в кэше Django по окнам
+    WINDOW_SECONDS; чтобы их видели все процессы, кэш должен быть общим.
+    """
+
+    def observe(
+        self, wallet_id: UUID, seconds: float, sharded: bool = False
+    ) -> None:
+        config = _config()
+        if seconds * 1000 < config["LOCK_WAIT_THRESHOLD_MS"]:
+            return
+        lock_waits = self._increment(wallet_id)
+        if (
+            config["AUTO_PROMOTE"]
+            and not sharded
+            and lock_waits >= config["PROMOTE_AFTER"]
+        ):
+            transaction.on_commit(lambda: promote_wallet(wallet_id))
+
+    def is_shared(self) -> bool:
+        """Счётчики видны всем процессам, а не только текущему."""
+        return not isinstance(self._cache(), (LocMemCache, DummyCache))
+
+    def lock_waits(self, wallet_id: UUID, windows_ago: int = 0) -> int:
+        key = self._key(wallet_id, self._window() - windows_ago)
+        return self._cache().get(key, 0)
+
+    def _increment(self, wallet_id: UUID) -> int:
+        cache = self._cache()
+        key = self._key(wallet_id, self._window())
+        cache.add(key, 0, timeout=_config()["WINDOW_SECONDS"] * 2)
+        return cache.incr(key)
+
+    @staticmethod
+    def _window() -> int:
+        return int(time.time() // _config()["WINDOW_SECONDS"])
+
+    @staticmethod
+    def _key(wallet_id: UUID, window: int) -> str:
+        return f"wallets:lock-waits:{wallet_id}:{window}"
+
+    @staticmethod
+    def _cache():
+        return caches[_config()["CACHE"]]
+
+
+registry = ShardRegistry()
+tracker = ContentionTracker()
+
+
+def promote_wallet(wallet_id: UUID, buckets: int | None = None) -> bool:
+    """
+    Разделить баланс кошелька на корзины.
+
+    Баланс не переносится: новые корзины пустые, и кошелёк остаётся
+    доступным на всё время операции.
+    """
+    buckets = buckets or _config()["BUCKETS"]
+    with transaction.atomic():
+        promoted = Wallet.objects.filter(id=wallet_id, bucket_count=0).update(
+            bucket_count=buckets, sharded_at=timezone.now()
+        )
+        if promoted:
+            WalletBucket.objects.bulk_create(
+                [
+                    WalletBucket(wallet_id=wallet_id, index=index)
+                    for index in range(buckets)
+                ],
+                ignore_conflicts=True,
+            )
+    registry.invalidate()
+    return bool(promoted)
+
+
+def demote_wallet(wallet_id: UUID) -> bool:
+    """Собрать балансы корзин обратно в строку кошелька."""
+    with transaction.atomic():
+        wallet = (
+            Wallet.objects.select_for_update()
+            .filter(id=wallet_id, bucket_count__gt=0)
+            .first()
+        )
+        if wallet is None:
+            return False
+        wallet.balance += _lock_and_drain_buckets([wallet_id])[wallet_id]
+        wallet.bucket_count = 0
+        wallet.sharded_at = None
+        wallet.save(update_fields=["balance", "bucket_count", "sharded_at"])
+        WalletBucket.objects.filter(wallet_id=wallet_id).delete()
+    registry.invalidate()
+    return True
+
+
+def fold_buckets(wallets: dict[UUID, Wallet]) -> list[UUID]:
+    """
+    Перенести балансы корзин в уже заблокированные строки кошельков.
+
+    Используется пакетными операциями, которым нужен весь баланс
+    кошелька в одной строке. Корзины блокируются после кошельков
+    в порядке (wallet_id, index), как и при сборе баланса. Изменённые
+    строки кошельков должен сохранить вызывающий код.
+    """
+    sharded_ids = [
+        wallet_id
+        for wallet_id, wallet in wallets.items()
+        if wallet.bucket_count
+    ]
+    if not sharded_ids:
+        return []
+    for wallet_id, drained in _lock_and_drain_buckets(sharded_ids).items():
+        wallets[wallet_id].balance += drained
+    return sharded_ids
+
+
+def deposit_to_bucket(
+    wallet_id: UUID, bucket_count: int, amount: Decimal
+) -> bool:
+    """
+    Пополнить случайную корзину кошелька.
+
+    Если корзина уже удалена при сборе баланса, пополняется
+    строка самого кошелька.
+    """
+    index = random.randrange(bucket_count)
+    if WalletBucket.objects.filter(wallet_id=wallet_id, index=index).update(
+        balance=F("balance") + amount
+    ):
+        return True
+    return bool(
+        Wallet.objects.filter(id=wallet_id).update(
+            balance=F("balance") + amount
+        )
+    )
+
+
+def withdraw_from_buckets(wallet_id: UUID, amount: Decimal) -> bool:
+    """
+    Снять средства с разделённого кошелька.
+
+    Сначала по очереди пробуются корзины, каждой из которых хватает
+    на всю сумму, затем строка кошелька. Только если ни одна часть
+    не покрывает сумму целиком, все части блокируются и списываются
+    вместе.
+    """
+    candidates = list(
+        WalletBucket.objects.filter(
+            wallet_id=wallet_id, balance__gte=amount
+        ).values_list("index", flat=True)
+    )
+    random.shuffle(candidates)
+    for index in candidates:
+        if WalletBucket.objects.filter(
+            wallet_id=wallet_id, index=index, balance__gte=amount
+        ).update(balance=F("balance") - amount):
+            return True
+    if Wallet.objects.filter(id=wallet_id, balance__gte=amount).update(
+        balance=F("balance") - amount
+    ):
+        return True
+    return _sweep(wallet_id, amount)
+
+
+def _sweep(wallet_id: UUID, amount: Decimal) -> bool:
+    wallet = Wallet.objects.select_for_update().filter(id=wallet_id).first()
+    if wallet is None:
+        return False
+    buckets = list(
+        WalletBucket.objects.select_for_update()
+        .filter(wallet_id=wallet_id)
+        .order_by("index")
+    )
+    if wallet.balance + sum(bucket.balance for bucket in buckets) < amount:
+        return False
+    remaining = amount
+    for part in (wallet, *buckets):
+        taken = min(part.balance, remaining)
+        part.balance -= taken
+        remaining -= taken
+    wallet.save(update_fields=["balance"])
+    WalletBucket.objects.bulk_update(buckets, ["balance"])
+    return True
+
+
+def _lock_and_drain_buckets(wallet_ids: list[UUID]) -> dict[UUID, Decimal]:
+    drained = dict.fromkeys(wallet_ids, Decimal("0.00"))
+    buckets = list(
+        WalletBucket.objects.select_for_update()
+        .filter(wallet_id__in=wallet_ids)
+        .order_by("wallet_id", "index")
+    )
+    for bucket in buckets:
+        drained[bucket.wallet_id] += bucket.balance
+        bucket.balance = Decimal("0.00")
+    WalletBucket.objects.bulk_update(buckets, ["balance"])
+    return drained
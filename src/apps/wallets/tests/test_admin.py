@@ -0,0 +1,100 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.wallets.admin import OperationInline
+from apps.wallets.models import Operation, OperationType, Wallet
+from apps.wallets.pagination import EstimatedCountPaginator
+
+
+class AdminQueriesTest(TestCase):
+    """Число запросов страниц админки не зависит от объёма данных."""
+
+    def setUp(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser("admin")
+        )
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+        self._add_data(3)
+
+    def _add_data(self, count):
+        wallets = Wallet.objects.bulk_create(
+            Wallet(balance=Decimal("1.00")) for _ in range(count)
+        )
+        Operation.objects.bulk_create(
+            Operation(
+                wallet=wallet,
+                operation_type=OperationType.DEPOSIT,
+                amount=Decimal("1.00"),
+            )
+            for wallet in [self.wallet, *wallets] * count
+        )
+
+    def _get(self, url):
+        # Журнал действий админки читает тип содержимого из кэша.
+        ContentType.objects.clear_cache()
+        return self.client.get(url)
+
+    def _assert_constant_queries(self, url, queries):
+        with self.assertNumQueries(queries):
+            self.assertEqual(self._get(url).status_code, 200)
+        self._add_data(OperationInline.max_shown + 5)
+        with self.assertNumQueries(queries):
+            self.assertEqual(self._get(url).status_code, 200)
+
+    def test_wallet_changelist(self):
+        """Список кошельков."""
+        self._assert_constant_queries(
+            reverse("admin:wallets_wallet_changelist"), 4
+        )
+
+    def test_wallet_change_page(self):
+        """Кошелёк со списком последних операций."""
+        url = reverse("admin:wallets_wallet_change", args=[self.wallet.id])
+        self._assert_constant_queries(url, 5)
+        inline = self.client.get(url).context["inline_admin_formsets"][0]
+        self.assertEqual(
+            inline.formset.total_form_count(), OperationInline.max_shown
+        )
+
+    def test_operation_changelist(self):
+        """Список операций с фильтрами по кошельку, типу и периоду."""
+        url = reverse("admin:wallets_operation_changelist")
+        self._assert_constant_queries(url, 4)
+        for params in (
+            f"?wallet={self.wallet.id}",
+            "?operation_type__exact=DEPOSIT&created_at__gte=2025-01-01",
+            f"?q={self.wallet.id}",
+            "?q=not-a-uuid",
+        ):
+            with self.subTest(params=params), self.assertNumQueries(4):
+                response = self._get(url + params)
+            self.assertEqual(response.status_code, 200)
+
+    def test_operation_change_page(self):
+        """Операция с кошельком в raw_id-поле."""
+        operation = Operation.objects.first()
+        self._assert_constant_queries(
+            reverse("admin:wallets_operation_change", args=[operation.id]), 5
+        )
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    def setUp(self):
+        wallet = Wallet.objects.create()
+        Operation.objects.bulk_create(
+            Operation(wallet=wallet, amount=Decimal("1.00")) for _ in range(5)
+        )
+
+    def test_count_is_bounded(self):
+        """Без статистики PostgreSQL строки считаются до max_count."""
+        paginator = EstimatedCountPaginator(Operation.objects.all(), 2)
+        with mock.patch.object(EstimatedCountPaginator, "max_count", 3):
+            self.assertEqual(paginator.count, 3)
+        self.assertEqual(
+            EstimatedCountPaginator(Operation.objects.all(), 2).count, 5
+        )
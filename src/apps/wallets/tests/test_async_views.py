@@ -0,0 +1,176 @@
+import asyncio
+import json
+import uuid
+from decimal import Decimal
+
+from django.test import (
+    AsyncRequestFactory,
+    TransactionTestCase,
+    override_settings,
+)
+from rest_framework import status
+
+from apps.wallets.async_views import (
+    AsyncChangeFeedView,
+    AsyncOperationCreateView,
+    AsyncWalletView,
+)
+from apps.wallets.models import Operation, OperationType, Wallet
+
+
+class AsyncViewsTest(TransactionTestCase):
+    INITIAL_BALANCE = Decimal("100.00")
+
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+        self.wallet = Wallet.objects.create(balance=self.INITIAL_BALANCE)
+
+    async def _get(self, wallet_id):
+        request = self.factory.get(f"/api/v1/wallets/{wallet_id}/")
+        return await AsyncWalletView.as_view()(request, wallet_id=wallet_id)
+
+    async def _post(self, wallet_id, data, **headers):
+        request = self.factory.post(
+            f"/api/v1/wallets/{wallet_id}/operation/",
+            data=json.dumps(data),
+            content_type="application/json",
+            headers=headers,
+        )
+        return await AsyncOperationCreateView.as_view()(
+            request, wallet_id=wallet_id
+        )
+
+    async def test_get_wallet(self):
+        """Асинхронное получение информации о кошельке."""
+        response = await self._get(self.wallet.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            json.loads(response.content),
+            {"id": str(self.wallet.id), "balance": "100.00"},
+        )
+
+    async def test_get_nonexistent_wallet_returns_404(self):
+        """Асинхронный запрос несуществующего кошелька."""
+        response = await self._get(uuid.uuid4())
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_create_deposit_operation(self):
+        """Асинхронное создание операции пополнения."""
+        response = await self._post(
+            self.wallet.id,
+            {"operation_type": OperationType.DEPOSIT, "amount": "50.00"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = json.loads(response.content)
+        self.assertEqual(data["operation_type"], OperationType.DEPOSIT)
+        self.assertEqual(data["amount"], "50.00")
+        await self.wallet.arefresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("150.00"))
+
+    async def test_errors_match_sync_view(self):
+        """Ошибки имеют тот же формат, что и в синхронном представлении."""
+        response = await self._post(
+            self.wallet.id,
+            {"operation_type": OperationType.WITHDRAW, "amount": "200.00"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("amount", json.loads(response.content))
+
+        response = await self._post(uuid.uuid4(), {})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIn("detail", json.loads(response.content))
+
+    async def test_form_data_accepted(self):
+        """Тело разбирается теми же парсерами DRF, что и в синхронном."""
+        request = self.factory.post(
+            f"/api/v1/wallets/{self.wallet.id}/operation/",
+            data={"operation_type": OperationType.DEPOSIT, "amount": "5.00"},
+        )
+        response = await AsyncOperationCreateView.as_view()(
+            request, wallet_id=self.wallet.id
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        await self.wallet.arefresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("105.00"))
+
+    async def test_malformed_body_rejected(self):
+        for content_type, status_code in (
+            ("application/json", status.HTTP_400_BAD_REQUEST),
+            ("text/plain", status.HTTP_415_UNSUPPORTED_MEDIA_TYPE),
+        ):
+            request = self.factory.post(
+                f"/api/v1/wallets/{self.wallet.id}/operation/",
+                data="{",
+                content_type=content_type,
+            )
+            response = await AsyncOperationCreateView.as_view()(
+                request, wallet_id=self.wallet.id
+            )
+            self.assertEqual(response.status_code, status_code)
+            self.assertIn("detail", json.loads(response.content))
+
+    async def test_idempotency_key_supported(self):
+        """Повтор с тем же Idempotency-Key не применяет операцию дважды."""
+        data = {"operation_type": OperationType.DEPOSIT, "amount": "1.00"}
+        first = await self._post(self.wallet.id, data, idempotency_key="key")
+        retry = await self._post(self.wallet.id, data, idempotency_key="key")
+        self.assertEqual(first.content, retry.content)
+        self.assertEqual(await Operation.objects.acount(), 1)
+
+
+@override_settings(
+    WALLETS_OUTBOX={
+        "GAP_GRACE_SECONDS": 5,
+        "POLL_INTERVAL_SECONDS": 0.05,
+        "MAX_WAIT_SECONDS": 5,
+        "FEED_MAX_LIMIT": 100,
+        "RETENTION_HOURS": 1,
+    }
+)
+class AsyncChangeFeedTest(TransactionTestCase):
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+
+    async def _get(self, wallet_id):
+        request = self.factory.get(f"/api/v1/wallets/{wallet_id}/")
+        return await AsyncWalletView.as_view()(request, wallet_id=wallet_id)
+
+    async def _deposit(self):
+        request = self.factory.post(
+            f"/api/v1/wallets/{self.wallet.id}/operation/",
+            data=json.dumps(
+                {"operation_type": OperationType.DEPOSIT, "amount": "1.00"}
+            ),
+            content_type="application/json",
+        )
+        return await AsyncOperationCreateView.as_view()(
+            request, wallet_id=self.wallet.id
+        )
+
+    async def _feed(self, **params):
+        request = self.factory.get("/api/v1/wallets/changes/", params)
+        return await AsyncChangeFeedView.as_view()(request)
+
+    async def test_long_poll_does_not_block_other_requests(self):
+        """Пока долгий опрос ждёт событий, другие запросы обслуживаются."""
+        poll = asyncio.create_task(self._feed(wait=5))
+        await asyncio.sleep(0.1)
+        response = await self._get(self.wallet.id)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(poll.done())
+
+        response = await self._deposit()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = await asyncio.wait_for(poll, timeout=2)
+        data = json.loads(response.content)
+        self.assertEqual(
+            [event["operation_id"] for event in data["events"]],
+            [str((await Operation.objects.aget()).id)],
+        )
+        self.assertEqual(data["next_cursor"], data["events"][-1]["sequence"])
+
+    async def test_invalid_params(self):
+        response = await self._feed(cursor=-1)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("cursor", json.loads(response.content))
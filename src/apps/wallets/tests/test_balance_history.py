@@ -0,0 +1,231 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.wallets import balance_history, clock
+from apps.wallets.models import Operation, OperationType, Wallet
+from apps.wallets.sharding import promote_wallet
+from apps.wallets.wallet_service import WalletService
+
+
+class BalanceAfterTest(APITestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+        self.other_wallet = Wallet.objects.create(balance=Decimal("5.00"))
+
+    def test_operation_response_contains_new_balance(self):
+        """Ответ на операцию содержит новый баланс кошелька."""
+        url = reverse("operation-list", kwargs={"wallet_id": self.wallet.id})
+        response = self.client.post(
+            url, {"operation_type": OperationType.WITHDRAW, "amount": "30"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["balance_after"], "70.00")
+        operation = Operation.objects.get(id=response.data["id"])
+        self.assertEqual(operation.balance_after, Decimal("70.00"))
+
+    def test_batch_and_transfer_record_balances(self):
+        """Пакет и перевод записывают баланс после каждой операции."""
+        WalletService.apply_batch(
+            [
+                {
+                    "wallet_id": self.wallet.id,
+                    "operation_type": OperationType.DEPOSIT,
+                    "amount": Decimal("10.00"),
+                },
+                {
+                    "wallet_id": self.wallet.id,
+                    "operation_type": OperationType.WITHDRAW,
+                    "amount": Decimal("40.00"),
+                },
+            ]
+        )
+        debit = WalletService.transfer(
+            self.wallet.id, self.other_wallet.id, Decimal("20.00")
+        )
+        self.assertEqual(
+            list(
+                Operation.objects.filter(wallet=self.wallet)
+                .order_by("created_at", "id")
+                .values_list("balance_after", flat=True)
+            ),
+            [Decimal("110.00"), Decimal("70.00"), Decimal("50.00")],
+        )
+        self.assertEqual(
+            debit.linked_operation.balance_after, Decimal("25.00")
+        )
+
+    def test_write_paths_use_one_clock(self):
+        """Операции, пакеты и переводы берут время из clock.now()."""
+        moment = timezone.now() - timedelta(days=1)
+        with mock.patch.object(clock, "now", return_value=moment):
+            WalletService.apply_operation(
+                self.wallet.id, OperationType.DEPOSIT, Decimal("1.00")
+            )
+            WalletService.apply_batch(
+                [
+                    {
+                        "wallet_id": self.wallet.id,
+                        "operation_type": OperationType.DEPOSIT,
+                        "amount": Decimal("1.00"),
+                    }
+                ]
+            )
+            WalletService.transfer(
+                self.wallet.id, self.other_wallet.id, Decimal("1.00")
+            )
+        self.assertEqual(
+            set(Operation.objects.values_list("created_at", flat=True)),
+            {moment},
+        )
+
+
+class BalanceAsOfTest(APITestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+        self.operations = [
+            self._apply(operation_type, amount)
+            for operation_type, amount in (
+                (OperationType.DEPOSIT, "50.00"),
+                (OperationType.WITHDRAW, "20.00"),
+                (OperationType.DEPOSIT, "5.00"),
+            )
+        ]
+        self.wallet_url = reverse(
+            "wallet-detail", kwargs={"wallet_id": self.wallet.id}
+        )
+
+    def _apply(self, operation_type, amount):
+        return WalletService.apply_operation(
+            self.wallet.id, operation_type, Decimal(amount)
+        )
+
+    def _balances(self):
+        first = self.operations[0].created_at
+        return [
+            balance_history.balance_as_of(self.wallet.id, as_of)
+            for as_of in (
+                first - timedelta(seconds=1),
+                first,
+                self.operations[1].created_at,
+                self.operations[2].created_at + timedelta(seconds=1),
+            )
+        ]
+
+    def test_as_of_is_one_query(self):
+        """Баланс на момент времени читается одним запросом."""
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.wallet_url,
+                {"as_of": self.operations[1].created_at.isoformat()},
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {"id": str(self.wallet.id), "balance": "130.00"},
+        )
+
+    def test_balances_at_moments(self):
+        """Баланс до операций, между ними и после них."""
+        self.assertEqual(
+            self._balances(),
+            [
+                Decimal("100.00"),
+                Decimal("150.00"),
+                Decimal("130.00"),
+                Decimal("135.00"),
+            ],
+        )
+
+    def test_missing_balance_after_derived(self):
+        """Без balance_after баланс выводится из журнала."""
+        Operation.objects.update(balance_after=None)
+        self.assertEqual(
+            self._balances(),
+            [
+                Decimal("100.00"),
+                Decimal("150.00"),
+                Decimal("130.00"),
+                Decimal("135.00"),
+            ],
+        )
+
+    def test_invalid_requests(self):
+        """Неверная дата — 400, несуществующий кошелёк — 404."""
+        response = self.client.get(self.wallet_url, {"as_of": "вчера"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        url = reverse(
+            "wallet-detail",
+            kwargs={"wallet_id": "00000000-0000-4000-8000-000000000000"},
+        )
+        response = self.client.get(url, {"as_of": "2025-01-01T00:00:00Z"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BackfillBalanceAfterTest(TestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+        for operation_type, amount in (
+            (OperationType.DEPOSIT, "50.00"),
+            (OperationType.WITHDRAW, "20.00"),
+            (OperationType.DEPOSIT, "5.00"),
+            (OperationType.WITHDRAW, "1.00"),
+        ):
+            WalletService.apply_operation(
+                self.wallet.id, operation_type, Decimal(amount)
+            )
+        self.expected = self._balances_after()
+
+    def _balances_after(self):
+        return list(
+            Operation.objects.filter(wallet=self.wallet)
+            .order_by("created_at", "id")
+            .values_list("balance_after", flat=True)
+        )
+
+    def test_backfill_in_chunks(self):
+        """Пропуски заполняются порциями так же, как при записи."""
+        Operation.objects.update(balance_after=None)
+        out = StringIO()
+        call_command("backfill_balance_after", "--chunk-size", "3", stdout=out)
+        self.assertEqual(self._balances_after(), self.expected)
+        self.assertIn("Заполнено операций: 4", out.getvalue())
+
+    def test_gap_between_filled_operations(self):
+        """Пропуск в середине заполняется от следующей операции."""
+        middle = Operation.objects.order_by("created_at", "id")[1:3]
+        Operation.objects.filter(
+            id__in=[operation.id for operation in middle]
+        ).update(balance_after=None)
+        self.assertEqual(balance_history.backfill_wallet(self.wallet.id), 2)
+        self.assertEqual(self._balances_after(), self.expected)
+
+    def test_sharded_wallet_skipped(self):
+        """Разделённые кошельки не заполняются."""
+        Operation.objects.update(balance_after=None)
+        promote_wallet(self.wallet.id, buckets=2)
+        self.assertIsNone(balance_history.backfill_wallet(self.wallet.id))
+        self.assertFalse(
+            Operation.objects.filter(balance_after__isnull=False).exists()
+        )
+
+    def test_backdated_operations_reset_later_balances(self):
+        """Операция задним числом сбрасывает balance_after более поздних."""
+        operations = list(Operation.objects.order_by("created_at", "id"))
+        backdated = Operation(
+            wallet=self.wallet,
+            amount=Decimal("1.00"),
+            created_at=operations[2].created_at - timedelta(microseconds=1),
+        )
+        balance_history.reset_after([backdated])
+        self.assertEqual(
+            self._balances_after(), self.expected[:2] + [None, None]
+        )
@@ -0,0 +1,184 @@
+import threading
+import time
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.wallets import budgets, sharding
+from apps.wallets.async_views import error_response
+from apps.wallets.exceptions import WalletBusy
+from apps.wallets.models import Operation, OperationType, Wallet
+from apps.wallets.wallet_service import WalletService
+
+LOCK_BUDGET = {
+    "LOCK_TIMEOUT_MS": 200,
+    "REQUEST_DEADLINE_MS": 1000,
+    "RETRY_AFTER_SECONDS": 3,
+}
+
+
+def lock_timeouts():
+    return REGISTRY.get_sample_value("wallets_lock_timeouts_total") or 0
+
+
+def busy_timeout():
+    return connection.connection.execute("PRAGMA busy_timeout").fetchone()[0]
+
+
+@override_settings(WALLETS_LOCK_BUDGET=LOCK_BUDGET)
+class LockBudgetTest(TestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+
+    def test_expired_deadline_fails_fast(self):
+        """После дедлайна операция сразу отклоняется."""
+        before = lock_timeouts()
+        token = budgets._deadline.set(time.monotonic() - 1)
+        try:
+            with self.assertRaises(WalletBusy) as raised:
+                WalletService.apply_operation(
+                    self.wallet.id, OperationType.DEPOSIT, Decimal("1.00")
+                )
+        finally:
+            budgets._deadline.reset(token)
+
+        self.assertEqual(raised.exception.wait, 3)
+        self.assertFalse(Operation.objects.exists())
+        self.assertEqual(lock_timeouts(), before + 1)
+
+    def test_lock_timeout_becomes_wallet_busy(self):
+        """Таймаут блокировки превращается в WalletBusy."""
+        before = lock_timeouts()
+        with self.assertRaises(WalletBusy):
+            with transaction.atomic(), budgets.lock_budget(self.wallet.id):
+                raise OperationalError("database is locked")
+        self.assertEqual(lock_timeouts(), before + 1)
+
+    def test_lock_timeouts_by_wallet_are_in_tracker(self):
+        """По кошелькам таймауты считает трекер конкуренции, не метрика."""
+        other = Wallet.objects.create(balance=Decimal("1.00"))
+        before = lock_timeouts()
+        budgets.exhausted(self.wallet.id, other.id)
+        self.assertEqual(lock_timeouts(), before + 1)
+        self.assertEqual(sharding.tracker.lock_waits(self.wallet.id), 1)
+        self.assertEqual(sharding.tracker.lock_waits(other.id), 1)
+
+    def test_other_errors_are_not_converted(self):
+        with self.assertRaises(OperationalError):
+            with transaction.atomic(), budgets.lock_budget(self.wallet.id):
+                raise OperationalError("disk I/O error")
+
+    @unittest.skipUnless(connection.vendor == "sqlite", "Нужен SQLite")
+    def test_sqlite_busy_timeout_is_restored(self):
+        """busy_timeout действует только внутри бюджета."""
+        connection.ensure_connection()
+        previous = busy_timeout()
+        with transaction.atomic(), budgets.lock_budget(self.wallet.id):
+            self.assertEqual(busy_timeout(), 200)
+        self.assertEqual(busy_timeout(), previous)
+
+    def test_no_deadline_adds_no_queries(self):
+        """Вне запросов бюджет не выставляет таймауты запросом к БД."""
+        with transaction.atomic(), self.assertNumQueries(0):
+            with budgets.lock_budget(self.wallet.id):
+                pass
+
+    def test_no_deadline_outside_requests(self):
+        self.assertIsNone(budgets.remaining())
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "Нужен PostgreSQL")
+    def test_postgresql_timeouts_follow_deadline(self):
+        """lock_timeout не превышает остаток дедлайна запроса."""
+        token = budgets._deadline.set(time.monotonic() + 0.1)
+        try:
+            with transaction.atomic(), budgets.lock_budget(self.wallet.id):
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT current_setting('lock_timeout'),"
+                        " current_setting('statement_timeout')"
+                    )
+                    lock_timeout, statement_timeout = cursor.fetchone()
+        finally:
+            budgets._deadline.reset(token)
+        self.assertEqual(lock_timeout, statement_timeout)
+        self.assertNotEqual(lock_timeout, "0")
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "Нужен PostgreSQL")
+    def test_postgresql_statement_timeout_with_long_deadline(self):
+        """
+        statement_timeout следует дедлайну, даже когда lock_timeout
+        соединения в него укладывается.
+        """
+        token = budgets._deadline.set(time.monotonic() + 60)
+        try:
+            with transaction.atomic(), budgets.lock_budget(self.wallet.id):
+                with connection.cursor() as cursor:
+                    cursor.execute("SHOW statement_timeout")
+                    statement_timeout = cursor.fetchone()[0]
+        finally:
+            budgets._deadline.reset(token)
+        self.assertNotEqual(statement_timeout, "0")
+
+
+@override_settings(WALLETS_LOCK_BUDGET=LOCK_BUDGET)
+class ContendedWalletTest(TransactionTestCase):
+    def test_locked_wallet_returns_wallet_busy(self):
+        """Пока строку держит другая транзакция, операция отклоняется."""
+        wallet = Wallet.objects.create(balance=Decimal("100.00"))
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    Wallet.objects.filter(id=wallet.id).update(
+                        balance=Decimal("200.00")
+                    )
+                    locked.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            locked.wait(5)
+            with self.assertRaises(WalletBusy):
+                WalletService.apply_operation(
+                    wallet.id, OperationType.WITHDRAW, Decimal("1.00")
+                )
+        finally:
+            release.set()
+            holder.join()
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.balance, Decimal("200.00"))
+
+
+class WalletBusyResponseTest(APITestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+
+    def test_busy_wallet_returns_409_with_retry_after(self):
+        with mock.patch.object(
+            WalletService, "apply_operation", side_effect=WalletBusy(wait=2)
+        ):
+            response = self.client.post(
+                reverse(
+                    "operation-list", kwargs={"wallet_id": self.wallet.id}
+                ),
+                {"operation_type": OperationType.DEPOSIT, "amount": "1.00"},
+            )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response["Retry-After"], "2")
+        self.assertEqual(response.data["detail"].code, "wallet_busy")
+
+    def test_async_error_response_has_retry_after(self):
+        response = error_response(WalletBusy(wait=2))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response["Retry-After"], "2")
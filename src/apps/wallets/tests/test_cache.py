@@ -0,0 +1,245 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.wallets.cache import BalanceCache, balance_cache
+from apps.wallets.models import OperationType, Wallet
+
+BALANCE_CACHE = {
+    "ENABLED": True,
+    "MAX_ENTRIES": 2,
+    "TTL_SECONDS": 60,
+    "SHARED_CACHE": None,
+}
+
+
+def cache_requests(result):
+    return (
+        REGISTRY.get_sample_value(
+            "wallets_balance_cache_requests_total", {"result": result}
+        )
+        or 0
+    )
+
+
+@override_settings(WALLETS_BALANCE_CACHE=BALANCE_CACHE)
+class BalanceCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = BalanceCache()
+
+    def test_second_get_is_a_hit(self):
+        """Повторный запрос не вызывает загрузку."""
+        loads = []
+
+        def loader():
+            loads.append(1)
+            return {"balance": "1.00"}
+
+        hits_before = cache_requests("hit")
+        self.cache.get("wallet", loader)
+        self.assertEqual(self.cache.get("wallet", loader), {"balance": "1.00"})
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(cache_requests("hit") - hits_before, 1)
+
+    def test_least_recently_used_entry_evicted(self):
+        """При переполнении вытесняется давно не запрашиваемая запись."""
+        for key in ("first", "second", "first", "third"):
+            self.cache.get(key, lambda: {"key": key})
+        misses_before = cache_requests("miss")
+        self.cache.get("first", lambda: {})
+        self.assertEqual(cache_requests("miss") - misses_before, 0)
+        self.cache.get("second", lambda: {})
+        self.assertEqual(cache_requests("miss") - misses_before, 1)
+
+    @override_settings(
+        WALLETS_BALANCE_CACHE={**BALANCE_CACHE, "TTL_SECONDS": 0}
+    )
+    def test_expired_entry_reloaded(self):
+        """Устаревшая запись загружается заново."""
+        self.cache.get("wallet", lambda: {"balance": "1.00"})
+        value = self.cache.get("wallet", lambda: {"balance": "2.00"})
+        self.assertEqual(value, {"balance": "2.00"})
+
+    def test_concurrent_misses_coalesced(self):
+        """Одновременные промахи по одному ключу выполняют одну загрузку."""
+        release = threading.Event()
+        loads = []
+
+        def loader():
+            loads.append(1)
+            release.wait(timeout=5)
+            return {"balance": "1.00"}
+
+        coalesced_before = cache_requests("coalesced")
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(self.cache.get("w", loader))
+            )
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while cache_requests("coalesced") - coalesced_before < 3:
+            if time.monotonic() > deadline:
+                break
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(results, [{"balance": "1.00"}] * 4)
+
+    def test_invalidation_during_load_is_not_cached(self):
+        """Значение, загруженное до сброса, не сохраняется в кэш."""
+
+        def loader():
+            self.cache.invalidate("wallet")
+            return {"balance": "1.00"}
+
+        self.cache.get("wallet", loader)
+        value = self.cache.get("wallet", lambda: {"balance": "2.00"})
+        self.assertEqual(value, {"balance": "2.00"})
+
+    @override_settings(
+        WALLETS_BALANCE_CACHE={**BALANCE_CACHE, "SHARED_CACHE": "default"}
+    )
+    def test_shared_cache_used_by_other_processes(self):
+        """Загруженное значение доступно через общий кэш Django."""
+        caches["default"].clear()
+        self.cache.get("wallet", lambda: {"balance": "1.00"})
+        other_process_cache = BalanceCache()
+        value = other_process_cache.get("wallet", lambda: {})
+        self.assertEqual(value, {"balance": "1.00"})
+
+    @override_settings(
+        WALLETS_BALANCE_CACHE={**BALANCE_CACHE, "SHARED_CACHE": "default"}
+    )
+    def test_invalidation_in_other_process_seen(self):
+        """С общим кэшем сброс в другом процессе виден сразу."""
+        caches["default"].clear()
+        self.cache.get("wallet", lambda: {"balance": "1.00"})
+        BalanceCache().invalidate("wallet")
+        value = self.cache.get("wallet", lambda: {"balance": "2.00"})
+        self.assertEqual(value, {"balance": "2.00"})
+
+    def test_get_many_loads_only_misses(self):
+        """get_many загружает одним вызовом только отсутствующие в кэше."""
+        self.cache.get("first", lambda: {"balance": "1.00"})
+        calls = []
+
+        def loader(ids):
+            calls.append(ids)
+            return {"second": {"balance": "2.00"}}
+
+        found = self.cache.get_many(["first", "second", "missing"], loader)
+        self.assertEqual(calls, [["second", "missing"]])
+        self.assertEqual(
+            found,
+            {"first": {"balance": "1.00"}, "second": {"balance": "2.00"}},
+        )
+        self.assertEqual(
+            self.cache.get("second", lambda: {}), {"balance": "2.00"}
+        )
+
+    def test_get_many_missing_wallet_loaded_by_follower(self):
+        """Ожидающий get сам загружает кошелёк, не найденный get_many."""
+        release = threading.Event()
+
+        def loader(ids):
+            release.wait(timeout=5)
+            return {}
+
+        coalesced_before = cache_requests("coalesced")
+        leader = threading.Thread(
+            target=self.cache.get_many, args=(["wallet"], loader)
+        )
+        leader.start()
+        results = []
+        follower = threading.Thread(
+            target=lambda: results.append(
+                self.cache.get("wallet", lambda: {"balance": "1.00"})
+            )
+        )
+        follower.start()
+        deadline = time.monotonic() + 5
+        while cache_requests("coalesced") == coalesced_before:
+            if time.monotonic() > deadline:
+                break
+            time.sleep(0.001)
+        release.set()
+        leader.join()
+        follower.join()
+        self.assertEqual(results, [{"balance": "1.00"}])
+
+
+@override_settings(WALLETS_BALANCE_CACHE=BALANCE_CACHE)
+class WalletViewCacheTest(APITestCase):
+    def setUp(self):
+        balance_cache.clear()
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+        self.wallet_url = reverse(
+            "wallet-detail", kwargs={"wallet_id": self.wallet.id}
+        )
+
+    def test_cached_wallet_served_without_queries(self):
+        """Повторный GET кошелька обслуживается из кэша."""
+        self.client.get(self.wallet_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.wallet_url)
+        self.assertEqual(response.data["balance"], "100.00")
+
+    def test_operation_invalidates_on_commit(self):
+        """После коммита операции GET возвращает новый баланс."""
+        self.client.get(self.wallet_url)
+        operation_url = reverse(
+            "operation-list", kwargs={"wallet_id": self.wallet.id}
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                operation_url,
+                {"operation_type": OperationType.DEPOSIT, "amount": "5.00"},
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(self.wallet_url)
+        self.assertEqual(response.data["balance"], "105.00")
+
+    def test_balances_served_from_cache(self):
+        """Пакетное чтение использует тот же кэш, что и чтение кошелька."""
+        other = Wallet.objects.create(balance=Decimal("50.00"))
+        self.client.get(self.wallet_url)
+        ids = [str(self.wallet.id), str(other.id)]
+        balances_url = reverse("wallet-balances")
+        with self.assertNumQueries(1):
+            self.client.post(balances_url, {"ids": ids}, format="json")
+        with self.assertNumQueries(0):
+            response = self.client.get(balances_url, {"ids": ids})
+            self.client.get(
+                reverse("wallet-detail", kwargs={"wallet_id": other.id})
+            )
+        self.assertEqual(
+            [wallet["balance"] for wallet in response.data["wallets"]],
+            ["100.00", "50.00"],
+        )
+
+    def test_nonexistent_wallet_not_cached(self):
+        """404 не кэшируется."""
+        url = reverse(
+            "wallet-detail",
+            kwargs={"wallet_id": "00000000-0000-4000-8000-000000000000"},
+        )
+        self.assertEqual(
+            self.client.get(url).status_code, status.HTTP_404_NOT_FOUND
+        )
+        with self.assertNumQueries(1):
+            self.client.get(url)
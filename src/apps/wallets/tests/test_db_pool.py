@@ -0,0 +1,66 @@
+from django.test import SimpleTestCase
+from prometheus_client import CollectorRegistry
+
+from apps.wallets.db_pool import DatabasePoolCollector, database_pools
+
+
+class FakePool:
+    def __init__(self, stats):
+        self.stats = stats
+
+    def get_stats(self):
+        return self.stats
+
+
+class DatabasePoolCollectorTest(SimpleTestCase):
+    def collect(self, stats):
+        registry = CollectorRegistry()
+        registry.register(
+            DatabasePoolCollector(lambda: {"default": FakePool(stats)})
+        )
+        return registry
+
+    def test_pool_stats_are_exported(self):
+        """Статистика пула превращается в метрики с алиасом базы."""
+        registry = self.collect(
+            {
+                "pool_max": 10,
+                "pool_size": 4,
+                "pool_available": 1,
+                "requests_waiting": 2,
+                "requests_num": 50,
+                "requests_wait_ms": 1500,
+                "requests_errors": 3,
+                "connections_lost": 1,
+            }
+        )
+        alias = {"alias": "default"}
+        for name, labels, value in (
+            ("wallets_db_pool_connections", {"state": "in_use"}, 3),
+            ("wallets_db_pool_connections", {"state": "idle"}, 1),
+            ("wallets_db_pool_max_size", {}, 10),
+            ("wallets_db_pool_waiting", {}, 2),
+            ("wallets_db_pool_checkouts_total", {}, 50),
+            ("wallets_db_pool_checkout_wait_seconds_total", {}, 1.5),
+            ("wallets_db_pool_checkout_timeouts_total", {}, 3),
+            ("wallets_db_pool_connections_lost_total", {}, 1),
+        ):
+            with self.subTest(name=name, **labels):
+                self.assertEqual(
+                    registry.get_sample_value(name, {**alias, **labels}),
+                    value,
+                )
+
+    def test_missing_counters_are_zero(self):
+        """Ещё не увеличенные счётчики выводятся нулями."""
+        registry = self.collect({"pool_max": 10})
+        self.assertEqual(
+            registry.get_sample_value(
+                "wallets_db_pool_checkouts_total", {"alias": "default"}
+            ),
+            0,
+        )
+
+    def test_no_pools_without_postgresql(self):
+        """На SQLite пулов нет."""
+        self.assertEqual(database_pools(), {})
@@ -0,0 +1,111 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.wallets.models import Operation, OperationType, Wallet
+
+
+class OperationExportTest(APITestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+        self.other_wallet = Wallet.objects.create()
+        self.operations = Operation.objects.bulk_create(
+            Operation(
+                wallet=wallet,
+                amount=Decimal(index + 1),
+                operation_type=OperationType.DEPOSIT,
+            )
+            for index, wallet in enumerate(
+                [self.wallet, self.wallet, self.other_wallet]
+            )
+        )
+        now = timezone.now()
+        for index, operation in enumerate(self.operations):
+            operation.created_at = now - timedelta(days=index)
+        Operation.objects.bulk_update(self.operations, ["created_at"])
+        self.export_url = reverse(
+            "operation-export", kwargs={"wallet_id": self.wallet.id}
+        )
+
+    def _content(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content)
+
+    def test_csv_export(self):
+        """CSV содержит заголовок и операции кошелька от старых к новым."""
+        response = self.client.get(self.export_url)
+        rows = list(csv.reader(io.StringIO(self._content(response).decode())))
+
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn("attachment", response["Content-Disposition"])
+        self.assertEqual(
+            rows[0],
+            ["id", "wallet_id", "operation_type", "amount", "created_at"],
+        )
+        self.assertEqual(
+            [row[0] for row in rows[1:]],
+            [str(self.operations[1].id), str(self.operations[0].id)],
+        )
+        self.assertEqual(rows[1][3], "2.00")
+
+    def test_gzip_ndjson_export(self):
+        """NDJSON можно получить сжатым gzip."""
+        response = self.client.get(
+            self.export_url, {"export_format": "ndjson", "gzip": "true"}
+        )
+        lines = gzip.decompress(self._content(response)).splitlines()
+
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(
+            json.loads(lines[0])["wallet_id"], str(self.wallet.id)
+        )
+
+    def test_filters_applied(self):
+        """Выгрузка учитывает фильтры истории операций."""
+        response = self.client.get(
+            self.export_url,
+            {"export_format": "ndjson", "amount_min": "2"},
+        )
+        lines = self._content(response).splitlines()
+        self.assertEqual(len(lines), 1)
+
+    def test_all_wallets_export_requires_period(self):
+        """Выгрузка всех кошельков требует период."""
+        url = reverse("operation-export-all")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(
+            url,
+            {
+                "export_format": "ndjson",
+                "created_after": (
+                    timezone.now() - timedelta(days=3)
+                ).isoformat(),
+                "created_before": timezone.now().isoformat(),
+            },
+        )
+        self.assertEqual(len(self._content(response).splitlines()), 3)
+
+    def test_management_command(self):
+        """Команда export_operations пишет выгрузку в файл."""
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / "operations.csv"
+            call_command(
+                "export_operations",
+                wallet=str(self.wallet.id),
+                output=str(output),
+            )
+            self.assertEqual(len(output.read_text().splitlines()), 3)
@@ -0,0 +1,132 @@
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from prometheus_client import REGISTRY
+from rest_framework.exceptions import NotFound
+
+from apps.wallets import budgets, group_commit
+from apps.wallets.exceptions import WalletBusy
+from apps.wallets.models import Operation, OperationType, Wallet
+from apps.wallets.wallet_service import WalletService
+
+GROUP_COMMIT = {
+    "ENABLED": True,
+    "WINDOW_MS": 500,
+    "MAX_BATCH_SIZE": 100,
+}
+
+
+def committed_batches():
+    return REGISTRY.get_sample_value("wallets_group_commit_batch_size_count")
+
+
+@override_settings(WALLETS_GROUP_COMMIT=GROUP_COMMIT)
+class GroupCommitTest(TransactionTestCase):
+    DEPOSITS = 5
+
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+
+    def _deposit_concurrently(self, count):
+        barrier = threading.Barrier(count)
+        operations = []
+
+        def deposit():
+            barrier.wait()
+            try:
+                operations.append(
+                    WalletService.apply_operation(
+                        self.wallet.id, OperationType.DEPOSIT, Decimal("1.00")
+                    )
+                )
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=deposit) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return operations
+
+    def test_concurrent_deposits_committed_together(self):
+        """Одновременные пополнения объединяются в один коммит."""
+        batches_before = committed_batches() or 0
+        operations = self._deposit_concurrently(self.DEPOSITS)
+
+        self.assertEqual(len({operation.id for operation in operations}), 5)
+        self.assertEqual(Operation.objects.count(), self.DEPOSITS)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("105.00"))
+        self.assertEqual(committed_batches() - batches_before, 1)
+
+    @override_settings(
+        WALLETS_GROUP_COMMIT={**GROUP_COMMIT, "MAX_BATCH_SIZE": 2}
+    )
+    def test_batch_size_is_bounded(self):
+        """Группа не превышает MAX_BATCH_SIZE пополнений."""
+        batches_before = committed_batches() or 0
+        self._deposit_concurrently(4)
+
+        self.assertEqual(Operation.objects.count(), 4)
+        self.assertGreaterEqual(committed_batches() - batches_before, 2)
+
+    def test_follower_wait_is_bounded_by_deadline(self):
+        """
+        Запрос, чей дедлайн истёк раньше коммита группы, выходит из неё
+        с WalletBusy, и его пополнение не применяется.
+        """
+        committer = group_commit.GroupCommitter()
+
+        def lead():
+            try:
+                committer.deposit(self.wallet.id, Decimal("1.00"))
+            finally:
+                connection.close()
+
+        leader = threading.Thread(target=lead)
+        leader.start()
+        while self.wallet.id not in committer._pending:
+            time.sleep(0.001)
+        token = budgets._deadline.set(time.monotonic() + 0.01)
+        try:
+            with self.assertRaises(WalletBusy):
+                committer.deposit(self.wallet.id, Decimal("5.00"))
+        finally:
+            budgets._deadline.reset(token)
+        leader.join()
+
+        self.assertEqual(Operation.objects.count(), 1)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("101.00"))
+
+    def test_settings_published_at_startup(self):
+        group_commit.publish_settings()
+        self.assertEqual(
+            REGISTRY.get_sample_value("wallets_group_commit_window_seconds"),
+            GROUP_COMMIT["WINDOW_MS"] / 1000,
+        )
+
+
+@override_settings(WALLETS_GROUP_COMMIT={**GROUP_COMMIT, "WINDOW_MS": 0})
+class GroupCommitErrorsTest(TestCase):
+    def test_nonexistent_wallet(self):
+        """Ошибка коммита группы передаётся вызывающему."""
+        with self.assertRaises(NotFound):
+            WalletService.apply_operation(
+                uuid.uuid4(), OperationType.DEPOSIT, Decimal("1.00")
+            )
+        self.assertFalse(Operation.objects.exists())
+
+    def test_withdraw_is_not_grouped(self):
+        """Снятия выполняются без группового коммита."""
+        wallet = Wallet.objects.create(balance=Decimal("10.00"))
+        batches_before = committed_batches() or 0
+        WalletService.apply_operation(
+            wallet.id, OperationType.WITHDRAW, Decimal("1.00")
+        )
+        self.assertEqual((committed_batches() or 0) - batches_before, 0)
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.wallets import ids
+from apps.wallets.models import Operation, OperationType, Wallet
+
+
+class Uuid7Test(TestCase):
+    def test_layout(self):
+        """Версия 7, вариант RFC и время создания в старших битах."""
+        before = timezone.now()
+        value = ids.uuid7()
+
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, "specified in RFC 4122")
+        created_at = datetime.fromtimestamp(
+            (value.int >> 80) / 1000, tz=dt_timezone.utc
+        )
+        self.assertLess(abs(created_at - before), timedelta(seconds=1))
+
+    def test_monotonic_within_millisecond_and_clock_skew(self):
+        """Ключи растут и при одинаковом, и при отставшем времени."""
+        values = [ids.uuid7() for _ in range(5000)]
+        with mock.patch.object(ids.time, "time_ns", return_value=0):
+            values += [ids.uuid7() for _ in range(10)]
+
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(len(set(values)), len(values))
+
+    def test_model_defaults(self):
+        """Новые кошельки и операции получают UUIDv7, API их принимает."""
+        wallet = Wallet.objects.create()
+        operation = Operation.objects.create(
+            wallet=wallet, operation_type=OperationType.DEPOSIT, amount=1
+        )
+
+        self.assertEqual(wallet.id.version, 7)
+        self.assertEqual(operation.id.version, 7)
+        response = self.client.get(reverse("wallet-detail", args=[wallet.id]))
+        self.assertEqual(response.status_code, 200)
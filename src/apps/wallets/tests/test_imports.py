@@ -0,0 +1,176 @@
+import json
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from uuid import UUID, uuid4
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.wallets.cache import balance_cache
+from apps.wallets.imports import ImportAborted, import_operations
+from apps.wallets.models import (
+    DailyRollup,
+    ImportCheckpoint,
+    Operation,
+    OperationType,
+    Wallet,
+)
+from apps.wallets.rollups import roll_up
+
+
+def ndjson(rows):
+    return StringIO("".join(json.dumps(row) + "\n" for row in rows))
+
+
+class ImportOperationsTest(TestCase):
+    def setUp(self):
+        self.wallet_id = str(uuid4())
+        self.rows = [
+            {
+                "wallet_id": self.wallet_id,
+                "operation_type": OperationType.DEPOSIT,
+                "amount": "100.00",
+                "created_at": "2024-01-01T10:00:00+00:00",
+            },
+            {
+                "id": str(uuid4()),
+                "wallet_id": self.wallet_id,
+                "operation_type": OperationType.WITHDRAW,
+                "amount": "30.00",
+                "created_at": "2024-01-02T10:00:00+00:00",
+            },
+            {
+                "wallet_id": self.wallet_id,
+                "operation_type": OperationType.DEPOSIT,
+                "amount": "5.00",
+            },
+        ]
+
+    def test_import_derives_balances(self):
+        """Импорт создаёт кошельки, операции и пересчитывает балансы."""
+        report = import_operations(ndjson(self.rows), "ndjson", "test")
+
+        self.assertEqual(report.imported, 3)
+        wallet = Wallet.objects.get(id=self.wallet_id)
+        self.assertEqual(wallet.balance, Decimal("75.00"))
+        self.assertTrue(
+            Operation.objects.filter(
+                id=self.rows[1]["id"], created_at__year=2024
+            ).exists()
+        )
+
+    def test_existing_wallet_balance_increased(self):
+        """Баланс существующего кошелька увеличивается на итог импорта."""
+        Wallet.objects.create(id=self.wallet_id, balance=Decimal("10.00"))
+
+        import_operations(ndjson(self.rows), "ndjson", "test")
+
+        wallet = Wallet.objects.get(id=self.wallet_id)
+        self.assertEqual(wallet.balance, Decimal("85.00"))
+
+    def test_resume_after_abort(self):
+        """Прерванный импорт продолжается с незаписанной порции."""
+        rows = [*self.rows, {**self.rows[0], "amount": "-1"}]
+
+        with self.assertRaises(ImportAborted) as aborted:
+            import_operations(ndjson(rows), "ndjson", "test", chunk_size=2)
+        self.assertEqual(aborted.exception.report.errors[0][0], 4)
+        self.assertEqual(ImportCheckpoint.objects.get(name="test").rows, 2)
+
+        rows[-1]["amount"] = "1.00"
+        report = import_operations(ndjson(rows), "ndjson", "test")
+
+        self.assertEqual(report.skipped, 2)
+        self.assertEqual(report.imported, 2)
+        self.assertEqual(Operation.objects.count(), 4)
+        wallet = Wallet.objects.get(id=self.wallet_id)
+        self.assertEqual(wallet.balance, Decimal("76.00"))
+
+    def test_negative_balance_rejects_chunk(self):
+        """Порция, уводящая баланс в минус, не записывается."""
+        Wallet.objects.create(id=self.wallet_id, balance=Decimal("10.00"))
+        rows = [
+            {**self.rows[0], "amount": "1.00"},
+            {**self.rows[1], "amount": "50.00"},
+        ]
+
+        with self.assertRaises(ImportAborted) as aborted:
+            import_operations(ndjson(rows), "ndjson", "test", chunk_size=1)
+
+        number, message = aborted.exception.report.errors[0]
+        self.assertEqual(number, 2)
+        self.assertIn(self.wallet_id, message)
+        self.assertEqual(ImportCheckpoint.objects.get(name="test").rows, 1)
+        self.assertEqual(Operation.objects.count(), 1)
+        wallet = Wallet.objects.get(id=self.wallet_id)
+        self.assertEqual(wallet.balance, Decimal("11.00"))
+
+    @override_settings(
+        WALLETS_BALANCE_CACHE={
+            "ENABLED": True,
+            "MAX_ENTRIES": 10,
+            "TTL_SECONDS": 60,
+            "SHARED_CACHE": None,
+        }
+    )
+    def test_cached_balances_invalidated(self):
+        """После импорта кэш не отдаёт старый баланс кошелька."""
+        wallet_id = UUID(self.wallet_id)
+        Wallet.objects.create(id=wallet_id)
+        self.addCleanup(balance_cache.clear)
+        balance_cache.get(wallet_id, lambda: {"balance": "0.00"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            import_operations(ndjson(self.rows), "ndjson", "test")
+
+        self.assertEqual(
+            balance_cache.get(wallet_id, lambda: {"balance": "75.00"}),
+            {"balance": "75.00"},
+        )
+
+    def test_invalid_rows_skipped(self):
+        """Строки с ошибками пропускаются в пределах max_errors."""
+        rows = [
+            *self.rows,
+            {**self.rows[0], "operation_type": "UNKNOWN"},
+            {**self.rows[0], "amount": "1.001"},
+        ]
+        stream = StringIO(ndjson(rows).getvalue() + "not json\n")
+
+        report = import_operations(stream, "ndjson", "test", max_errors=3)
+
+        self.assertEqual(report.imported, 3)
+        self.assertEqual([number for number, _ in report.errors], [4, 5, 6])
+
+    def test_backdated_operations_rolled_up(self):
+        """Операции до отметки свёртки сразу попадают в свёртки."""
+        Wallet.objects.create(id=self.wallet_id)
+        Operation.objects.create(
+            wallet_id=self.wallet_id, amount=Decimal("1.00")
+        )
+        roll_up(timezone.now())
+
+        import_operations(ndjson(self.rows[:2]), "ndjson", "test")
+
+        self.assertEqual(
+            DailyRollup.objects.get(
+                wallet_id=self.wallet_id, day="2024-01-01"
+            ).total,
+            Decimal("100.00"),
+        )
+
+    def test_command_imports_csv(self):
+        """Команда import_operations определяет формат по расширению."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "operations.csv"
+            path.write_text(
+                "wallet_id,operation_type,amount\n"
+                f"{self.wallet_id},DEPOSIT,12.50\n"
+            )
+            call_command("import_operations", str(path), stdout=StringIO())
+
+        wallet = Wallet.objects.get(id=self.wallet_id)
+        self.assertEqual(wallet.balance, Decimal("12.50"))
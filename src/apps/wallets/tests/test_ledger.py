@@ -0,0 +1,144 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.wallets import ledger
+from apps.wallets.models import (
+    LedgerCheckpoint,
+    Operation,
+    OperationType,
+    Wallet,
+)
+from apps.wallets.sharding import promote_wallet
+from apps.wallets.wallet_service import WalletService
+
+
+class LedgerTest(TestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create()
+        self._apply(OperationType.DEPOSIT, "100.00")
+        self._apply(OperationType.WITHDRAW, "30.00")
+
+    def _apply(self, operation_type, amount, wallet=None):
+        return WalletService.apply_operation(
+            (wallet or self.wallet).id, operation_type, Decimal(amount)
+        )
+
+    @staticmethod
+    def _verify(full=False, settled_before=None):
+        settled_before = settled_before or timezone.now() + timedelta(
+            seconds=1
+        )
+        return ledger.verify_range(None, None, settled_before, full)
+
+    def test_consistent_wallet_gets_checkpoint(self):
+        """Сверка без расхождений сохраняет контрольную точку."""
+        report = self._verify()
+
+        self.assertEqual(report.checked, 1)
+        self.assertEqual(report.drifts, [])
+        checkpoint = LedgerCheckpoint.objects.get(wallet=self.wallet)
+        self.assertEqual(checkpoint.balance, Decimal("70.00"))
+        self.assertEqual(
+            checkpoint.last_operation_id,
+            self.wallet.operations.order_by("-created_at", "-id")[0].id,
+        )
+
+    def test_drift_reported(self):
+        """Баланс, не совпадающий с журналом, попадает в отчёт."""
+        Wallet.objects.filter(id=self.wallet.id).update(
+            balance=Decimal("75.00")
+        )
+
+        (drift,) = self._verify().drifts
+        self.assertEqual(drift.wallet_id, self.wallet.id)
+        self.assertEqual(drift.ledger, Decimal("70.00"))
+        self.assertEqual(drift.difference, Decimal("5.00"))
+
+    def test_incremental_run_reads_only_new_operations(self):
+        """После контрольной точки читаются только новые операции."""
+        self._verify()
+        # Правка старой операции не видна инкрементальной сверке.
+        Operation.objects.filter(wallet=self.wallet).update(
+            amount=Decimal("1.00")
+        )
+        self._apply(OperationType.DEPOSIT, "5.00")
+
+        self.assertEqual(self._verify().drifts, [])
+        self.assertEqual(
+            LedgerCheckpoint.objects.get(wallet=self.wallet).balance,
+            Decimal("75.00"),
+        )
+        self.assertEqual(len(self._verify(full=True).drifts), 1)
+
+    def test_unsettled_operations_do_not_move_checkpoint(self):
+        """Контрольная точка не сдвигается на свежие операции."""
+        report = self._verify(
+            settled_before=timezone.now() - timedelta(minutes=5)
+        )
+
+        self.assertEqual(report.drifts, [])
+        self.assertEqual(report.checkpoints, 0)
+        self.assertFalse(LedgerCheckpoint.objects.exists())
+
+    def test_repair_sharded_wallet(self):
+        """Исправление собирает корзины и ставит баланс по журналу."""
+        promote_wallet(self.wallet.id)
+        self._apply(OperationType.DEPOSIT, "10.00")
+        self.wallet.buckets.update(balance=Decimal("50.00"))
+
+        self.assertEqual(
+            ledger.repair_wallet(self.wallet.id), Decimal("80.00")
+        )
+        total_balance = (
+            Wallet.objects.with_total_balance()
+            .get(id=self.wallet.id)
+            .total_balance
+        )
+        self.assertEqual(total_balance, Decimal("80.00"))
+
+    def test_wallet_ranges_cover_all_wallets(self):
+        """Диапазоны покрывают все кошельки без пересечений."""
+        wallets = [
+            self.wallet,
+            *Wallet.objects.bulk_create(Wallet() for _ in range(9)),
+        ]
+        settled_before = timezone.now()
+
+        ranges = ledger.wallet_ranges(4)
+        checked = sum(
+            ledger.verify_range(lower, upper, settled_before).checked
+            for lower, upper in ranges
+        )
+
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(checked, len(wallets))
+
+    def test_command_repairs_drift(self):
+        """Команда verify_ledger падает на расхождении и исправляет его."""
+        Wallet.objects.filter(id=self.wallet.id).update(
+            balance=Decimal("0.00")
+        )
+
+        with self.assertRaises(CommandError):
+            call_command("verify_ledger", workers=1, stdout=StringIO())
+        call_command(
+            "verify_ledger", workers=1, repair=True, stdout=StringIO()
+        )
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("70.00"))
+
+    def test_negative_ledger_not_repaired(self):
+        """Отрицательный баланс по журналу не записывается."""
+        Operation.objects.filter(operation_type=OperationType.DEPOSIT).update(
+            amount=Decimal("10.00")
+        )
+
+        self.assertIsNone(ledger.repair_wallet(self.wallet.id))
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("70.00"))
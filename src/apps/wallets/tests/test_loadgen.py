@@ -0,0 +1,63 @@
+import random
+from collections import Counter
+
+from django.test import SimpleTestCase
+
+from apps.wallets.loadgen import LoadResult, find_regressions, zipf_picker
+
+
+def report(throughput, p95=10.0, p99=20.0, error_rate=0.0):
+    return {
+        "scenarios": {
+            "hot": {
+                "throughput_rps": throughput,
+                "error_rate": error_rate,
+                "latency_ms": {"p50": 1.0, "p95": p95, "p99": p99},
+            }
+        }
+    }
+
+
+class LoadgenTest(SimpleTestCase):
+    def test_zipf_picker_prefers_low_ranks(self):
+        """Первый элемент выбирается чаще всех, но не всегда."""
+        random.seed(1)
+        pick = zipf_picker(list(range(100)), 1.1)
+
+        counts = Counter(pick() for _ in range(5000))
+
+        self.assertEqual(counts.most_common(1)[0][0], 0)
+        self.assertGreater(len(counts), 10)
+
+    def test_regressions_within_tolerance_ignored(self):
+        """Колебания в пределах допуска не считаются регрессией."""
+        self.assertEqual(
+            find_regressions(report(95, p95=10.5), report(100), 0.1), []
+        )
+
+    def test_regressions_reported(self):
+        """Падение пропускной способности, рост p99 и ошибок отмечаются."""
+        regressions = find_regressions(
+            report(80, p99=30.0, error_rate=0.05), report(100), 0.1
+        )
+
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(regressions[0].startswith("hot: throughput_rps"))
+
+    def test_summary_without_latencies(self):
+        """Сводка строится, даже если все запросы завершились ошибкой."""
+        summary = LoadResult(elapsed=1.0, errors=3).summary()
+
+        self.assertEqual(summary["requests"], 3)
+        self.assertEqual(summary["error_rate"], 1.0)
+        self.assertEqual(
+            summary["latency_ms"], {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+        )
+
+    def test_summary_with_single_latency(self):
+        """Единственная задержка — это все процентили."""
+        summary = LoadResult(elapsed=1.0, latencies=[0.005]).summary()
+
+        self.assertEqual(
+            summary["latency_ms"], {"p50": 5.0, "p95": 5.0, "p99": 5.0}
+        )
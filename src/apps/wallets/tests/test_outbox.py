@@ -0,0 +1,209 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.wallets import outbox
+from apps.wallets.models import (
+    OperationType,
+    OutboxCheckpoint,
+    OutboxEvent,
+    Wallet,
+)
+from apps.wallets.wallet_service import WalletService
+
+OUTBOX = {
+    "GAP_GRACE_SECONDS": 5,
+    "POLL_INTERVAL_SECONDS": 0.01,
+    "MAX_WAIT_SECONDS": 0.05,
+    "FEED_MAX_LIMIT": 2,
+    "RETENTION_HOURS": 1,
+}
+
+
+@override_settings(WALLETS_OUTBOX=OUTBOX)
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+
+    def deposit(self, amount="1.00"):
+        return WalletService.apply_operation(
+            self.wallet.id, OperationType.DEPOSIT, Decimal(amount)
+        )
+
+    def test_operation_writes_event(self):
+        """Операция записывает событие со своими данными."""
+        operation = self.deposit("5.00")
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.operation_id, operation.id)
+        self.assertEqual(event.wallet_id, self.wallet.id)
+        self.assertEqual(event.operation_type, OperationType.DEPOSIT)
+        self.assertEqual(event.amount, Decimal("5.00"))
+        self.assertEqual(event.occurred_at, operation.created_at)
+
+    def test_rejected_operation_writes_no_event(self):
+        with self.assertRaises(ValidationError):
+            WalletService.apply_operation(
+                self.wallet.id, OperationType.WITHDRAW, Decimal("500.00")
+            )
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_transfer_and_batch_write_events(self):
+        other = Wallet.objects.create()
+        WalletService.transfer(self.wallet.id, other.id, Decimal("10.00"))
+        WalletService.apply_batch(
+            [
+                {
+                    "wallet_id": other.id,
+                    "operation_type": OperationType.WITHDRAW,
+                    "amount": Decimal("1.00"),
+                }
+            ]
+        )
+        self.assertEqual(
+            list(
+                OutboxEvent.objects.order_by("id").values_list(
+                    "wallet_id", "operation_type"
+                )
+            ),
+            [
+                (self.wallet.id, OperationType.TRANSFER),
+                (other.id, OperationType.DEPOSIT),
+                (other.id, OperationType.WITHDRAW),
+            ],
+        )
+
+    def test_fetch_stops_at_recent_gap(self):
+        """Недавний пропуск номера может быть незакоммиченным событием."""
+        self.deposit()
+        self.deposit()
+        first, second = OutboxEvent.objects.order_by("id")
+        OutboxEvent.objects.filter(id=second.id).update(id=second.id + 1)
+
+        self.assertEqual(outbox.fetch(0, 10), [first])
+
+    def test_fetch_skips_old_gap(self):
+        """Старый пропуск — откатившаяся транзакция."""
+        self.deposit()
+        self.deposit()
+        first, second = OutboxEvent.objects.order_by("id")
+        OutboxEvent.objects.filter(id=second.id).update(
+            id=second.id + 1,
+            created_at=timezone.now() - timedelta(seconds=10),
+        )
+
+        self.assertEqual(
+            [event.id for event in outbox.fetch(0, 10)],
+            [first.id, second.id + 1],
+        )
+
+    def test_purge_keeps_undelivered_events(self):
+        """Недоставленные потребителю события не удаляются."""
+        for _ in range(3):
+            self.deposit()
+        first, second, _ = OutboxEvent.objects.order_by("id")
+        OutboxCheckpoint.objects.create(name="a", last_event_id=first.id)
+        OutboxCheckpoint.objects.create(name="b", last_event_id=second.id)
+
+        deleted = outbox.purge(now=timezone.now() + timedelta(hours=2))
+
+        self.assertEqual(deleted, 1)
+        self.assertFalse(OutboxEvent.objects.filter(id=first.id).exists())
+
+    def test_purge_keeps_recent_events(self):
+        self.deposit()
+        self.assertEqual(outbox.purge(), 0)
+
+
+@override_settings(WALLETS_OUTBOX=OUTBOX)
+class ChangeFeedViewTest(APITestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+        self.url = reverse("change-feed")
+        self.operations = [
+            WalletService.apply_operation(
+                self.wallet.id, OperationType.DEPOSIT, Decimal("1.00")
+            )
+            for _ in range(3)
+        ]
+
+    def test_feed_pages_by_cursor(self):
+        """Лента отдаёт события по курсору, limit ограничен настройкой."""
+        response = self.client.get(self.url, {"limit": 100})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        events = response.data["events"]
+        self.assertEqual(
+            [event["operation_id"] for event in events],
+            [str(operation.id) for operation in self.operations[:2]],
+        )
+        self.assertEqual(response.data["next_cursor"], events[-1]["sequence"])
+
+        response = self.client.get(
+            self.url, {"cursor": response.data["next_cursor"]}
+        )
+        self.assertEqual(
+            [event["operation_id"] for event in response.data["events"]],
+            [str(self.operations[2].id)],
+        )
+
+    def test_sync_feed_does_not_wait(self):
+        """
+        Синхронная лента не ждёт событий: без новых событий ответ
+        пустой, курсор не меняется.
+        """
+        cursor = OutboxEvent.objects.order_by("id").last().id
+        response = self.client.get(self.url, {"cursor": cursor, "wait": 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["events"], [])
+        self.assertEqual(response.data["next_cursor"], cursor)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": -1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(WALLETS_OUTBOX=OUTBOX)
+class DispatchOutboxTest(TestCase):
+    def setUp(self):
+        wallet = Wallet.objects.create(balance=Decimal("100.00"))
+        for _ in range(3):
+            WalletService.apply_operation(
+                wallet.id, OperationType.DEPOSIT, Decimal("1.00")
+            )
+
+    def dispatch(self, *args):
+        stdout = StringIO()
+        call_command(
+            "dispatch_outbox",
+            "--consumer",
+            "analytics",
+            "--batch-size",
+            "2",
+            *args,
+            stdout=stdout,
+            stderr=StringIO(),
+        )
+        return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_events_are_delivered_once_and_checkpointed(self):
+        """Доставленные события не повторяются, курсор сохранён."""
+        events = self.dispatch()
+        last_id = OutboxEvent.objects.order_by("id").last().id
+        self.assertEqual(len(events), 3)
+        self.assertEqual(outbox.checkpoint("analytics"), last_id)
+        self.assertEqual(self.dispatch(), [])
+
+    def test_failed_delivery_keeps_checkpoint(self):
+        """Неудачная доставка не сдвигает курсор."""
+        with self.assertRaises(CommandError):
+            self.dispatch("--target", "http://127.0.0.1:1/", "--timeout", "1")
+        self.assertEqual(outbox.checkpoint("analytics"), 0)
+        self.assertEqual(len(self.dispatch()), 3)
@@ -0,0 +1,241 @@
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.wallets import ledger, partitions
+from apps.wallets.exports import stream_operations
+from apps.wallets.models import (
+    LedgerCheckpoint,
+    Operation,
+    OperationType,
+    Wallet,
+)
+from apps.wallets.rollups import roll_up
+
+JANUARY = date(2024, 1, 1)
+
+
+class PartitionsTest(TestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=Decimal("65.00"))
+        self._create(OperationType.DEPOSIT, "100.00", "2024-01-10T10:00")
+        self._create(OperationType.WITHDRAW, "40.00", "2024-01-20T10:00")
+        self._create(OperationType.DEPOSIT, "5.00", "2024-02-01T10:00")
+        lower, upper = partitions.month_bounds(JANUARY)
+        self.january = Operation.objects.filter(
+            created_at__gte=lower, created_at__lt=upper
+        )
+
+    def _create(self, operation_type, amount, created_at):
+        return Operation.objects.create(
+            wallet=self.wallet,
+            operation_type=operation_type,
+            amount=Decimal(amount),
+            created_at=datetime.fromisoformat(created_at).replace(
+                tzinfo=dt_timezone.utc
+            ),
+        )
+
+    def _archive_january(self):
+        upper = partitions.month_bounds(JANUARY)[1]
+        partitions.fold_into_checkpoints(self.january, upper)
+        self.january.delete()
+
+    @staticmethod
+    def _verify(full=False):
+        return ledger.verify_range(
+            None, None, timezone.now() + timedelta(seconds=1), full
+        )
+
+    def test_month_helpers(self):
+        """Секции и архивы именуются по месяцу UTC."""
+        self.assertEqual(
+            partitions.add_months(date(2024, 11, 1), 3), date(2025, 2, 1)
+        )
+        self.assertEqual(
+            partitions.month_of(
+                datetime(2024, 3, 1, 1, tzinfo=timezone.get_current_timezone())
+            ),
+            date(2024, 2, 1),
+        )
+        self.assertEqual(
+            partitions.partition_name(JANUARY), "wallets_operation_p2024_01"
+        )
+        self.assertEqual(
+            partitions.archive_name(JANUARY), "operations-2024-01.csv.gz"
+        )
+
+    def test_archived_operations_kept_in_ledger(self):
+        """После архивации сверка сходится без удалённых операций."""
+        self._archive_january()
+
+        checkpoint = LedgerCheckpoint.objects.get(wallet=self.wallet)
+        self.assertEqual(checkpoint.archived_balance, Decimal("60.00"))
+        self.assertEqual(checkpoint.balance, Decimal("60.00"))
+        self.assertEqual(self._verify().drifts, [])
+        self.assertEqual(self._verify(full=True).drifts, [])
+
+        Wallet.objects.filter(id=self.wallet.id).update(balance=0)
+        self.assertEqual(
+            ledger.repair_wallet(self.wallet.id), Decimal("65.00")
+        )
+
+    def test_checkpoint_ahead_of_partition_kept(self):
+        """Контрольная точка новее секции не сдвигается назад."""
+        self._verify()
+        checkpoint = LedgerCheckpoint.objects.get(wallet=self.wallet)
+
+        self._archive_january()
+
+        checkpoint.refresh_from_db()
+        self.assertEqual(checkpoint.balance, Decimal("65.00"))
+        self.assertEqual(checkpoint.archived_balance, Decimal("60.00"))
+        self.assertEqual(self._verify().drifts, [])
+
+    def test_import_resets_checkpoint_to_archived_balance(self):
+        """Импорт заставляет сверку перечитать живой журнал от архива."""
+        self._archive_january()
+        ledger.reset_checkpoints([self.wallet.id])
+
+        checkpoint = LedgerCheckpoint.objects.get(wallet=self.wallet)
+        self.assertEqual(checkpoint.balance, Decimal("60.00"))
+        self.assertEqual(self._verify().drifts, [])
+
+    def test_read_archive_filters(self):
+        """Архив читается с фильтром по кошельку и времени."""
+        other = Wallet.objects.create()
+        Operation.objects.create(
+            wallet=other,
+            operation_type=OperationType.DEPOSIT,
+            amount=Decimal("1.00"),
+            created_at=datetime(2024, 1, 15, tzinfo=dt_timezone.utc),
+        )
+        with tempfile.TemporaryDirectory() as archive_dir:
+            partitions.write_archive(
+                self.january,
+                Path(archive_dir) / partitions.archive_name(JANUARY),
+            )
+
+            rows = list(partitions.read_archive(archive_dir))
+            self.assertEqual(len(rows), 3)
+            rows = list(
+                partitions.read_archive(
+                    archive_dir,
+                    wallet_id=self.wallet.id,
+                    created_after=datetime(
+                        2024, 1, 15, tzinfo=dt_timezone.utc
+                    ),
+                )
+            )
+            self.assertEqual([row["amount"] for row in rows], ["40.00"])
+            self.assertEqual(
+                list(
+                    partitions.read_archive(
+                        archive_dir,
+                        created_before=datetime(
+                            2024, 1, 1, tzinfo=dt_timezone.utc
+                        ),
+                    )
+                ),
+                [],
+            )
+
+    def test_archive_keeps_balance_after_and_links(self):
+        """Архив хранит balance_after и связанную операцию перевода."""
+        first, second = self.january.order_by("created_at")
+        first.balance_after = Decimal("100.00")
+        first.save(update_fields=["balance_after"])
+        second.linked_operation = first
+        second.save(update_fields=["linked_operation"])
+        with tempfile.TemporaryDirectory() as archive_dir:
+            partitions.write_archive(
+                self.january,
+                Path(archive_dir) / partitions.archive_name(JANUARY),
+            )
+            rows = list(partitions.read_archive(archive_dir))
+        self.assertEqual(
+            [
+                (row["balance_after"], row["linked_operation_id"])
+                for row in rows
+            ],
+            [("100.00", None), (None, str(first.id))],
+        )
+
+    def test_read_archive_without_new_fields(self):
+        """Архивы в формате выгрузки читаются с пустыми новыми полями."""
+        with tempfile.TemporaryDirectory() as archive_dir:
+            path = Path(archive_dir) / partitions.archive_name(JANUARY)
+            path.write_bytes(
+                b"".join(stream_operations(self.january, "csv", True))
+            )
+            rows = list(partitions.read_archive(archive_dir))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(set(rows[0]), set(partitions.ARCHIVE_FIELDS))
+        self.assertIsNone(rows[0]["balance_after"])
+        self.assertIsNone(rows[0]["linked_operation_id"])
+
+    @unittest.skipIf(connection.vendor == "postgresql", "Секции поддержаны")
+    def test_command_requires_postgresql(self):
+        """Без PostgreSQL команда не трогает секции."""
+        with self.assertRaises(CommandError):
+            call_command("operation_partitions", "list", stdout=StringIO())
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Нужен PostgreSQL")
+class PartitionMaintenanceTest(TestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=Decimal("10.00"))
+        self.month = partitions.add_months(
+            partitions.month_of(timezone.now()), -24
+        )
+        lower, _ = partitions.month_bounds(self.month)
+        partitions.create_partition(self.month)
+        Operation.objects.create(
+            wallet=self.wallet,
+            operation_type=OperationType.DEPOSIT,
+            amount=Decimal("10.00"),
+            created_at=lower + timedelta(days=1),
+        )
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+
+    def test_maintain_creates_future_partitions(self):
+        """maintain создаёт секции на months_ahead месяцев вперёд."""
+        partitions.maintain(timezone.now(), 2, 36, self.archive_dir)
+
+        current = partitions.month_of(timezone.now())
+        self.assertLessEqual(
+            {partitions.add_months(current, offset) for offset in range(3)},
+            set(partitions.list_partitions()),
+        )
+
+    def test_archive_requires_rollup(self):
+        """Несвёрнутая секция не архивируется."""
+        with self.assertRaises(partitions.PartitionError):
+            partitions.archive_partition(self.month, self.archive_dir)
+
+    def test_archive_partition(self):
+        """Секция выгружается в архив и удаляется, сверка сходится."""
+        roll_up(timezone.now())
+
+        report = partitions.archive_partition(self.month, self.archive_dir)
+
+        self.assertEqual(report.operations, 1)
+        self.assertNotIn(self.month, partitions.list_partitions())
+        self.assertFalse(Operation.objects.exists())
+        self.assertEqual(
+            len(list(partitions.read_archive(self.archive_dir))), 1
+        )
+        self.assertEqual(
+            ledger.verify_range(None, None, timezone.now(), True).drifts, []
+        )
@@ -0,0 +1,176 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.wallets.models import (
+    DailyRollup,
+    Operation,
+    OperationType,
+    RollupHighWaterMark,
+    Wallet,
+)
+from apps.wallets.rollups import roll_up, wallet_turnover
+
+
+def create_operations(wallet, operations):
+    """Создать операции (тип, сумма, дней назад)."""
+    now = timezone.now()
+    created = Operation.objects.bulk_create(
+        Operation(wallet=wallet, operation_type=operation_type, amount=amount)
+        for operation_type, amount, _ in operations
+    )
+    for operation, (_, _, days_ago) in zip(created, operations):
+        operation.created_at = now - timedelta(days=days_ago)
+    Operation.objects.bulk_update(created, ["created_at"])
+    return created
+
+
+class RollupTest(TestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create()
+        create_operations(
+            self.wallet,
+            [
+                (OperationType.DEPOSIT, Decimal("100.00"), 2),
+                (OperationType.DEPOSIT, Decimal("50.00"), 2),
+                (OperationType.WITHDRAW, Decimal("30.00"), 2),
+                (OperationType.DEPOSIT, Decimal("10.00"), 1),
+            ],
+        )
+        self.today = timezone.localdate()
+
+    def _roll_up(self, batch_size=10000):
+        return roll_up(timezone.now(), batch_size)
+
+    def test_roll_up_in_batches(self):
+        """Порции сворачиваются по очереди, отметка сдвигается."""
+        self.assertEqual(self._roll_up(batch_size=3), 3)
+        self.assertEqual(self._roll_up(batch_size=3), 1)
+        self.assertEqual(self._roll_up(batch_size=3), 0)
+
+        deposits = DailyRollup.objects.get(
+            wallet=self.wallet,
+            day=self.today - timedelta(days=2),
+            operation_type=OperationType.DEPOSIT,
+        )
+        self.assertEqual(deposits.total, Decimal("150.00"))
+        self.assertEqual(deposits.count, 2)
+        self.assertEqual(DailyRollup.objects.count(), 3)
+
+    def test_recent_operations_not_rolled_up(self):
+        """Операции новее settled_before не сворачиваются."""
+        rolled_up = roll_up(timezone.now() - timedelta(hours=36))
+
+        self.assertEqual(rolled_up, 3)
+        mark = RollupHighWaterMark.objects.get()
+        self.assertLess(
+            mark.last_operation_created_at,
+            timezone.now() - timedelta(hours=36),
+        )
+
+    def test_turnover_merges_rollups_and_recent_operations(self):
+        """Обороты складываются из свёрток и ещё не свёрнутых операций."""
+        self._roll_up(batch_size=2)
+        create_operations(
+            self.wallet, [(OperationType.WITHDRAW, Decimal("5.00"), 0)]
+        )
+
+        days = wallet_turnover(
+            self.wallet.id, self.today - timedelta(days=7), self.today
+        )
+
+        self.assertEqual(
+            list(days), [self.today - timedelta(days=n) for n in (2, 1, 0)]
+        )
+        self.assertEqual(days[self.today - timedelta(days=2)].deposit_count, 2)
+        self.assertEqual(
+            days[self.today - timedelta(days=2)].withdraw_total,
+            Decimal("30.00"),
+        )
+        self.assertEqual(days[self.today].withdraw_total, Decimal("5.00"))
+
+    def test_command_catches_up(self):
+        """Команда rollup_operations сворачивает все старые операции."""
+        out = StringIO()
+        call_command("rollup_operations", batch_size=2, stdout=out)
+        self.assertIn("4", out.getvalue())
+
+
+class WalletStatsViewTest(APITestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create()
+        create_operations(
+            self.wallet,
+            [
+                (OperationType.DEPOSIT, Decimal("100.00"), 40),
+                (OperationType.DEPOSIT, Decimal("20.00"), 0),
+                (OperationType.WITHDRAW, Decimal("5.00"), 0),
+            ],
+        )
+        roll_up(timezone.now() - timedelta(days=1))
+        self.url = reverse(
+            "wallet-stats", kwargs={"wallet_id": self.wallet.id}
+        )
+        self.today = timezone.localdate()
+
+    def test_default_period(self):
+        """По умолчанию возвращаются обороты за последние 30 дней."""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["date_to"], self.today.isoformat())
+        self.assertEqual(
+            response.data["total"],
+            {
+                "deposit_total": "20.00",
+                "deposit_count": 1,
+                "withdraw_total": "5.00",
+                "withdraw_count": 1,
+                "transfer_total": "0.00",
+                "transfer_count": 0,
+            },
+        )
+        self.assertEqual(len(response.data["periods"]), 1)
+
+    def test_group_by_month(self):
+        """Обороты группируются по месяцам."""
+        response = self.client.get(
+            self.url,
+            {
+                "date_from": (self.today - timedelta(days=60)).isoformat(),
+                "group_by": "month",
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total"]["deposit_total"], "120.00")
+        self.assertTrue(
+            all(
+                period["period"].endswith("-01")
+                for period in response.data["periods"]
+            )
+        )
+
+    def test_invalid_period(self):
+        """Начало периода позже конца — ошибка 400."""
+        response = self.client.get(
+            self.url,
+            {"date_from": self.today.isoformat(), "date_to": "2000-01-01"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_wallet(self):
+        """Статистика несуществующего кошелька — 404."""
+        url = reverse(
+            "wallet-stats",
+            kwargs={"wallet_id": "00000000-0000-0000-0000-000000000000"},
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
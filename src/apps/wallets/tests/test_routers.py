@@ -0,0 +1,143 @@
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.wallets import routers
+from apps.wallets.models import OperationType, Wallet
+
+REPLICAS = {
+    "ALIASES": ["replica_1"],
+    "STICKY_SECONDS": 10,
+    "STICKY_COOKIE": "wallets_primary_until",
+    "STICKY_HEADER": "Wallets-Primary-Until",
+}
+# В тестах реплика — сама основная БД: так видно, что чтение ушло
+# на «реплику», а запросы выполняются.
+SELF_REPLICA = {**REPLICAS, "ALIASES": ["default"]}
+
+
+@override_settings(WALLETS_REPLICAS=REPLICAS)
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+
+    def read_alias(self, sticky=False, replica_view=True):
+        token = routers._state.set(routers.ReadState(sticky=sticky))
+        try:
+            if replica_view:
+                routers.use_replica()
+            return self.router.db_for_read(Wallet)
+        finally:
+            routers._state.reset(token)
+
+    def test_replica_view_reads_from_replica(self):
+        """Помеченные представления читают с реплики."""
+        self.assertEqual(self.read_alias(), "replica_1")
+
+    def test_other_reads_go_to_primary(self):
+        """Остальные чтения идут в основную БД."""
+        self.assertIsNone(self.read_alias(replica_view=False))
+        self.assertIsNone(self.router.db_for_read(Wallet))
+
+    def test_sticky_client_reads_from_primary(self):
+        """Привязанный клиент читает из основной БД."""
+        self.assertIsNone(self.read_alias(sticky=True))
+
+    def test_writes_go_to_primary(self):
+        self.assertEqual(self.router.db_for_write(Wallet), "default")
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica_1", "wallets"))
+        self.assertTrue(self.router.allow_migrate("default", "wallets"))
+
+    @override_settings(WALLETS_REPLICAS={**REPLICAS, "ALIASES": []})
+    def test_without_replicas_reads_go_to_primary(self):
+        self.assertIsNone(self.read_alias())
+
+
+@override_settings(WALLETS_REPLICAS=SELF_REPLICA)
+class ReplicaStickinessTest(APITestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+        self.wallet_url = reverse(
+            "wallet-detail", kwargs={"wallet_id": self.wallet.id}
+        )
+        self.aliases = []
+        db_for_read = routers.ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            self.aliases.append(alias)
+            return alias
+
+        patcher = mock.patch.object(routers.ReplicaRouter, "db_for_read", spy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def deposit(self):
+        return self.client.post(
+            reverse("operation-list", kwargs={"wallet_id": self.wallet.id}),
+            {"operation_type": OperationType.DEPOSIT, "amount": "10.00"},
+            format="json",
+        )
+
+    def test_reads_go_to_replica_without_writes(self):
+        """Без записей чтения кошелька идут на реплику."""
+        response = self.client.get(self.wallet_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("default", self.aliases)
+
+    def test_write_makes_client_sticky(self):
+        """После операции клиент читает из основной БД."""
+        response = self.deposit()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        until = float(response["Wallets-Primary-Until"])
+        self.assertGreater(until, time.time())
+        self.assertEqual(
+            response.cookies["wallets_primary_until"]["max-age"], 10
+        )
+
+        self.aliases.clear()
+        response = self.client.get(self.wallet_url)
+        self.assertEqual(response.data["balance"], "110.00")
+        self.assertNotIn("default", self.aliases)
+
+    def test_header_makes_client_sticky(self):
+        """Заголовок с моментом привязки работает без cookie."""
+        self.client.get(
+            self.wallet_url,
+            headers={"Wallets-Primary-Until": str(time.time() + 5)},
+        )
+        self.assertNotIn("default", self.aliases)
+
+    def test_expired_stickiness_is_ignored(self):
+        self.client.cookies["wallets_primary_until"] = str(time.time() - 1)
+        self.client.get(self.wallet_url)
+        self.assertIn("default", self.aliases)
+
+    def test_failed_write_does_not_stick(self):
+        """Отклонённая операция не привязывает клиента."""
+        response = self.client.post(
+            reverse("operation-list", kwargs={"wallet_id": self.wallet.id}),
+            {"operation_type": OperationType.WITHDRAW, "amount": "1000.00"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn("Wallets-Primary-Until", response)
+
+    def test_read_only_post_does_not_stick(self):
+        """POST списка балансов только читает и не привязывает клиента."""
+        response = self.client.post(
+            reverse("wallet-balances"),
+            {"ids": [str(self.wallet.id)]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Wallets-Primary-Until", response)
+        self.assertNotIn("wallets_primary_until", response.cookies)
+        self.assertIn("default", self.aliases)
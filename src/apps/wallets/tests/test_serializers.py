@@ -4,7 +4,11 @@ from decimal import Decimal
 from rest_framework.test import APITestCase
 
 from apps.wallets.models import Operation, Wallet
-from apps.wallets.serializers import OperationSerializer, WalletSerializer
+from apps.wallets.serializers import (
+    FastOperationSerializer,
+    OperationSerializer,
+    WalletSerializer,
+)
 
 
 class WalletSerializersTest(APITestCase):
@@ -64,6 +68,7 @@ class OperationSerializersTest(APITestCase):
     DEPOSIT_OPERATION_TYPE = "DEPOSIT"
     INVALID_OPERATION_TYPE = "INVALID_OPERATION_TYPE"
     INITIAL_BALANCE = Decimal("1000.00")
+    serializer_class = OperationSerializer
 
     def setUp(self):
         self.operation_attributes = {
@@ -82,14 +87,17 @@ class OperationSerializersTest(APITestCase):
             "operation_type": self.DEPOSIT_OPERATION_TYPE,
             "amount": self.VALID_AMOUNT_STR,
         }
-        self.serializer = OperationSerializer(
+        self.serializer = self.serializer_class(
             instance=self.operation,
         )
 
     def test_contains_expected_fields(self):
         """Проверка, что сериализатор обладает нужными полями."""
         data = self.serializer.data
-        self.assertEqual(set(data.keys()), {"id", "operation_type", "amount"})
+        self.assertEqual(
+            set(data.keys()),
+            {"id", "operation_type", "amount", "balance_after"},
+        )
 
     def test_operation_type_field_content(self):
         """Проверка, что данные поля operation_type сериализуются правильно."""
@@ -111,7 +119,7 @@ class OperationSerializersTest(APITestCase):
         for amount in invalid_amounts:
             with self.subTest(ampunt=amount):
                 self.serializer_data["amount"] = amount
-                serializer = OperationSerializer(data=self.serializer_data)
+                serializer = self.serializer_class(data=self.serializer_data)
                 self.assertFalse(serializer.is_valid())
                 self.assertEqual(set(serializer.errors), {"amount"})
 
@@ -120,7 +128,7 @@ class OperationSerializersTest(APITestCase):
         self.operation_attributes["operation_type"] = (
             self.INVALID_OPERATION_TYPE
         )
-        serializer = OperationSerializer(
+        serializer = self.serializer_class(
             instance=self.operation, data=self.operation_attributes
         )
         self.assertFalse(serializer.is_valid())
@@ -135,7 +143,7 @@ class OperationSerializersTest(APITestCase):
         for operation_type in valid_operation_types:
             with self.subTest(operation_type=operation_type):
                 self.operation_attributes["operation_type"] = operation_type
-                serializer = OperationSerializer(
+                serializer = self.serializer_class(
                     instance=self.operation, data=self.operation_attributes
                 )
                 self.assertTrue(serializer.is_valid())
@@ -144,6 +152,66 @@ class OperationSerializersTest(APITestCase):
                 )
 
 
+class FastOperationSerializersTest(OperationSerializersTest):
+    serializer_class = FastOperationSerializer
+
+    PAYLOADS = (
+        {"operation_type": "DEPOSIT", "amount": "10"},
+        {"operation_type": "WITHDRAW", "amount": "10.5"},
+        {"operation_type": "DEPOSIT", "amount": " 10.005 "},
+        {"operation_type": "DEPOSIT", "amount": 10.25},
+        {"operation_type": "DEPOSIT", "amount": 7},
+        {"operation_type": "DEPOSIT", "amount": "0000000000000001"},
+        {"operation_type": "DEPOSIT", "amount": "10.001"},
+        {"operation_type": "DEPOSIT", "amount": "12345678901234"},
+        {"operation_type": "DEPOSIT", "amount": "1e3"},
+        {"operation_type": "DEPOSIT", "amount": "NaN"},
+        {"operation_type": "DEPOSIT", "amount": "-Infinity"},
+        {"operation_type": "DEPOSIT", "amount": "abc"},
+        {"operation_type": "DEPOSIT", "amount": "0.00"},
+        {"operation_type": "DEPOSIT", "amount": None},
+        {"operation_type": "DEPOSIT", "amount": ""},
+        {"operation_type": "TRANSFER", "amount": "1.00"},
+        {"operation_type": ["DEPOSIT"], "amount": "1.00"},
+        {"operation_type": "", "amount": "1.00"},
+        {"amount": "1.00"},
+        {},
+        [],
+        "DEPOSIT",
+        None,
+    )
+
+    def test_same_result_as_operation_serializer(self):
+        """Результат проверки совпадает с OperationSerializer."""
+        for payload in self.PAYLOADS:
+            with self.subTest(payload=payload):
+                expected = OperationSerializer(data=payload)
+                actual = FastOperationSerializer(data=payload)
+
+                self.assertEqual(actual.is_valid(), expected.is_valid())
+                self.assertEqual(actual.errors, expected.errors)
+                self.assertEqual(
+                    {
+                        name: (value, str(value))
+                        for name, value in actual.validated_data.items()
+                    },
+                    {
+                        name: (value, str(value))
+                        for name, value in expected.validated_data.items()
+                    },
+                )
+
+    def test_same_representation_as_operation_serializer(self):
+        """Ответ совпадает с OperationSerializer и для сумм из БД."""
+        for amount in ("1000.00", "1000", "0.5"):
+            with self.subTest(amount=amount):
+                self.operation.amount = Decimal(amount)
+                self.assertEqual(
+                    FastOperationSerializer(self.operation).data,
+                    OperationSerializer(self.operation).data,
+                )
+
+
 def _check_id_serialize(
     test_cls_instance: APITestCase, serializer_data: dict
 ) -> None:
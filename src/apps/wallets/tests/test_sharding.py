@@ -0,0 +1,182 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.wallets.models import OperationType, Wallet, WalletBucket
+from apps.wallets.sharding import demote_wallet, promote_wallet, tracker
+from apps.wallets.wallet_service import WalletService
+
+SHARDING = {
+    "AUTO_PROMOTE": True,
+    "BUCKETS": 4,
+    "LOCK_WAIT_THRESHOLD_MS": 0,
+    "WINDOW_SECONDS": 60,
+    "PROMOTE_AFTER": 3,
+    "DEMOTE_BELOW": 1,
+    "REGISTRY_REFRESH_SECONDS": 60,
+    "CACHE": "default",
+}
+
+
+def total_balance(wallet):
+    return Wallet.objects.with_total_balance().get(id=wallet.id).total_balance
+
+
+@override_settings(WALLETS_SHARDING=SHARDING)
+class ShardedWalletTest(TestCase):
+    INITIAL_BALANCE = Decimal("100.00")
+
+    def setUp(self):
+        cache.clear()
+        self.wallet = Wallet.objects.create(balance=self.INITIAL_BALANCE)
+        promote_wallet(self.wallet.id)
+
+    def _apply(self, operation_type, amount):
+        return WalletService.apply_operation(
+            self.wallet.id, operation_type, Decimal(amount)
+        )
+
+    def test_promote_keeps_balance(self):
+        """Разделение создаёт пустые корзины и не меняет баланс."""
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.bucket_count, SHARDING["BUCKETS"])
+        self.assertEqual(self.wallet.buckets.count(), SHARDING["BUCKETS"])
+        self.assertEqual(total_balance(self.wallet), self.INITIAL_BALANCE)
+
+    def test_deposit_goes_to_bucket(self):
+        """Пополнение разделённого кошелька попадает в корзину."""
+        self._apply(OperationType.DEPOSIT, "50.00")
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, self.INITIAL_BALANCE)
+        self.assertEqual(total_balance(self.wallet), Decimal("150.00"))
+
+    def test_withdraw_from_single_bucket(self):
+        """Снятие, которое покрывает одна корзина, не трогает кошелёк."""
+        WalletBucket.objects.filter(wallet=self.wallet, index=2).update(
+            balance=Decimal("40.00")
+        )
+        self._apply(OperationType.WITHDRAW, "30.00")
+
+        bucket = WalletBucket.objects.get(wallet=self.wallet, index=2)
+        self.assertEqual(bucket.balance, Decimal("10.00"))
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, self.INITIAL_BALANCE)
+
+    def test_withdraw_sweeps_several_parts(self):
+        """Если ни одной части не хватает, списание идёт со всех."""
+        WalletBucket.objects.filter(wallet=self.wallet).update(
+            balance=Decimal("10.00")
+        )
+        self._apply(OperationType.WITHDRAW, "125.00")
+
+        self.assertEqual(total_balance(self.wallet), Decimal("15.00"))
+        self.assertFalse(WalletBucket.objects.filter(balance__lt=0).exists())
+
+    def test_withdraw_more_than_total_balance(self):
+        """Нельзя снять больше суммы всех частей баланса."""
+        WalletBucket.objects.filter(wallet=self.wallet).update(
+            balance=Decimal("10.00")
+        )
+        with self.assertRaisesRegex(ValidationError, r"Недостаточно средств"):
+            self._apply(OperationType.WITHDRAW, "140.01")
+        self.assertEqual(total_balance(self.wallet), Decimal("140.00"))
+
+    def test_demote_folds_buckets(self):
+        """Сбор корзин переносит их баланс в кошелёк."""
+        self._apply(OperationType.DEPOSIT, "25.00")
+        self.assertTrue(demote_wallet(self.wallet.id))
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("125.00"))
+        self.assertEqual(self.wallet.bucket_count, 0)
+        self.assertFalse(self.wallet.buckets.exists())
+
+    def test_batch_uses_bucket_balance(self):
+        """Пакетная операция видит весь баланс разделённого кошелька."""
+        WalletBucket.objects.filter(wallet=self.wallet).update(
+            balance=Decimal("10.00")
+        )
+        results = WalletService.apply_batch(
+            [
+                {
+                    "wallet_id": self.wallet.id,
+                    "operation_type": OperationType.WITHDRAW,
+                    "amount": Decimal("120.00"),
+                }
+            ]
+        )
+        self.assertIsNone(results[0].error)
+        self.assertEqual(total_balance(self.wallet), Decimal("20.00"))
+
+
+@override_settings(WALLETS_SHARDING=SHARDING)
+class ContentionTrackerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+
+    def test_wallet_promoted_after_lock_waits(self):
+        """Кошелёк разделяется после PROMOTE_AFTER ожиданий блокировки."""
+        for _ in range(SHARDING["PROMOTE_AFTER"]):
+            with self.captureOnCommitCallbacks(execute=True):
+                WalletService.apply_operation(
+                    self.wallet.id, OperationType.DEPOSIT, Decimal("1.00")
+                )
+
+        self.assertEqual(
+            tracker.lock_waits(self.wallet.id), SHARDING["PROMOTE_AFTER"]
+        )
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.bucket_count, SHARDING["BUCKETS"])
+        self.assertEqual(total_balance(self.wallet), Decimal("103.00"))
+
+    def test_rebalance_requires_shared_cache(self):
+        """Со счётчиками в кэше процесса rebalance не запускается."""
+        promote_wallet(self.wallet.id)
+        with self.assertRaises(CommandError):
+            call_command("wallet_shards", "rebalance", stdout=StringIO())
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.bucket_count, SHARDING["BUCKETS"])
+
+    def test_rebalance_keeps_contended_wallets(self):
+        """rebalance собирает только кошельки без ожиданий блокировки."""
+        hot = Wallet.objects.create(balance=Decimal("1.00"))
+        for wallet in (self.wallet, hot):
+            promote_wallet(wallet.id)
+        Wallet.objects.update(sharded_at=timezone.now() - timedelta(hours=1))
+        tracker.observe(hot.id, 1, sharded=True)
+        out = StringIO()
+        with mock.patch.object(tracker, "is_shared", return_value=True):
+            call_command("wallet_shards", "rebalance", stdout=out)
+        self.assertIn("Собрано кошельков: 1", out.getvalue())
+        self.wallet.refresh_from_db()
+        hot.refresh_from_db()
+        self.assertEqual(self.wallet.bucket_count, 0)
+        self.assertEqual(hot.bucket_count, SHARDING["BUCKETS"])
+
+
+@override_settings(WALLETS_SHARDING=SHARDING)
+class ShardedWalletViewTest(APITestCase):
+    def test_get_sharded_wallet_returns_total_balance(self):
+        """Баланс разделённого кошелька возвращается с учётом корзин."""
+        wallet = Wallet.objects.create(balance=Decimal("100.00"))
+        promote_wallet(wallet.id)
+        WalletBucket.objects.filter(wallet=wallet).update(
+            balance=Decimal("0.25")
+        )
+        response = self.client.get(
+            reverse("wallet-detail", kwargs={"wallet_id": wallet.id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["balance"], "101.00")
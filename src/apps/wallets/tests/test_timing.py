@@ -0,0 +1,146 @@
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.wallets import timing
+from apps.wallets.models import OperationType, Wallet
+
+
+def observations(metric, endpoint):
+    return (
+        REGISTRY.get_sample_value(f"{metric}_count", {"endpoint": endpoint})
+        or 0
+    )
+
+
+def total(metric, endpoint):
+    return (
+        REGISTRY.get_sample_value(f"{metric}_sum", {"endpoint": endpoint}) or 0
+    )
+
+
+class TimingHelpersTest(SimpleTestCase):
+    def run_in_request(self, function):
+        timings = timing.RequestTimings()
+        token = timing._current.set(timings)
+        try:
+            function()
+        finally:
+            timing._current.reset(token)
+        return timings
+
+    def test_execute_wrapper_counts_queries(self):
+        """Обёртка суммирует время и число запросов."""
+
+        def execute(sql, params, many, context):
+            return "result"
+
+        def run():
+            for sql in ("SELECT 1", "SELECT 2"):
+                self.assertEqual(
+                    timing.execute_wrapper(execute, sql, None, False, {}),
+                    "result",
+                )
+
+        timings = self.run_in_request(run)
+        self.assertEqual(timings.queries, 2)
+        self.assertGreaterEqual(timings.sql_seconds, 0)
+        self.assertIsNone(timings.lock_wait_seconds)
+
+    def test_locking_queries_count_as_lock_wait(self):
+        """SELECT ... FOR UPDATE и FOR NO KEY UPDATE — захват блокировок."""
+
+        def run():
+            for sql in (
+                'SELECT * FROM "w" WHERE id = %s FOR UPDATE',
+                'SELECT * FROM "w" FOR NO KEY UPDATE',
+                'UPDATE "w" SET balance = 1',
+            ):
+                timing.execute_wrapper(
+                    lambda *args: None, sql, None, False, {}
+                )
+
+        timings = self.run_in_request(run)
+        self.assertEqual(timings.queries, 3)
+        self.assertIsNotNone(timings.lock_wait_seconds)
+
+    def test_measure_outside_request_is_noop(self):
+        """Вне запроса measure ничего не копит."""
+        with timing.measure("serializer"):
+            pass
+        self.assertIsNone(timing.current())
+
+    def test_connection_is_instrumented_once(self):
+        """Обёртка execute подключается к соединению один раз."""
+        connection.ensure_connection()
+        timing.instrument_connection(None, connection)
+        self.assertEqual(
+            connection.execute_wrappers.count(timing.execute_wrapper), 1
+        )
+
+
+class TimingMiddlewareTest(APITestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create()
+
+    def test_operation_request_is_observed(self):
+        """
+        Запрос операции даёт SQL, число запросов, ожидание блокировки
+        при обновлении баланса и сериализацию.
+        """
+        endpoint = "operation-list"
+        before = {
+            metric: observations(metric, endpoint)
+            for metric in (
+                "wallets_request_sql_seconds",
+                "wallets_request_queries",
+                "wallets_request_lock_wait_seconds",
+                "wallets_request_serializer_seconds",
+            )
+        }
+        queries_before = total("wallets_request_queries", endpoint)
+        response = self.client.post(
+            reverse("operation-list", kwargs={"wallet_id": self.wallet.id}),
+            {"operation_type": OperationType.DEPOSIT, "amount": "10.00"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        for metric, count in before.items():
+            self.assertEqual(observations(metric, endpoint), count + 1)
+        self.assertGreater(
+            total("wallets_request_queries", endpoint), queries_before
+        )
+
+    @override_settings(
+        WALLETS_GROUP_COMMIT={
+            "ENABLED": True,
+            "WINDOW_MS": 1,
+            "MAX_BATCH_SIZE": 100,
+        }
+    )
+    def test_group_commit_lock_wait_is_observed(self):
+        """Обновление баланса групповым коммитом — тоже ожидание блокировки."""
+        endpoint = "operation-list"
+        before = observations("wallets_request_lock_wait_seconds", endpoint)
+        response = self.client.post(
+            reverse("operation-list", kwargs={"wallet_id": self.wallet.id}),
+            {"operation_type": OperationType.DEPOSIT, "amount": "10.00"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            observations("wallets_request_lock_wait_seconds", endpoint),
+            before + 1,
+        )
+
+    def test_unresolved_request_is_not_observed(self):
+        """Запросы без маршрута не создают метрик."""
+        self.client.get("/api/v1/no-such-path/")
+        self.assertIsNone(
+            REGISTRY.get_sample_value(
+                "wallets_request_queries_count", {"endpoint": ""}
+            )
+        )
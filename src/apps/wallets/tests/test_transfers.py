@@ -0,0 +1,211 @@
+import threading
+from decimal import Decimal
+from uuid import uuid4
+
+from django.db import connection
+from django.test import (
+    TestCase,
+    TransactionTestCase,
+    skipUnlessDBFeature,
+)
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+from apps.wallets import ledger
+from apps.wallets.models import Operation, OperationType, Wallet
+from apps.wallets.sharding import promote_wallet
+from apps.wallets.wallet_service import WalletService
+
+
+class TransferServiceTest(TestCase):
+    def setUp(self):
+        self.source = Wallet.objects.create(balance=Decimal("100.00"))
+        self.target = Wallet.objects.create(balance=Decimal("10.00"))
+
+    def _balances(self):
+        return [
+            wallet.total_balance
+            for wallet in Wallet.objects.with_total_balance().filter(
+                id__in=[self.source.id, self.target.id]
+            )
+        ]
+
+    def test_transfer_links_legs(self):
+        """Перевод списывает, зачисляет и связывает две операции."""
+        debit = WalletService.transfer(
+            self.source.id, self.target.id, Decimal("30.00")
+        )
+
+        credit = Operation.objects.get(wallet=self.target)
+        self.assertEqual(debit.operation_type, OperationType.TRANSFER)
+        self.assertEqual(credit.operation_type, OperationType.DEPOSIT)
+        self.assertEqual(credit.linked_operation_id, debit.id)
+        self.assertEqual(
+            Operation.objects.get(id=debit.id).linked_operation_id, credit.id
+        )
+        self.source.refresh_from_db()
+        self.target.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal("70.00"))
+        self.assertEqual(self.target.balance, Decimal("40.00"))
+
+    def test_insufficient_funds(self):
+        """При нехватке средств перевод не применяется."""
+        with self.assertRaises(ValidationError):
+            WalletService.transfer(
+                self.source.id, self.target.id, Decimal("100.01")
+            )
+
+        self.assertFalse(Operation.objects.exists())
+        self.assertEqual(
+            sorted(self._balances()), [Decimal("10.00"), Decimal("100.00")]
+        )
+
+    def test_unknown_target(self):
+        """Перевод на несуществующий кошелёк — NotFound."""
+        with self.assertRaises(NotFound):
+            WalletService.transfer(self.source.id, uuid4(), Decimal("1.00"))
+        self.assertFalse(Operation.objects.exists())
+
+    def test_sharded_wallets(self):
+        """Перевод с разделённого кошелька учитывает корзины."""
+        promote_wallet(self.source.id)
+        WalletService.apply_operation(
+            self.source.id, OperationType.DEPOSIT, Decimal("50.00")
+        )
+
+        WalletService.transfer(
+            self.source.id, self.target.id, Decimal("140.00")
+        )
+
+        total = sum(self._balances())
+        self.assertEqual(total, Decimal("160.00"))
+
+    def test_ledger_accounts_for_transfers(self):
+        """Сверка с журналом учитывает обе части перевода."""
+        for wallet in (self.source, self.target):
+            WalletService.apply_operation(
+                wallet.id, OperationType.DEPOSIT, Decimal("0.01")
+            )
+        Wallet.objects.filter(id=self.source.id).update(
+            balance=Decimal("0.01")
+        )
+        Wallet.objects.filter(id=self.target.id).update(
+            balance=Decimal("0.01")
+        )
+
+        WalletService.transfer(self.source.id, self.target.id, Decimal("0.01"))
+
+        report = ledger.verify_range(None, None, timezone.now())
+        self.assertEqual(report.drifts, [])
+
+
+class TransferViewTest(APITestCase):
+    def setUp(self):
+        self.source = Wallet.objects.create(balance=Decimal("100.00"))
+        self.target = Wallet.objects.create()
+        self.url = reverse(
+            "transfer-create", kwargs={"wallet_id": self.source.id}
+        )
+        self.data = {"to_wallet_id": str(self.target.id), "amount": "25.00"}
+
+    def test_transfer(self):
+        """Перевод возвращает операцию списания и связанную операцию."""
+        response = self.client.post(self.url, self.data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["operation_type"], "TRANSFER")
+        self.assertEqual(response.data["to_wallet_id"], str(self.target.id))
+        credit = Operation.objects.get(wallet=self.target)
+        self.assertEqual(response.data["linked_operation"], credit.id)
+
+    def test_transfer_to_same_wallet(self):
+        """Перевод самому себе — ошибка 400."""
+        response = self.client.post(
+            self.url,
+            {**self.data, "to_wallet_id": str(self.source.id)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_idempotent_transfer(self):
+        """Повтор с тем же ключом не списывает средства повторно."""
+        headers = {"Idempotency-Key": "transfer-1"}
+        first = self.client.post(
+            self.url, self.data, format="json", headers=headers
+        )
+        second = self.client.post(
+            self.url, self.data, format="json", headers=headers
+        )
+        other_target = Wallet.objects.create()
+        mismatch = self.client.post(
+            self.url,
+            {**self.data, "to_wallet_id": str(other_target.id)},
+            format="json",
+            headers=headers,
+        )
+
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(first.data["id"], second.data["id"])
+        self.assertEqual(
+            mismatch.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal("75.00"))
+
+    def test_operation_endpoint_rejects_transfer(self):
+        """Тип TRANSFER нельзя передать в эндпоинт операций."""
+        response = self.client.post(
+            reverse("operation-list", kwargs={"wallet_id": self.source.id}),
+            {"operation_type": "TRANSFER", "amount": "1.00"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class TransferStressTest(TransactionTestCase):
+    THREADS = 8
+    TRANSFERS_PER_THREAD = 25
+
+    def test_opposing_transfers_do_not_deadlock(self):
+        """Встречные переводы из нескольких потоков не блокируют друг друга."""
+        wallets = [
+            Wallet.objects.create(balance=Decimal("1000.00")) for _ in range(2)
+        ]
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def transfer(index):
+            source, target = wallets[index % 2], wallets[1 - index % 2]
+            barrier.wait()
+            try:
+                for _ in range(self.TRANSFERS_PER_THREAD):
+                    WalletService.transfer(
+                        source.id, target.id, Decimal("1.00")
+                    )
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=transfer, args=(index,))
+            for index in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            Operation.objects.count(),
+            2 * self.THREADS * self.TRANSFERS_PER_THREAD,
+        )
+        self.assertEqual(
+            sum(wallet.balance for wallet in Wallet.objects.all()),
+            Decimal("2000.00"),
+        )
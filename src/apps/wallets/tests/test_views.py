@@ -1,11 +1,19 @@
 import uuid
+from datetime import timedelta
 from decimal import Decimal
 
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
 
-from apps.wallets.models import OperationType, Wallet
+from apps.wallets.models import (
+    IdempotencyKey,
+    Operation,
+    OperationType,
+    Wallet,
+)
 
 
 class WalletViewsTest(APITestCase):
@@ -34,6 +42,61 @@ class WalletViewsTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
 
+class WalletBalancesViewsTest(APITestCase):
+    def setUp(self):
+        self.wallets = [
+            Wallet.objects.create(balance=Decimal(balance))
+            for balance in ("10.00", "20.00", "30.00")
+        ]
+        self.balances_url = reverse("wallet-balances")
+
+    def test_balances_loaded_with_one_query(self):
+        """Балансы нескольких кошельков читаются одним запросом к БД."""
+        ids = [str(wallet.id) for wallet in reversed(self.wallets)]
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                self.balances_url, {"ids": ids}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (wallet["id"], wallet["balance"])
+                for wallet in response.data["wallets"]
+            ],
+            [(ids[0], "30.00"), (ids[1], "20.00"), (ids[2], "10.00")],
+        )
+        self.assertEqual(response.data["missing"], [])
+
+    def test_missing_wallets_reported(self):
+        """Несуществующие кошельки перечисляются в missing."""
+        missing_id = uuid.uuid4()
+        response = self.client.get(
+            self.balances_url,
+            {"ids": [self.wallets[0].id, missing_id, self.wallets[0].id]},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["wallets"]), 1)
+        self.assertEqual(response.data["missing"], [missing_id])
+
+    def test_too_many_ids_rejected(self):
+        """Число кошельков в запросе ограничено."""
+        ids = [
+            str(uuid.uuid4())
+            for _ in range(settings.WALLETS_BALANCES_MAX_IDS + 1)
+        ]
+        response = self.client.post(
+            self.balances_url, {"ids": ids}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_empty_ids_rejected(self):
+        """Пустой список кошельков — ошибка запроса."""
+        response = self.client.post(
+            self.balances_url, {"ids": []}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class OperationViewsTest(APITestCase):
     INITIAL_BALANCE_STR = "100.00"
     INITIAL_BALANCE = Decimal(INITIAL_BALANCE_STR)
@@ -134,3 +197,265 @@ class OperationViewsTest(APITestCase):
         )
         response = self.client.post(non_existent_wallet_operation_url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class OperationIdempotencyViewsTest(APITestCase):
+    INITIAL_BALANCE = Decimal("100.00")
+    IDEMPOTENCY_KEY = "0b6c7e4e-retry-key"
+
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=self.INITIAL_BALANCE)
+        self.operation_url = reverse(
+            "operation-list", kwargs={"wallet_id": self.wallet.id}
+        )
+        self.data = {
+            "operation_type": OperationType.WITHDRAW,
+            "amount": "30.00",
+        }
+
+    def _post(self, data, key=IDEMPOTENCY_KEY):
+        return self.client.post(
+            self.operation_url, data, HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_returns_original_operation(self):
+        """Повтор запроса с тем же ключом не списывает средства дважды."""
+        first = self._post(self.data)
+        retry = self._post(self.data)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Operation.objects.count(), 1)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("70.00"))
+
+    def test_retry_does_not_touch_wallet(self):
+        """Повтор отвечает одним запросом к БД без изменения кошелька."""
+        self._post(self.data)
+        with self.assertNumQueries(1):
+            self._post(self.data)
+
+    def test_key_reused_for_other_request(self):
+        """Ключ нельзя использовать для запроса с другими параметрами."""
+        self._post(self.data)
+        response = self._post({**self.data, "amount": "31.00"})
+
+        self.assertEqual(
+            response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        self.assertEqual(Operation.objects.count(), 1)
+
+    def test_expired_key_can_be_reused(self):
+        """Просроченный ключ освобождается для новой операции."""
+        self._post(self.data)
+        IdempotencyKey.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        response = self._post(self.data)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Operation.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        """Без заголовка каждый запрос создаёт новую операцию."""
+        self.client.post(self.operation_url, self.data)
+        self.client.post(self.operation_url, self.data)
+        self.assertEqual(Operation.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_too_long_key_rejected(self):
+        """Слишком длинный ключ отклоняется."""
+        response = self._post(self.data, key="k" * 256)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Operation.objects.exists())
+
+
+class OperationHistoryViewsTest(APITestCase):
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=Decimal("100.00"))
+        self.history_url = reverse(
+            "operation-history", kwargs={"wallet_id": self.wallet.id}
+        )
+        now = timezone.now()
+        self.operations = Operation.objects.bulk_create(
+            Operation(
+                wallet=self.wallet,
+                amount=Decimal(index + 1),
+                operation_type=(
+                    OperationType.DEPOSIT
+                    if index % 2
+                    else OperationType.WITHDRAW
+                ),
+            )
+            for index in range(7)
+        )
+        for index, operation in enumerate(self.operations):
+            operation.created_at = now - timedelta(minutes=index // 2)
+        Operation.objects.bulk_update(self.operations, ["created_at"])
+        Operation.objects.bulk_create(
+            [
+                Operation(
+                    wallet=Wallet.objects.create(),
+                    amount=Decimal("1.00"),
+                    operation_type=OperationType.DEPOSIT,
+                )
+            ]
+        )
+
+    def _collect_pages(self, params):
+        ids, url, pages = [], self.history_url, 0
+        while url:
+            response = self.client.get(url, params if not pages else None)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item["id"] for item in response.data["results"])
+            url, pages = response.data["next"], pages + 1
+        return ids, pages
+
+    def test_pages_cover_history_in_order(self):
+        """Страницы по курсору отдают все операции без повторов."""
+        ids, pages = self._collect_pages({"page_size": 2})
+
+        expected = sorted(
+            self.operations,
+            key=lambda operation: (operation.created_at, operation.id),
+            reverse=True,
+        )
+        self.assertEqual(ids, [str(operation.id) for operation in expected])
+        self.assertEqual(pages, 4)
+
+    def test_filters(self):
+        """Фильтры по типу, сумме и времени сужают историю."""
+        ids, _ = self._collect_pages(
+            {
+                "operation_type": OperationType.WITHDRAW,
+                "amount_min": "2",
+                "amount_max": "6",
+                "page_size": 1,
+            }
+        )
+        amounts = sorted(
+            Operation.objects.get(id=operation_id).amount
+            for operation_id in ids
+        )
+        self.assertEqual(amounts, [Decimal("3.00"), Decimal("5.00")])
+
+        ids, _ = self._collect_pages(
+            {"created_after": timezone.now() - timedelta(seconds=30)}
+        )
+        self.assertEqual(len(ids), 2)
+
+    def test_page_uses_constant_number_of_queries(self):
+        """Любая страница — это проверка кошелька и один запрос операций."""
+        response = self.client.get(self.history_url, {"page_size": 2})
+        with self.assertNumQueries(2):
+            self.client.get(response.data["next"])
+
+    def test_invalid_parameters(self):
+        """Неверные фильтры и курсор отклоняются."""
+        response = self.client.get(self.history_url, {"amount_min": "x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("amount_min", response.data)
+
+        response = self.client.get(self.history_url, {"cursor": "broken"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_nonexistent_wallet(self):
+        """История несуществующего кошелька возвращает 404."""
+        url = reverse("operation-history", kwargs={"wallet_id": uuid.uuid4()})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class OperationBatchViewsTest(APITestCase):
+    INITIAL_BALANCE = Decimal("100.00")
+
+    def setUp(self):
+        self.first_wallet = Wallet.objects.create(balance=self.INITIAL_BALANCE)
+        self.second_wallet = Wallet.objects.create(
+            balance=self.INITIAL_BALANCE
+        )
+        self.batch_url = reverse("operation-batch")
+
+    def _item(self, wallet_id, operation_type, amount):
+        return {
+            "wallet_id": str(wallet_id),
+            "operation_type": operation_type,
+            "amount": amount,
+        }
+
+    def test_atomic_batch_applied(self):
+        """Все операции пакета применяются в одной транзакции."""
+        data = {
+            "operations": [
+                self._item(self.first_wallet.id, OperationType.DEPOSIT, "10"),
+                self._item(
+                    self.second_wallet.id, OperationType.WITHDRAW, "30"
+                ),
+                self._item(self.first_wallet.id, OperationType.WITHDRAW, "5"),
+            ]
+        }
+        response = self.client.post(self.batch_url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 3)
+        self.assertTrue(all(item["status"] == 201 for item in response.data))
+        self.first_wallet.refresh_from_db()
+        self.second_wallet.refresh_from_db()
+        self.assertEqual(self.first_wallet.balance, Decimal("105.00"))
+        self.assertEqual(self.second_wallet.balance, Decimal("70.00"))
+        self.assertEqual(Operation.objects.count(), 3)
+
+    def test_atomic_batch_rolled_back_on_error(self):
+        """В режиме atomic ошибка одной операции отменяет весь пакет."""
+        data = {
+            "mode": "atomic",
+            "operations": [
+                self._item(self.first_wallet.id, OperationType.DEPOSIT, "10"),
+                self._item(
+                    self.second_wallet.id, OperationType.WITHDRAW, "300"
+                ),
+                self._item(uuid.uuid4(), OperationType.DEPOSIT, "1"),
+            ],
+        }
+        response = self.client.post(self.batch_url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.data["operations"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("amount", errors[1])
+        self.assertIn("detail", errors[2])
+        self.first_wallet.refresh_from_db()
+        self.assertEqual(self.first_wallet.balance, self.INITIAL_BALANCE)
+        self.assertFalse(Operation.objects.exists())
+
+    def test_partial_batch_reports_each_item(self):
+        """В режиме partial применяются все операции, кроме ошибочных."""
+        data = {
+            "mode": "partial",
+            "operations": [
+                self._item(self.first_wallet.id, OperationType.DEPOSIT, "10"),
+                self._item(
+                    self.second_wallet.id, OperationType.WITHDRAW, "300"
+                ),
+                self._item(uuid.uuid4(), OperationType.DEPOSIT, "1"),
+            ],
+        }
+        response = self.client.post(self.batch_url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        statuses = [item["status"] for item in response.data]
+        self.assertEqual(statuses, [201, 400, 404])
+        self.assertIn("operation", response.data[0])
+        self.first_wallet.refresh_from_db()
+        self.second_wallet.refresh_from_db()
+        self.assertEqual(self.first_wallet.balance, Decimal("110.00"))
+        self.assertEqual(self.second_wallet.balance, self.INITIAL_BALANCE)
+        self.assertEqual(Operation.objects.count(), 1)
+
+    def test_empty_batch_rejected(self):
+        """Пустой пакет не принимается."""
+        response = self.client.post(self.batch_url, {"operations": []})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("operations", response.data)
@@ -1,9 +1,10 @@
+import uuid
 from decimal import Decimal
 
 from django.test import TestCase
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 
-from apps.wallets.models import Wallet
+from apps.wallets.models import Operation, OperationType, Wallet
 from apps.wallets.wallet_service import WalletService
 
 
@@ -43,3 +44,63 @@ class TestWalletService(TestCase):
             WalletService.withdraw(
                 self.wallet, self.INITIAL_BALANCE + Decimal("50.00")
             )
+
+
+class TestWalletServiceApplyOperation(TestCase):
+    INITIAL_BALANCE = Decimal("100.00")
+
+    def setUp(self):
+        self.wallet = Wallet.objects.create(balance=self.INITIAL_BALANCE)
+
+    def test_deposit_saved_to_db(self):
+        """Пополнение сразу сохраняет баланс и операцию в БД."""
+        operation = WalletService.apply_operation(
+            self.wallet.id, OperationType.DEPOSIT, Decimal("50.00")
+        )
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("150.00"))
+        saved = Operation.objects.get(id=operation.id)
+        self.assertEqual(saved.wallet_id, self.wallet.id)
+        self.assertEqual(saved.amount, Decimal("50.00"))
+        self.assertEqual(saved.operation_type, OperationType.DEPOSIT)
+
+    def test_withdraw_whole_balance(self):
+        """Можно снять весь баланс до нуля."""
+        WalletService.apply_operation(
+            self.wallet.id, OperationType.WITHDRAW, self.INITIAL_BALANCE
+        )
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("0.00"))
+
+    def test_withdraw_insufficient_funds(self):
+        """При нехватке средств ни баланс, ни операции не меняются."""
+        with self.assertRaisesRegex(ValidationError, r"Недостаточно средств"):
+            WalletService.apply_operation(
+                self.wallet.id,
+                OperationType.WITHDRAW,
+                self.INITIAL_BALANCE + Decimal("0.01"),
+            )
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, self.INITIAL_BALANCE)
+        self.assertFalse(Operation.objects.exists())
+
+    def test_nonexistent_wallet(self):
+        """Операция над несуществующим кошельком вызывает NotFound."""
+        with self.assertRaises(NotFound):
+            WalletService.apply_operation(
+                uuid.uuid4(), OperationType.DEPOSIT, Decimal("1.00")
+            )
+        self.assertFalse(Operation.objects.exists())
+
+    def test_concurrent_idempotency_key_returns_first_operation(self):
+        """Проигравший гонку за ключ запрос откатывается и видит победителя."""
+        first = WalletService.apply_operation(
+            self.wallet.id, OperationType.DEPOSIT, Decimal("10.00"), "key"
+        )
+        second = WalletService.apply_operation(
+            self.wallet.id, OperationType.DEPOSIT, Decimal("10.00"), "key"
+        )
+        self.assertEqual(second.id, first.id)
+        self.assertEqual(Operation.objects.count(), 1)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal("110.00"))
@@ -0,0 +1,144 @@
+"""
+Разбивка времени HTTP-запроса по этапам.
+
+Middleware открывает для запроса RequestTimings в contextvar. Обёртка
+execute каждого соединения с БД суммирует время и число SQL-запросов,
+отдельно — время SELECT ... FOR UPDATE (захват блокировок строк);
+обёртка commit соединения — время коммитов; measure() — время
+сериализаторов в представлениях и UPDATE баланса кошелька, который
+тоже ждёт блокировку строки. После ответа значения попадают
+в гистограммы wallets_request_* с меткой endpoint (имя маршрута).
+
+contextvar копируется в потоки sync_to_async, поэтому запросы
+асинхронных представлений, выполняемые в пуле потоков, тоже
+учитываются.
+"""
+
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+from apps.wallets import metrics
+
+LOCKING_QUERY = re.compile(r"\bFOR (?:NO KEY )?UPDATE\b")
+
+_current: ContextVar["RequestTimings | None"] = ContextVar(
+    "request_timings", default=None
+)
+
+
+@dataclass
+class RequestTimings:
+    """Время этапов одного запроса; None — этапа не было."""
+
+    sql_seconds: float = 0.0
+    queries: int = 0
+    lock_wait_seconds: float | None = None
+    serializer_seconds: float | None = None
+    commit_seconds: float | None = None
+
+    def add(self, stage: str, seconds: float) -> None:
+        name = f"{stage}_seconds"
+        setattr(self, name, (getattr(self, name) or 0.0) + seconds)
+
+    def observe(self, endpoint: str) -> None:
+        metrics.REQUEST_SQL_SECONDS.labels(endpoint).observe(self.sql_seconds)
+        metrics.REQUEST_QUERIES.labels(endpoint).observe(self.queries)
+        for histogram, seconds in (
+            (metrics.REQUEST_LOCK_WAIT_SECONDS, self.lock_wait_seconds),
+            (metrics.REQUEST_SERIALIZER_SECONDS, self.serializer_seconds),
+            (metrics.REQUEST_COMMIT_SECONDS, self.commit_seconds),
+        ):
+            if seconds is not None:
+                histogram.labels(endpoint).observe(seconds)
+
+
+def current() -> RequestTimings | None:
+    return _current.get()
+
+
+@contextmanager
+def measure(stage: str):
+    """Добавить время блока к этапу stage текущего запроса."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - started)
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        timings.sql_seconds += elapsed
+        timings.queries += 1
+        if LOCKING_QUERY.search(sql):
+            timings.add("lock_wait", elapsed)
+
+
+def instrument_connection(sender, connection, **kwargs):
+    """
+    Обработчик connection_created: подключить обёртки execute и commit.
+
+    Объект соединения потока переиспользуется после переподключения,
+    поэтому обёртки ставятся один раз.
+    """
+    if getattr(connection, "_wallets_timed", False):
+        return
+    connection._wallets_timed = True
+    connection.execute_wrappers.append(execute_wrapper)
+    commit = connection.commit
+
+    def timed_commit():
+        with measure("commit"):
+            return commit()
+
+    connection.commit = timed_commit
+
+
+def _finish(request, timings: RequestTimings) -> None:
+    match = getattr(request, "resolver_match", None)
+    if match is not None and match.view_name:
+        timings.observe(match.view_name)
+
+
+@sync_and_async_middleware
+def timing_middleware(get_response):
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            timings = RequestTimings()
+            token = _current.set(timings)
+            try:
+                return await get_response(request)
+            finally:
+                _current.reset(token)
+                _finish(request, timings)
+
+    else:
+
+        def middleware(request):
+            timings = RequestTimings()
+            token = _current.set(timings)
+            try:
+                return get_response(request)
+            finally:
+                _current.reset(token)
+                _finish(request, timings)
+
+    return middleware
@@ -1,16 +1,82 @@
+from django.conf import settings
 from django.urls import path
 
-from .views import OperationCreateView, WalletView
+from .async_views import (
+    AsyncChangeFeedView,
+    AsyncOperationCreateView,
+    AsyncWalletView,
+)
+from .views import (
+    AllOperationsExportView,
+    ChangeFeedView,
+    OperationBatchView,
+    OperationCreateView,
+    OperationExportView,
+    OperationHistoryView,
+    TransferCreateView,
+    WalletBalancesView,
+    WalletStatsView,
+    WalletView,
+)
+
+if settings.WALLETS_ASYNC_VIEWS:
+    wallet_view = AsyncWalletView.as_view()
+    operation_view = AsyncOperationCreateView.as_view()
+    change_feed_view = AsyncChangeFeedView.as_view()
+else:
+    wallet_view = WalletView.as_view()
+    operation_view = OperationCreateView.as_view()
+    change_feed_view = ChangeFeedView.as_view()
 
 urlpatterns = [
     path(
         "v1/wallets/<uuid:wallet_id>/",
-        WalletView.as_view(),
+        wallet_view,
         name="wallet-detail",
     ),
     path(
         "v1/wallets/<uuid:wallet_id>/operation/",
-        OperationCreateView.as_view(),
+        operation_view,
         name="operation-list",
     ),
+    path(
+        "v1/wallets/<uuid:wallet_id>/transfer/",
+        TransferCreateView.as_view(),
+        name="transfer-create",
+    ),
+    path(
+        "v1/wallets/<uuid:wallet_id>/operations/",
+        OperationHistoryView.as_view(),
+        name="operation-history",
+    ),
+    path(
+        "v1/wallets/<uuid:wallet_id>/operations/export/",
+        OperationExportView.as_view(),
+        name="operation-export",
+    ),
+    path(
+        "v1/wallets/operations/export/",
+        AllOperationsExportView.as_view(),
+        name="operation-export-all",
+    ),
+    path(
+        "v1/wallets/<uuid:wallet_id>/stats/",
+        WalletStatsView.as_view(),
+        name="wallet-stats",
+    ),
+    path(
+        "v1/wallets/balances/",
+        WalletBalancesView.as_view(),
+        name="wallet-balances",
+    ),
+    path(
+        "v1/wallets/changes/",
+        change_feed_view,
+        name="change-feed",
+    ),
+    path(
+        "v1/wallets/operations/batch/",
+        OperationBatchView.as_view(),
+        name="operation-batch",
+    ),
 ]
@@ -1,67 +1,466 @@
-from django.db import transaction
-from drf_spectacular.utils import extend_schema
+from dataclasses import asdict
+
+from django.http import StreamingHttpResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import status
 from rest_framework.exceptions import NotFound, ValidationError
-from rest_framework.generics import RetrieveAPIView
+from rest_framework.generics import ListAPIView, RetrieveAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Operation, OperationType, Wallet
-from .serializers import OperationSerializer, WalletSerializer
+from . import balance_history, outbox, routers, timing
+from .cache import balance_cache
+from .exports import content_type, file_name, stream_operations
+from .models import IdempotencyKey, Operation, Wallet
+from .pagination import OperationKeysetPagination
+from .rollups import Turnover, by_month, wallet_turnover
+from .serializers import (
+    AllOperationsExportSerializer,
+    BatchOperationResultSerializer,
+    BatchOperationSerializer,
+    ChangeFeedQuerySerializer,
+    ChangeFeedSerializer,
+    FastOperationSerializer,
+    OperationExportSerializer,
+    OperationHistoryFilterSerializer,
+    OperationHistorySerializer,
+    OperationSerializer,
+    TransferResultSerializer,
+    TransferSerializer,
+    WalletBalanceSerializer,
+    WalletBalancesQuerySerializer,
+    WalletBalancesSerializer,
+    WalletQuerySerializer,
+    WalletStatsQuerySerializer,
+    WalletStatsSerializer,
+)
 from .wallet_service import WalletService
 
 
-class WalletView(RetrieveAPIView):
-    """Получение информации о кошельке."""
+class WalletView(routers.ReplicaReadMixin, RetrieveAPIView):
+    """
+    Получение информации о кошельке. С параметром as_of баланс
+    возвращается на указанный момент времени.
+    """
 
-    queryset = Wallet.objects.all()
-    serializer_class = WalletSerializer
+    queryset = Wallet.objects.with_total_balance()
+    serializer_class = WalletBalanceSerializer
     lookup_url_kwarg = "wallet_id"
 
+    @extend_schema(parameters=[WalletQuerySerializer])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        params = WalletQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        as_of = params.validated_data.get("as_of")
+        if as_of is not None:
+            return Response(
+                self.balance_as_of(kwargs[self.lookup_url_kwarg], as_of)
+            )
+        if routers.reads_primary():
+            # Кэш мог заполниться с отстающей реплики.
+            return Response(self._serialize(self.get_object()))
+        data = balance_cache.get(
+            kwargs[self.lookup_url_kwarg],
+            lambda: self._serialize(self.get_object()),
+        )
+        return Response(data)
+
+    def _serialize(self, wallet):
+        with timing.measure("serializer"):
+            return self.get_serializer(wallet).data
+
+    @staticmethod
+    def balance_as_of(wallet_id, as_of):
+        """
+        Данные ответа с балансом кошелька на момент as_of.
+
+        Используется и асинхронной версией представления.
+        """
+        balance = balance_history.balance_as_of(wallet_id, as_of)
+        if balance is None:
+            raise NotFound()
+        with timing.measure("serializer"):
+            return WalletBalanceSerializer(
+                {"id": wallet_id, "total_balance": balance}
+            ).data
+
+
+class WalletBalancesView(routers.ReplicaReadMixin, APIView):
+    """
+    Балансы нескольких кошельков одним запросом: ids передаются
+    повторяющимся параметром запроса или списком в теле POST.
+    Несуществующие кошельки перечисляются в missing.
+    """
+
+    read_only = True
+
+    @extend_schema(
+        parameters=[WalletBalancesQuerySerializer],
+        responses=WalletBalancesSerializer,
+    )
+    def get(self, request):
+        return self._balances(request.query_params)
+
+    @extend_schema(
+        request=WalletBalancesQuerySerializer,
+        responses=WalletBalancesSerializer,
+    )
+    def post(self, request):
+        return self._balances(request.data)
+
+    def _balances(self, data):
+        params = WalletBalancesQuerySerializer(data=data)
+        params.is_valid(raise_exception=True)
+        wallet_ids = params.validated_data["ids"]
+        if routers.reads_primary():
+            # Кэш мог заполниться с отстающей реплики.
+            found = self._load(wallet_ids)
+        else:
+            found = balance_cache.get_many(wallet_ids, self._load)
+        return Response(
+            {
+                "wallets": [
+                    found[wallet_id]
+                    for wallet_id in wallet_ids
+                    if wallet_id in found
+                ],
+                "missing": [
+                    wallet_id
+                    for wallet_id in wallet_ids
+                    if wallet_id not in found
+                ],
+            }
+        )
+
+    @staticmethod
+    def _load(wallet_ids):
+        wallets = list(
+            Wallet.objects.with_total_balance().filter(id__in=wallet_ids)
+        )
+        with timing.measure("serializer"):
+            return {
+                wallet.id: WalletBalanceSerializer(wallet).data
+                for wallet in wallets
+            }
+
 
 class OperationCreateView(APIView):
     """Обработка пополнения или снятия средств с кошелька."""
 
+    IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+
     @extend_schema(
         request=OperationSerializer,
         responses={201: OperationSerializer},
+        parameters=[
+            OpenApiParameter(
+                IDEMPOTENCY_KEY_HEADER,
+                OpenApiTypes.STR,
+                OpenApiParameter.HEADER,
+                description=(
+                    "Повтор запроса с тем же ключом возвращает"
+                    " исходную операцию без повторного списания."
+                ),
+            )
+        ],
     )
-    @transaction.atomic
     def post(self, request, wallet_id):
-        try:
-            wallet = Wallet.objects.select_for_update().get(id=wallet_id)
-        except Wallet.DoesNotExist:
-            raise NotFound()
+        data = self.create_operation(
+            wallet_id,
+            request.data,
+            request.headers.get(self.IDEMPOTENCY_KEY_HEADER),
+        )
+        return Response(data, status=status.HTTP_201_CREATED)
 
-        serializer = OperationSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+    @classmethod
+    def create_operation(cls, wallet_id, data, idempotency_key=None):
+        """
+        Проверить данные запроса и выполнить операцию.
+
+        Возвращает данные ответа 201; ошибки передаются исключениями DRF.
+        Используется и асинхронной версией представления.
+        """
+        cls._validate_idempotency_key(idempotency_key)
+        serializer = FastOperationSerializer(data=data)
+        with timing.measure("serializer"):
+            valid = serializer.is_valid()
+        if not valid:
+            if not Wallet.objects.filter(id=wallet_id).exists():
+                raise NotFound()
+            raise ValidationError(serializer.errors)
         operation_type = serializer.validated_data["operation_type"]
         amount = serializer.validated_data["amount"]
 
-        if operation_type == OperationType.WITHDRAW:
-            WalletService.withdraw(wallet, amount)
-        elif operation_type == OperationType.DEPOSIT:
-            WalletService.deposit(wallet, amount)
-        else:
-            ValidationError(
+        operation = None
+        if idempotency_key:
+            operation = WalletService.replay_operation(
+                idempotency_key, wallet_id, operation_type, amount
+            )
+        if operation is None:
+            operation = WalletService.apply_operation(
+                wallet_id, operation_type, amount, idempotency_key
+            )
+        with timing.measure("serializer"):
+            return FastOperationSerializer(operation).data
+
+    @classmethod
+    def _validate_idempotency_key(cls, key):
+        max_length = IdempotencyKey._meta.get_field("key").max_length
+        if key and len(key) > max_length:
+            raise ValidationError(
                 {
-                    "operation_type": (
-                        "Недопустимое значение operation_type."
-                        f" Допустимы {OperationType.WITHDRAW},"
-                        f" {OperationType.DEPOSIT}."
+                    cls.IDEMPOTENCY_KEY_HEADER: (
+                        f"Длина ключа не должна превышать {max_length}."
                     )
                 }
             )
-        wallet.save()
 
-        operation = Operation.objects.create(
-            wallet=wallet,
-            amount=amount,
-            operation_type=operation_type,
+
+class TransferCreateView(APIView):
+    """Перевод средств с кошелька на другой кошелёк."""
+
+    @extend_schema(
+        request=TransferSerializer,
+        responses={201: TransferResultSerializer},
+        parameters=[
+            OpenApiParameter(
+                OperationCreateView.IDEMPOTENCY_KEY_HEADER,
+                OpenApiTypes.STR,
+                OpenApiParameter.HEADER,
+                description=(
+                    "Повтор запроса с тем же ключом возвращает"
+                    " исходный перевод без повторного списания."
+                ),
+            )
+        ],
+    )
+    def post(self, request, wallet_id):
+        idempotency_key = request.headers.get(
+            OperationCreateView.IDEMPOTENCY_KEY_HEADER
         )
-        response_serializer = OperationSerializer(operation)
+        OperationCreateView._validate_idempotency_key(idempotency_key)
+        serializer = TransferSerializer(data=request.data)
+        with timing.measure("serializer"):
+            valid = serializer.is_valid()
+        if not valid:
+            if not Wallet.objects.filter(id=wallet_id).exists():
+                raise NotFound()
+            raise ValidationError(serializer.errors)
+        to_wallet_id = serializer.validated_data["to_wallet_id"]
+        amount = serializer.validated_data["amount"]
+        if to_wallet_id == wallet_id:
+            raise ValidationError(
+                {"to_wallet_id": "Нельзя перевести средства тому же кошельку."}
+            )
+
+        operation = None
+        if idempotency_key:
+            operation = WalletService.replay_transfer(
+                idempotency_key, wallet_id, to_wallet_id, amount
+            )
+        if operation is None:
+            operation = WalletService.transfer(
+                wallet_id, to_wallet_id, amount, idempotency_key
+            )
+        with timing.measure("serializer"):
+            data = TransferResultSerializer(operation).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class OperationHistoryView(routers.ReplicaReadMixin, ListAPIView):
+    """История операций кошелька, от новых к старым."""
+
+    serializer_class = OperationHistorySerializer
+    pagination_class = OperationKeysetPagination
+
+    @extend_schema(parameters=[OperationHistoryFilterSerializer])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        wallet_id = self.kwargs["wallet_id"]
+        if not Wallet.objects.filter(id=wallet_id).exists():
+            raise NotFound()
+        filters = OperationHistoryFilterSerializer(
+            data=self.request.query_params
+        )
+        filters.is_valid(raise_exception=True)
+        return Operation.objects.filter(
+            wallet_id=wallet_id, **filters.get_lookups()
+        )
+
+
+class ChangeFeedView(APIView):
+    """
+    Лента изменений: операции всех кошельков по возрастанию номера
+    события после cursor. next_cursor передаётся в следующий запрос.
+    Долгий опрос (wait > 0) обслуживает только AsyncChangeFeedView в
+    профиле ASGI: здесь ожидание заняло бы поток синхронного воркера,
+    поэтому ответ возвращается сразу.
+    """
+
+    @extend_schema(
+        parameters=[ChangeFeedQuerySerializer],
+        responses=ChangeFeedSerializer,
+    )
+    def get(self, request):
+        params = ChangeFeedQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        cursor = params.validated_data["cursor"]
+        events = outbox.fetch(cursor, params.validated_data["limit"])
+        return Response(self.page(cursor, events))
+
+    @staticmethod
+    def page(cursor, events):
+        return ChangeFeedSerializer(
+            {
+                "events": events,
+                "next_cursor": events[-1].id if events else cursor,
+            }
+        ).data
+
+
+class OperationExportView(APIView):
+    """Потоковая выгрузка операций кошелька в CSV или NDJSON."""
+
+    filter_serializer_class = OperationExportSerializer
+
+    @extend_schema(
+        parameters=[OperationExportSerializer],
+        responses={(200, "text/csv"): OpenApiTypes.BINARY},
+    )
+    def get(self, request, wallet_id):
+        if not Wallet.objects.filter(id=wallet_id).exists():
+            raise NotFound()
+        return self.stream(
+            Operation.objects.filter(wallet_id=wallet_id),
+            f"operations-{wallet_id}",
+        )
+
+    def stream(self, queryset, name):
+        params = self.filter_serializer_class(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        export_format = params.validated_data["export_format"]
+        compress = params.validated_data["gzip"]
+        response = StreamingHttpResponse(
+            stream_operations(
+                queryset.filter(**params.get_lookups()),
+                export_format,
+                compress,
+            ),
+            content_type=content_type(export_format, compress),
+        )
+        filename = file_name(name, export_format, compress)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class AllOperationsExportView(OperationExportView):
+    """Потоковая выгрузка операций всех кошельков за период."""
+
+    filter_serializer_class = AllOperationsExportSerializer
+
+    @extend_schema(
+        operation_id="wallets_operations_export_all",
+        parameters=[AllOperationsExportSerializer],
+        responses={(200, "text/csv"): OpenApiTypes.BINARY},
+    )
+    def get(self, request):
+        return self.stream(Operation.objects.all(), "operations")
+
+
+class WalletStatsView(routers.ReplicaReadMixin, APIView):
+    """Обороты кошелька за период по дням или месяцам."""
+
+    @extend_schema(
+        parameters=[WalletStatsQuerySerializer],
+        responses=WalletStatsSerializer,
+    )
+    def get(self, request, wallet_id):
+        if not Wallet.objects.filter(id=wallet_id).exists():
+            raise NotFound()
+        params = WalletStatsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        date_from = params.validated_data["date_from"]
+        date_to = params.validated_data["date_to"]
+        group_by = params.validated_data["group_by"]
+
+        periods = wallet_turnover(wallet_id, date_from, date_to)
+        if group_by == WalletStatsQuerySerializer.MONTH:
+            periods = by_month(periods)
+        total = Turnover()
+        for turnover in periods.values():
+            total.merge(turnover)
+
+        data = {
+            "wallet_id": wallet_id,
+            "date_from": date_from,
+            "date_to": date_to,
+            "group_by": group_by,
+            "total": total,
+            "periods": [
+                {"period": period, **asdict(turnover)}
+                for period, turnover in periods.items()
+            ],
+        }
+        return Response(WalletStatsSerializer(data).data)
+
+
+class OperationBatchView(APIView):
+    """Пакетное пополнение и снятие средств с нескольких кошельков."""
+
+    @extend_schema(
+        request=BatchOperationSerializer,
+        responses={
+            200: BatchOperationResultSerializer(many=True),
+            201: BatchOperationResultSerializer(many=True),
+        },
+    )
+    def post(self, request):
+        serializer = BatchOperationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        atomic = (
+            serializer.validated_data["mode"]
+            == BatchOperationSerializer.ATOMIC
+        )
+
+        results = WalletService.apply_batch(
+            serializer.validated_data["operations"], atomic=atomic
+        )
+        failed = any(result.error for result in results)
+        if atomic and failed:
+            raise ValidationError(
+                {
+                    "operations": [
+                        _error_detail(result.error) if result.error else {}
+                        for result in results
+                    ]
+                }
+            )
 
         return Response(
-            response_serializer.data,
-            status=status.HTTP_201_CREATED,
+            [_batch_result_data(result) for result in results],
+            status=status.HTTP_200_OK if failed else status.HTTP_201_CREATED,
         )
+
+
+def _error_detail(error):
+    if isinstance(error.detail, dict):
+        return error.detail
+    return {"detail": error.detail}
+
+
+def _batch_result_data(result):
+    if result.error:
+        return {
+            "status": result.error.status_code,
+            "errors": _error_detail(result.error),
+        }
+    return {
+        "status": status.HTTP_201_CREATED,
+        "operation": OperationSerializer(result.operation).data,
+    }
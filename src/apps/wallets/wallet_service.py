@@ -1,8 +1,56 @@
+import time
+from dataclasses import dataclass
+from datetime import timedelta
 from decimal import Decimal
+from uuid import UUID
 
-from rest_framework.exceptions import ValidationError
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import APIException, NotFound, ValidationError
 
-from apps.wallets.models import Wallet
+from apps.wallets import (
+    budgets,
+    clock,
+    group_commit,
+    outbox,
+    sharding,
+    timing,
+)
+from apps.wallets.cache import balance_cache
+from apps.wallets.exceptions import IdempotencyKeyMismatch
+from apps.wallets.models import (
+    IdempotencyKey,
+    Operation,
+    OperationType,
+    Wallet,
+)
+
+APPLY_OPERATION_SQL = """
+    WITH updated AS (
+        UPDATE {wallet_table}
+        SET {balance} = {balance} + %s
+        WHERE {wallet_pk} = %s AND {balance} + %s >= 0
+        RETURNING {wallet_pk},
+            CASE WHEN {bucket_count} = 0 THEN {balance} END AS balance
+    )
+    INSERT INTO {operation_table}
+        ({operation_pk}, {amount}, {operation_type}, {wallet_fk},
+         {created_at}, {balance_after})
+    SELECT %s, %s, %s, updated.{wallet_pk},
+        clock_timestamp(), updated.balance
+    FROM updated
+    RETURNING {created_at}, {balance_after}
+"""
+
+
+@dataclass
+class BatchItemResult:
+    """Результат одной операции из пакета."""
+
+    operation: Operation | None = None
+    error: APIException | None = None
 
 
 class WalletService:
@@ -27,3 +75,392 @@ class WalletService:
             raise ValidationError({"amount": "Недостаточно средств"})
         wallet.balance -= amount
         return wallet
+
+    @classmethod
+    def apply_operation(
+        cls,
+        wallet_id: UUID,
+        operation_type: str,
+        amount: Decimal,
+        idempotency_key: str | None = None,
+    ) -> Operation:
+        """
+        Атомарно изменить баланс кошелька в БД и записать операцию.
+
+        Баланс меняется условным UPDATE без предварительного
+        SELECT ... FOR UPDATE, поэтому блокировка строки держится
+        только на время самого запроса. На PostgreSQL обновление
+        баланса и вставка операции выполняются одним запросом (CTE).
+
+        created_at и balance_after операции назначаются после
+        блокировки строки кошелька, поэтому порядок операций кошелька
+        по created_at совпадает с порядком изменения баланса.
+
+        Если передан ключ идемпотентности, он сохраняется в той же
+        транзакции. При гонке двух запросов с одним ключом второй
+        откатывается и возвращает операцию первого.
+
+        При включённом WALLETS_GROUP_COMMIT пополнения без ключа
+        идемпотентности коммитятся группами (см. group_commit).
+        """
+        if (
+            settings.WALLETS_GROUP_COMMIT["ENABLED"]
+            and operation_type == OperationType.DEPOSIT
+            and not idempotency_key
+        ):
+            return group_commit.committer.deposit(wallet_id, amount)
+        delta = cls.signed_amount(operation_type, amount)
+        operation = Operation(
+            wallet_id=wallet_id,
+            amount=amount,
+            operation_type=operation_type,
+        )
+        try:
+            with transaction.atomic(), budgets.lock_budget(wallet_id):
+                if not cls._apply(operation, delta):
+                    cls._raise_rejected(wallet_id)
+                outbox.record([operation])
+                balance_cache.invalidate_on_commit(wallet_id)
+                if idempotency_key:
+                    cls._save_idempotency_key(idempotency_key, operation)
+        except IntegrityError:
+            if not idempotency_key:
+                raise
+            replayed = cls.replay_operation(
+                idempotency_key, wallet_id, operation_type, amount
+            )
+            if replayed is None:
+                raise
+            return replayed
+        operation._state.adding = False
+        operation._state.db = connection.alias
+        return operation
+
+    @staticmethod
+    def replay_operation(
+        idempotency_key: str,
+        wallet_id: UUID,
+        operation_type: str,
+        amount: Decimal,
+    ) -> Operation | None:
+        """
+        Найти операцию, уже выполненную с этим ключом идемпотентности.
+
+        Поиск идёт по уникальному индексу без блокировки кошелька.
+        Просроченный ключ удаляется, чтобы его можно было
+        использовать заново. Если ключ принадлежит запросу с другими
+        параметрами, вызывается IdempotencyKeyMismatch.
+        """
+        stored = (
+            IdempotencyKey.objects.select_related(
+                "operation__linked_operation"
+            )
+            .filter(key=idempotency_key)
+            .first()
+        )
+        if stored is None:
+            return None
+        if stored.expires_at <= timezone.now():
+            stored.delete()
+            return None
+        operation = stored.operation
+        if (
+            operation.wallet_id,
+            operation.operation_type,
+            operation.amount,
+        ) != (
+            wallet_id,
+            operation_type,
+            amount,
+        ):
+            raise IdempotencyKeyMismatch()
+        return operation
+
+    @classmethod
+    def apply_batch(
+        cls, items: list[dict], atomic: bool = True
+    ) -> list[BatchItemResult]:
+        """
+        Применить пакет операций над несколькими кошельками
+        в одной транзакции.
+
+        Строки кошельков блокируются одним запросом в порядке id,
+        поэтому встречные пакеты не могут взаимно заблокироваться.
+        Балансы корзин разделённых кошельков переносятся в строки
+        кошельков.
+        Операции сохраняются через bulk_create. В режиме atomic
+        при любой ошибке ничего не применяется, иначе применяются
+        все операции, кроме ошибочных.
+        """
+        wallet_ids = {item["wallet_id"] for item in items}
+        with transaction.atomic(), budgets.lock_budget(*wallet_ids):
+            wallets, folded_ids = cls._lock_wallets(wallet_ids)
+            results = [cls._apply_batch_item(wallets, item) for item in items]
+            if atomic and any(result.error for result in results):
+                transaction.set_rollback(True)
+                return results
+
+            operations = [
+                result.operation for result in results if result.operation
+            ]
+            created_at = clock.now()
+            for operation in operations:
+                operation.created_at = created_at
+            changed_ids = {
+                operation.wallet_id for operation in operations
+            } | set(folded_ids)
+            Wallet.objects.bulk_update(
+                [wallets[wallet_id] for wallet_id in changed_ids],
+                ["balance"],
+            )
+            for wallet_id in changed_ids:
+                balance_cache.invalidate_on_commit(wallet_id)
+            Operation.objects.bulk_create(operations)
+            outbox.record(operations)
+        return results
+
+    @classmethod
+    def transfer(
+        cls,
+        from_wallet_id: UUID,
+        to_wallet_id: UUID,
+        amount: Decimal,
+        idempotency_key: str | None = None,
+    ) -> Operation:
+        """
+        Перевести средства с одного кошелька на другой в одной транзакции.
+
+        Обе строки блокируются одним запросом в порядке id, как в
+        пакетных операциях, поэтому встречные переводы не могут
+        взаимно заблокироваться. Списание записывается операцией
+        TRANSFER, зачисление — операцией DEPOSIT; операции ссылаются
+        друг на друга через linked_operation. Возвращает операцию
+        списания.
+        """
+        debit = Operation(
+            wallet_id=from_wallet_id,
+            amount=amount,
+            operation_type=OperationType.TRANSFER,
+        )
+        credit = Operation(
+            wallet_id=to_wallet_id,
+            amount=amount,
+            operation_type=OperationType.DEPOSIT,
+        )
+        debit.linked_operation, credit.linked_operation = credit, debit
+        try:
+            with transaction.atomic(), budgets.lock_budget(
+                from_wallet_id, to_wallet_id
+            ):
+                wallets, _ = cls._lock_wallets({from_wallet_id, to_wallet_id})
+                if len(wallets) < 2:
+                    raise NotFound()
+                cls.withdraw(wallets[from_wallet_id], amount)
+                cls.deposit(wallets[to_wallet_id], amount)
+                debit.created_at = credit.created_at = clock.now()
+                debit.balance_after = wallets[from_wallet_id].balance
+                credit.balance_after = wallets[to_wallet_id].balance
+                Wallet.objects.bulk_update(wallets.values(), ["balance"])
+                # Внешние ключи проверяются при коммите, поэтому
+                # операции могут ссылаться друг на друга.
+                Operation.objects.bulk_create([debit, credit])
+                outbox.record([debit, credit])
+                for wallet_id in wallets:
+                    balance_cache.invalidate_on_commit(wallet_id)
+                if idempotency_key:
+                    cls._save_idempotency_key(idempotency_key, debit)
+        except IntegrityError:
+            if not idempotency_key:
+                raise
+            replayed = cls.replay_transfer(
+                idempotency_key, from_wallet_id, to_wallet_id, amount
+            )
+            if replayed is None:
+                raise
+            return replayed
+        return debit
+
+    @classmethod
+    def replay_transfer(
+        cls,
+        idempotency_key: str,
+        from_wallet_id: UUID,
+        to_wallet_id: UUID,
+        amount: Decimal,
+    ) -> Operation | None:
+        """Найти перевод, уже выполненный с этим ключом идемпотентности."""
+        operation = cls.replay_operation(
+            idempotency_key, from_wallet_id, OperationType.TRANSFER, amount
+        )
+        if operation is not None and (
+            operation.linked_operation is None
+            or operation.linked_operation.wallet_id != to_wallet_id
+        ):
+            raise IdempotencyKeyMismatch()
+        return operation
+
+    @staticmethod
+    def _lock_wallets(
+        wallet_ids: set[UUID],
+    ) -> tuple[dict[UUID, Wallet], list[UUID]]:
+        wallets = {
+            wallet.id: wallet
+            for wallet in Wallet.objects.select_for_update()
+            .filter(id__in=wallet_ids)
+            .order_by("id")
+        }
+        return wallets, sharding.fold_buckets(wallets)
+
+    @staticmethod
+    def _save_idempotency_key(key: str, operation: Operation) -> None:
+        IdempotencyKey.objects.create(
+            key=key,
+            operation=operation,
+            expires_at=operation.created_at
+            + timedelta(seconds=settings.WALLETS_IDEMPOTENCY_KEY_TTL),
+        )
+
+    @classmethod
+    def _apply_batch_item(
+        cls, wallets: dict[UUID, Wallet], item: dict
+    ) -> BatchItemResult:
+        wallet = wallets.get(item["wallet_id"])
+        if wallet is None:
+            return BatchItemResult(error=NotFound())
+        operation_type, amount = item["operation_type"], item["amount"]
+        try:
+            if operation_type == OperationType.WITHDRAW:
+                cls.withdraw(wallet, amount)
+            else:
+                cls.deposit(wallet, amount)
+        except ValidationError as error:
+            return BatchItemResult(error=error)
+        return BatchItemResult(
+            operation=Operation(
+                wallet=wallet,
+                amount=amount,
+                operation_type=operation_type,
+                balance_after=wallet.balance,
+            )
+        )
+
+    @staticmethod
+    def signed_amount(operation_type: str, amount: Decimal) -> Decimal:
+        """Изменение баланса со знаком для указанного типа операции."""
+        if operation_type == OperationType.DEPOSIT:
+            return amount
+        if operation_type in (OperationType.WITHDRAW, OperationType.TRANSFER):
+            return -amount
+        raise ValueError(f"Неизвестный тип операции: {operation_type}")
+
+    @classmethod
+    def _apply(cls, operation: Operation, delta: Decimal) -> bool:
+        wallet_id = operation.wallet_id
+        bucket_count = sharding.registry.bucket_count(wallet_id)
+        started = time.monotonic()
+        if bucket_count:
+            applied = cls._apply_to_buckets(operation, delta, bucket_count)
+        elif connection.vendor == "postgresql":
+            applied = cls._apply_in_single_statement(operation, delta)
+        else:
+            applied = cls._apply_in_transaction(operation, delta)
+        sharding.tracker.observe(
+            wallet_id, time.monotonic() - started, sharded=bool(bucket_count)
+        )
+        if applied or bucket_count or delta > 0:
+            return applied
+
+        # Кошелёк мог быть разделён после обновления реестра процесса.
+        bucket_count = (
+            Wallet.objects.filter(id=wallet_id)
+            .values_list("bucket_count", flat=True)
+            .first()
+        )
+        return bool(bucket_count) and cls._apply_to_buckets(
+            operation, delta, bucket_count
+        )
+
+    @staticmethod
+    def _apply_to_buckets(
+        operation: Operation, delta: Decimal, bucket_count: int
+    ) -> bool:
+        if delta > 0:
+            applied = sharding.deposit_to_bucket(
+                operation.wallet_id, bucket_count, delta
+            )
+        else:
+            applied = sharding.withdraw_from_buckets(
+                operation.wallet_id, -delta
+            )
+        if applied:
+            # Сумма корзин без блокировки всех корзин не определена,
+            # поэтому balance_after не заполняется.
+            operation.created_at = clock.now()
+            Operation.objects.bulk_create([operation])
+        return applied
+
+    @staticmethod
+    def _apply_in_transaction(operation: Operation, delta: Decimal) -> bool:
+        # UPDATE ждёт блокировку строки кошелька.
+        with timing.measure("lock_wait"):
+            updated = Wallet.objects.filter(
+                id=operation.wallet_id, balance__gte=-delta
+            ).update(balance=F("balance") + delta)
+        if not updated:
+            return False
+        operation.created_at = clock.now()
+        # Реестр процесса мог не знать, что кошелёк уже разделён.
+        balance, bucket_count = (
+            Wallet.objects.filter(id=operation.wallet_id)
+            .values_list("balance", "bucket_count")
+            .get()
+        )
+        if not bucket_count:
+            operation.balance_after = balance
+        Operation.objects.bulk_create([operation])
+        return True
+
+    @staticmethod
+    def _apply_in_single_statement(
+        operation: Operation, delta: Decimal
+    ) -> bool:
+        quote = connection.ops.quote_name
+        wallet_meta, operation_meta = Wallet._meta, Operation._meta
+        sql = APPLY_OPERATION_SQL.format(
+            wallet_table=quote(wallet_meta.db_table),
+            wallet_pk=quote(wallet_meta.pk.column),
+            balance=quote(wallet_meta.get_field("balance").column),
+            bucket_count=quote(wallet_meta.get_field("bucket_count").column),
+            operation_table=quote(operation_meta.db_table),
+            operation_pk=quote(operation_meta.pk.column),
+            amount=quote(operation_meta.get_field("amount").column),
+            operation_type=quote(
+                operation_meta.get_field("operation_type").column
+            ),
+            wallet_fk=quote(operation_meta.get_field("wallet").column),
+            created_at=quote(operation_meta.get_field("created_at").column),
+            balance_after=quote(
+                operation_meta.get_field("balance_after").column
+            ),
+        )
+        params = [
+            delta,
+            operation.wallet_id,
+            delta,
+            operation.id,
+            operation.amount,
+            operation.operation_type,
+        ]
+        with connection.cursor() as cursor, timing.measure("lock_wait"):
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        if row is None:
+            return False
+        operation.created_at, operation.balance_after = row
+        return True
+
+    @staticmethod
+    def _raise_rejected(wallet_id: UUID) -> None:
+        if not Wallet.objects.filter(id=wallet_id).exists():
+            raise NotFound()
+        raise ValidationError({"amount": "Недостаточно средств"})
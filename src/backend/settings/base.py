@@ -27,6 +27,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django_prometheus.middleware.PrometheusBeforeMiddleware",
+    "apps.wallets.timing.timing_middleware",
+    "apps.wallets.budgets.deadline_middleware",
+    "apps.wallets.routers.replica_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -56,12 +59,33 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "backend.wsgi.application"
 
+# Реплики для чтения: имена файлов SQLite здесь, хосты PostgreSQL
+# в prod и dev. Алиасы replica_1, replica_2, ...
+DB_REPLICAS = [
+    replica
+    for replica in os.getenv("DB_REPLICAS", default="").split(",")
+    if replica
+]
+DB_REPLICA_TEST = {"MIRROR": "default"}
+
 DATABASES = {
     "default": {
         "ENGINE": "django_prometheus.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
     }
 }
+DATABASES.update(
+    {
+        f"replica_{number}": {
+            **DATABASES["default"],
+            "NAME": BASE_DIR / replica,
+            "TEST": DB_REPLICA_TEST,
+        }
+        for number, replica in enumerate(DB_REPLICAS, 1)
+    }
+)
+
+DATABASE_ROUTERS = ["apps.wallets.routers.ReplicaRouter"]
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -104,8 +128,139 @@ SPECTACULAR_SETTINGS = {
     "VERSION": "1.0.0",
     "SERVE_INCLUDE_SCHEMA": False,
     "SCHEMA_PATH_PREFIX": "/api/v1",
+    "ENUM_NAME_OVERRIDES": {
+        "OperationTypeEnum": "apps.wallets.models.OperationType",
+        "BalanceOperationTypeEnum": (
+            "apps.wallets.serializers.BALANCE_OPERATION_TYPES"
+        ),
+    },
+}
+
+WALLETS_ASYNC_VIEWS = os.getenv("WALLETS_ASYNC_VIEWS") == "True"
+
+WALLETS_BATCH_MAX_SIZE = int(os.getenv("WALLETS_BATCH_MAX_SIZE", default=1000))
+
+WALLETS_BALANCES_MAX_IDS = int(
+    os.getenv("WALLETS_BALANCES_MAX_IDS", default=500)
+)
+
+WALLETS_IDEMPOTENCY_KEY_TTL = int(
+    os.getenv("WALLETS_IDEMPOTENCY_KEY_TTL", default=24 * 60 * 60)
+)
+
+WALLETS_SHARDING = {
+    "AUTO_PROMOTE": os.getenv("WALLETS_SHARDING_AUTO_PROMOTE") == "True",
+    "BUCKETS": int(os.getenv("WALLETS_SHARDING_BUCKETS", default=8)),
+    "LOCK_WAIT_THRESHOLD_MS": float(
+        os.getenv("WALLETS_SHARDING_LOCK_WAIT_THRESHOLD_MS", default=5)
+    ),
+    "WINDOW_SECONDS": int(
+        os.getenv("WALLETS_SHARDING_WINDOW_SECONDS", default=60)
+    ),
+    "PROMOTE_AFTER": int(
+        os.getenv("WALLETS_SHARDING_PROMOTE_AFTER", default=100)
+    ),
+    "DEMOTE_BELOW": int(
+        os.getenv("WALLETS_SHARDING_DEMOTE_BELOW", default=10)
+    ),
+    "REGISTRY_REFRESH_SECONDS": 5,
+    # Алиас из CACHES; rebalance требует общего для процессов кэша.
+    "CACHE": os.getenv("WALLETS_SHARDING_CACHE", default="default"),
+}
+
+WALLETS_GROUP_COMMIT = {
+    "ENABLED": os.getenv("WALLETS_GROUP_COMMIT_ENABLED") == "True",
+    "WINDOW_MS": float(os.getenv("WALLETS_GROUP_COMMIT_WINDOW_MS", default=5)),
+    "MAX_BATCH_SIZE": int(
+        os.getenv("WALLETS_GROUP_COMMIT_MAX_BATCH_SIZE", default=100)
+    ),
 }
 
+WALLETS_BALANCE_CACHE = {
+    "ENABLED": os.getenv("WALLETS_BALANCE_CACHE_ENABLED") == "True",
+    "MAX_ENTRIES": int(
+        os.getenv("WALLETS_BALANCE_CACHE_MAX_ENTRIES", default=10000)
+    ),
+    "TTL_SECONDS": float(
+        os.getenv("WALLETS_BALANCE_CACHE_TTL_SECONDS", default=5)
+    ),
+    "SHARED_CACHE": os.getenv("WALLETS_BALANCE_CACHE_SHARED_CACHE") or None,
+}
+
+WALLETS_PARTITIONS = {
+    "MONTHS_AHEAD": int(
+        os.getenv("WALLETS_PARTITIONS_MONTHS_AHEAD", default=3)
+    ),
+    "RETAIN_MONTHS": int(
+        os.getenv("WALLETS_PARTITIONS_RETAIN_MONTHS", default=12)
+    ),
+    "ARCHIVE_DIR": os.getenv(
+        "WALLETS_PARTITIONS_ARCHIVE_DIR", default=BASE_DIR / "archive"
+    ),
+}
+
+WALLETS_OUTBOX = {
+    "GAP_GRACE_SECONDS": float(
+        os.getenv("WALLETS_OUTBOX_GAP_GRACE_SECONDS", default=5)
+    ),
+    "POLL_INTERVAL_SECONDS": float(
+        os.getenv("WALLETS_OUTBOX_POLL_INTERVAL_SECONDS", default=0.2)
+    ),
+    "MAX_WAIT_SECONDS": float(
+        os.getenv("WALLETS_OUTBOX_MAX_WAIT_SECONDS", default=25)
+    ),
+    "FEED_MAX_LIMIT": int(
+        os.getenv("WALLETS_OUTBOX_FEED_MAX_LIMIT", default=1000)
+    ),
+    "RETENTION_HOURS": int(
+        os.getenv("WALLETS_OUTBOX_RETENTION_HOURS", default=72)
+    ),
+}
+
+# 0 — без ограничения.
+WALLETS_LOCK_BUDGET = {
+    "LOCK_TIMEOUT_MS": int(os.getenv("WALLETS_LOCK_TIMEOUT_MS", default=2000)),
+    "REQUEST_DEADLINE_MS": int(
+        os.getenv("WALLETS_REQUEST_DEADLINE_MS", default=10000)
+    ),
+    "RETRY_AFTER_SECONDS": int(
+        os.getenv("WALLETS_LOCK_RETRY_AFTER_SECONDS", default=1)
+    ),
+}
+
+# lock_timeout соединений PostgreSQL (OPTIONS["options"] в DATABASES
+# prod и dev): передаётся при подключении, поэтому транзакции записи
+# выставляют только statement_timeout по остатку дедлайна.
+DB_SESSION_OPTIONS = (
+    f"-c lock_timeout={WALLETS_LOCK_BUDGET['LOCK_TIMEOUT_MS']}"
+)
+
+WALLETS_REPLICAS = {
+    "ALIASES": [
+        f"replica_{number}" for number in range(1, len(DB_REPLICAS) + 1)
+    ],
+    "STICKY_SECONDS": int(
+        os.getenv("WALLETS_REPLICAS_STICKY_SECONDS", default=10)
+    ),
+    "STICKY_COOKIE": "wallets_primary_until",
+    "STICKY_HEADER": "Wallets-Primary-Until",
+}
+
+# Пул соединений psycopg 3 для PostgreSQL (OPTIONS["pool"] в DATABASES
+# prod и dev). Соединение проверяется при каждой выдаче из пула.
+DB_POOL_OPTIONS = False
+if os.getenv("DB_POOL_ENABLED") == "True":
+    from psycopg_pool import ConnectionPool
+
+    DB_POOL_OPTIONS = {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", default=2)),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", default=10)),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", default=5)),
+        "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", default=600)),
+        "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", default=3600)),
+        "check": ConnectionPool.check_connection,
+    }
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
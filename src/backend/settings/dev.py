@@ -14,5 +14,19 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("DB_HOST"),
         "PORT": os.getenv("DB_PORT"),
+        "OPTIONS": {
+            "pool": DB_POOL_OPTIONS,
+            "options": DB_SESSION_OPTIONS,
+        },
     }
 }
+DATABASES.update(
+    {
+        f"replica_{number}": {
+            **DATABASES["default"],
+            "HOST": replica,
+            "TEST": DB_REPLICA_TEST,
+        }
+        for number, replica in enumerate(DB_REPLICAS, 1)
+    }
+)
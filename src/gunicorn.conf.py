@@ -0,0 +1,17 @@
+import os
+
+# wsgi — синхронные воркеры; asgi — воркеры uvicorn и асинхронные
+# представления, один процесс держит много запросов, ждущих БД.
+profile = os.getenv("SERVER_PROFILE", default="wsgi")
+
+bind = os.getenv("GUNICORN_BIND", default="0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", default=1))
+accesslog = "-"
+errorlog = "-"
+
+if profile == "asgi":
+    wsgi_app = "backend.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    os.environ.setdefault("WALLETS_ASYNC_VIEWS", "True")
+else:
+    wsgi_app = "backend.wsgi:application"